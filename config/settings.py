@@ -1,5 +1,6 @@
 import os
 import dj_database_url
+from corsheaders.defaults import default_headers
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -26,9 +27,12 @@ INSTALLED_APPS = [
     'rest_framework',
     'django_filters',
     'rest_framework_simplejwt',
+    'django_prometheus',
 ]
 
 MIDDLEWARE = [
+    'django_prometheus.middleware.PrometheusBeforeMiddleware',
+    'core.instrumentacao.InstrumentacaoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -36,8 +40,10 @@ MIDDLEWARE = [
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.perfilador.PerfiladorMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'django_prometheus.middleware.PrometheusAfterMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls' # Alterado de 'novalite_web.urls'
@@ -65,6 +71,27 @@ DATABASES = {
         conn_max_age=600
     )
 }
+# Backend do django_prometheus: mesmo banco, com contadores de consultas/erros por conexão no /metrics
+DATABASES['default']['ENGINE'] = DATABASES['default']['ENGINE'].replace('django.db.backends.', 'django_prometheus.db.backends.')
+
+# Cache: memória local por padrão; Redis (django-redis) quando REDIS_URL estiver configurada
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {'CLIENT_CLASS': 'django_redis.client.DefaultClient'},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'novalite',
+        }
+    }
+DASHBOARD_CACHE_TIMEOUT = int(os.environ.get('DASHBOARD_CACHE_TIMEOUT', '600'))
 
 AUTH_USER_MODEL = 'core.Usuario'
 
@@ -74,7 +101,69 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_FILTER_BACKENDS': (
         'django_filters.rest_framework.DjangoFilterBackend',
-    )
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.CursorPaginacao',
+    'PAGE_SIZE': int(os.environ.get('API_PAGE_SIZE', '50')),
+}
+
+# Paginação por cursor: limite do ?page_size= e se a paginação vale mesmo sem o cliente pedir
+# (só ligar quando todas as telas do frontend seguirem o 'next'; hoje várias leem só a primeira página)
+API_PAGINACAO_MAX_PAGE_SIZE = int(os.environ.get('API_PAGINACAO_MAX_PAGE_SIZE', '500'))
+API_PAGINACAO_OBRIGATORIA = os.environ.get('API_PAGINACAO_OBRIGATORIA', 'False') == 'True'
+
+# Instrumentação por requisição (Server-Timing + log JSON). Desligada, o middleware sai da cadeia.
+INSTRUMENTACAO_ATIVA = os.environ.get('INSTRUMENTACAO_ATIVA', 'False') == 'True'
+# Tamanho do buffer circular de consultas mais pesadas (0 = não guarda SQL)
+INSTRUMENTACAO_BUFFER_CONSULTAS = int(os.environ.get('INSTRUMENTACAO_BUFFER_CONSULTAS', '0'))
+INSTRUMENTACAO_TOP_CONSULTAS = int(os.environ.get('INSTRUMENTACAO_TOP_CONSULTAS', '5'))
+
+# Com mais de um worker do gunicorn, defina PROMETHEUS_MULTIPROC_DIR no ambiente (antes de subir o
+# processo; o prometheus_client o lê ao criar as métricas) para o /metrics somar todos os workers.
+# Sem ele, as métricas só são coerentes com um worker (ver gunicorn.conf.py e core/metricas.py).
+# /metrics do Prometheus: redes que podem coletar (REMOTE_ADDR; IPs ou CIDRs separados por vírgula)
+# e um token opcional para coletores de fora delas (Authorization: Bearer <token>)
+METRICAS_IPS_PERMITIDOS = [rede.strip() for rede in os.environ.get('METRICAS_IPS_PERMITIDOS', '127.0.0.1,::1').split(',') if rede.strip()]
+METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN', '')
+
+# Perfis cProfile sob demanda (X-Perfilar: 1, só admins): onde guardar e quanto manter em disco
+PERFILADOR_DIR = Path(os.environ.get('PERFILADOR_DIR', BASE_DIR / 'perfis'))
+PERFILADOR_MAX_ARQUIVOS = int(os.environ.get('PERFILADOR_MAX_ARQUIVOS', '50'))
+PERFILADOR_MAX_MB = int(os.environ.get('PERFILADOR_MAX_MB', '200'))
+
+# Fila de relatórios PDF: 'rq' (django-rq, padrão quando há REDIS_URL), 'thread' (pool no próprio processo) ou 'sincrono'
+RELATORIOS_FILA = os.environ.get('RELATORIOS_FILA', 'rq' if REDIS_URL else 'thread')
+RELATORIOS_DIR = Path(os.environ.get('RELATORIOS_DIR', BASE_DIR / 'relatorios'))
+# Quantos PDFs geram ao mesmo tempo no pool local (no rq, é o número de workers da fila 'relatorios')
+RELATORIOS_MAX_CONCORRENCIA = int(os.environ.get('RELATORIOS_MAX_CONCORRENCIA', '2'))
+# Limite de tarefas na fila antes de recusar novas (429), no total e por usuário
+RELATORIOS_MAX_PENDENTES = int(os.environ.get('RELATORIOS_MAX_PENDENTES', '20'))
+RELATORIOS_MAX_PENDENTES_USUARIO = int(os.environ.get('RELATORIOS_MAX_PENDENTES_USUARIO', '3'))
+RELATORIOS_RETENCAO_HORAS = int(os.environ.get('RELATORIOS_RETENCAO_HORAS', '24'))
+# Cache em disco do relatório completo da operação (LRU por tamanho)
+RELATORIOS_CACHE_DIR = Path(os.environ.get('RELATORIOS_CACHE_DIR', RELATORIOS_DIR / 'cache'))
+RELATORIOS_CACHE_MAX_MB = int(os.environ.get('RELATORIOS_CACHE_MAX_MB', '500'))
+# Pacote de saída do dia: processos que renderizam em paralelo (0 ou 1 = em série, no próprio processo)
+RELATORIOS_PACOTE_PROCESSOS = int(os.environ.get('RELATORIOS_PACOTE_PROCESSOS', str(min(4, os.cpu_count() or 1))))
+# Até quantas operações o pacote é devolvido na própria resposta; acima disso vira tarefa na fila
+RELATORIOS_PACOTE_SINCRONO = int(os.environ.get('RELATORIOS_PACOTE_SINCRONO', '3'))
+RELATORIOS_PACOTE_MAX_EVENTOS = int(os.environ.get('RELATORIOS_PACOTE_MAX_EVENTOS', '100'))
+
+if REDIS_URL:
+    # Worker: python manage.py rqworker relatorios
+    INSTALLED_APPS += ['django_rq']
+    RQ_QUEUES = {
+        'relatorios': {'URL': REDIS_URL, 'DEFAULT_TIMEOUT': 600},
+    }
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.instrumentacao': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
 }
 
 LANGUAGE_CODE = 'pt-br'
@@ -87,12 +176,20 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Uploads (fotos do pré-evento e seus derivados). O padrão mantém a pasta onde os arquivos já estavam
+# sendo gravados (o MEDIA_ROOT vazio do Django resolvia para o diretório do projeto).
+MEDIA_URL = '/media/'
+MEDIA_ROOT = Path(os.environ.get('MEDIA_ROOT', BASE_DIR))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CORS_ALLOWED_ORIGINS = [
     "https://sistemanovalite.onrender.com",
     "http://localhost:3000",
 ]
+# Perfilador (X-Perfilar) e instrumentação (Server-Timing) também a partir do frontend
+CORS_ALLOW_HEADERS = (*default_headers, 'x-perfilar')
+CORS_EXPOSE_HEADERS = ['X-Perfil', 'Server-Timing']
 
 JAZZMIN_SETTINGS = {
     "site_logo": "img/logo.png",
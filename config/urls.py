@@ -4,15 +4,21 @@ from django.contrib import admin
 from django.urls import path, include # --- 'include' ADICIONADO AQUI ---
 from django.conf import settings
 from django.conf.urls.static import static
-from core import views
+from core import metricas, perfilador, views
 
 urlpatterns = [
     path('', views.home_view, name='home'),
+    # Perfis capturados pelo PerfiladorMiddleware (antes do admin para não cair no catch-all dele)
+    path('admin/perfis/', perfilador.lista_perfis, name='lista_perfis'),
+    path('admin/perfis/<str:identificador>/<str:tipo>/', perfilador.baixar_perfil, name='baixar_perfil'),
     path('admin/', admin.site.urls),
 
     # --- LINHA CORRIGIDA ---
     # Esta linha agora "inclui" todas as rotas definidas no seu novo arquivo core/urls.py
     path('api/', include('core.urls')), 
+
+    # Métricas para o Prometheus (/metrics), restritas à rede de coleta (core/metricas.py)
+    path('metrics', metricas.exportar, name='prometheus-django-metrics'),
 ]
 
 if settings.DEBUG:
@@ -11,7 +11,7 @@ from .models import (
     Cliente, Equipamento, Funcionario, Veiculo, Evento,
     MaterialEvento, FotoPreEvento, Usuario, ItemRetornado, Consumivel, ConsumivelEvento,
     RegistroManutencao, ConfirmacaoPresenca, HistoricoManutencao,
-    EscalaFuncionario
+    EscalaFuncionario, GuiaSaida, MovimentacaoEstoque
 )
 
 # --- Seção 1: Resources para Importação/Exportação ---
@@ -137,7 +137,7 @@ class EventoAdmin(ImportExportModelAdmin):
     )
     inlines = [EscalaFuncionarioInline, MaterialEventoInline, FotoPreEventoInline, ConsumivelEventoInline]
     list_display = ('nome', 'tipo_evento', 'cliente', 'data_evento', 'status', 'acao_do_evento')
-    list_filter = ('status', 'tipo_evento', 'data_evento')
+    list_filter = ('status', 'tipo_evento', 'tem_avarias', 'data_evento')
     search_fields = ('nome', 'cliente__empresa', 'local')
     autocomplete_fields = ('cliente', 'veiculos', 'chefe_de_equipe')
 
@@ -179,3 +179,31 @@ class ConfirmacaoPresencaAdmin(admin.ModelAdmin):
 
     def has_add_permission(self, request):
         return False
+
+@admin.register(GuiaSaida)
+class GuiaSaidaAdmin(admin.ModelAdmin):
+    # Documento arquivado: só consulta
+    list_display = ('numero', 'tipo', 'evento', 'emitida_por', 'emitida_em')
+    list_filter = ('tipo', 'emitida_em')
+    search_fields = ('numero', 'evento__nome', 'sha256')
+    readonly_fields = [campo.name for campo in GuiaSaida._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(MovimentacaoEstoque)
+class MovimentacaoEstoqueAdmin(admin.ModelAdmin):
+    # Razão do estoque: correções entram como novo ajuste (edite o equipamento), nunca editando a linha
+    list_display = ('criado_em', 'equipamento', 'origem', 'delta_estoque', 'delta_manutencao', 'evento', 'usuario')
+    list_filter = ('origem', 'criado_em')
+    search_fields = ('equipamento__modelo', 'evento__nome', 'observacao')
+    readonly_fields = [campo.name for campo in MovimentacaoEstoque._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
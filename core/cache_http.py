@@ -0,0 +1,63 @@
+# Em: core/cache_http.py
+
+import hashlib
+
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+class RespostaCondicionalMixin:
+    """
+    GET condicional (ETag / Last-Modified) para viewsets cujo model tem um campo
+    de "última modificação". Antes de serializar, faz uma sondagem barata
+    (max(campo) + count na listagem, só o campo no detalhe) e devolve 304 se o
+    cliente já tem a versão atual.
+
+    A listagem responde só por ETag: o max(campo) não recua quando uma linha é
+    apagada, então um If-Modified-Since sozinho devolveria 304 velho; o count
+    dentro do ETag cobre esse caso.
+    """
+    campo_versao = 'modificado_em'
+
+    def get_queryset_versao(self):
+        # Queryset "cru" do viewset, sem os prefetches caros usados na serialização
+        return self.queryset.all()
+
+    def _etag(self, *partes):
+        # O caminho completo entra na chave: filtros, ?fields= e ?expand= mudam a representação
+        bruto = '|'.join(str(parte) for parte in (self.request.get_full_path(), *partes))
+        return quote_etag(hashlib.md5(bruto.encode()).hexdigest())
+
+    def _responder_condicional(self, etag, ultima_modificacao, gerar_resposta):
+        timestamp = int(ultima_modificacao.timestamp()) if ultima_modificacao else None
+        nao_modificado = get_conditional_response(self.request, etag=etag, last_modified=timestamp)
+        if nao_modificado is not None:
+            return nao_modificado
+        response = gerar_resposta()
+        if 200 <= response.status_code < 300:
+            response['ETag'] = etag
+            if timestamp:
+                response['Last-Modified'] = http_date(timestamp)
+            patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        sondagem = self.filter_queryset(self.get_queryset_versao()).order_by().aggregate(
+            ultima=Max(self.campo_versao), total=Count('pk')
+        )
+        etag = self._etag(sondagem['ultima'], sondagem['total'])
+        return self._responder_condicional(etag, None, lambda: super(RespostaCondicionalMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.kwargs[self.lookup_url_kwarg or self.lookup_field]
+        try:
+            versoes = list(self.get_queryset_versao().filter(**{self.lookup_field: lookup}).values_list(self.campo_versao, flat=True)[:1])
+        except (ValueError, TypeError, ValidationError):
+            # Chave malformada (ex.: /eventos/abc/): o retrieve do DRF responde 404
+            versoes = []
+        if not versoes:
+            return super().retrieve(request, *args, **kwargs)
+        etag = self._etag(versoes[0])
+        return self._responder_condicional(etag, versoes[0], lambda: super(RespostaCondicionalMixin, self).retrieve(request, *args, **kwargs))
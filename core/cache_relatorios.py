@@ -0,0 +1,117 @@
+# Em: core/cache_relatorios.py
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import Max
+
+from . import relatorios
+from .models import Evento
+
+# Evita que duas gerações da mesma chave no mesmo processo montem o PDF em dobro
+_geracao_lock = threading.Lock()
+
+
+def diretorio_cache():
+    return Path(settings.RELATORIOS_CACHE_DIR)
+
+
+def chave_relatorio_evento(evento):
+    """
+    O PDF só muda se mudar: o evento ou qualquer linha filha (os signals tocam
+    Evento.modificado_em), os equipamentos da lista (Equipamento.modificado_em),
+    o layout (VERSAO_RELATORIO_EVENTO) ou o logo. Cadastros (cliente, equipe,
+    frota, consumíveis) limpam o cache inteiro via signal.
+    """
+    logo = os.path.getmtime(relatorios.LOGO_PATH) if os.path.exists(relatorios.LOGO_PATH) else 0
+    partes = [
+        relatorios.VERSAO_RELATORIO_EVENTO, evento.pk, evento.modificado_em.isoformat(),
+        evento.versao_equipamentos.isoformat() if evento.versao_equipamentos else '', logo,
+    ]
+    return hashlib.sha256('|'.join(map(str, partes)).encode()).hexdigest()[:32]
+
+
+def relatorio_evento(evento_id):
+    """
+    Relatório completo da operação servido do disco quando nada mudou. Devolve
+    (nome_arquivo, arquivo aberto em 'rb'); na falta, gera, grava e aplica o
+    limite de tamanho. O arquivo já sai aberto: se um despejo ou invalidação
+    apagar o PDF logo depois, o descritor continua legível até ser fechado.
+    """
+    evento = Evento.objects.select_related('cliente').annotate(
+        versao_equipamentos=Max('materialevento__equipamento__modificado_em'),
+    ).get(pk=evento_id)
+    nome_arquivo = relatorios.nome_arquivo_evento(evento)
+    caminho = diretorio_cache() / f"evento-{evento.pk}-{chave_relatorio_evento(evento)}.pdf"
+
+    arquivo = _abrir(caminho)
+    if arquivo:
+        return nome_arquivo, arquivo
+    with _geracao_lock:
+        arquivo = _abrir(caminho)
+        if arquivo:
+            return nome_arquivo, arquivo
+        _, pdf = relatorios.relatorio_evento(evento_id)
+        _gravar(caminho, pdf)
+        arquivo = open(caminho, 'rb')
+    # Versões anteriores deste evento nunca mais serão pedidas
+    invalidar_evento(evento.pk, manter=caminho)
+    _despejar()
+    return nome_arquivo, arquivo
+
+
+def _abrir(caminho):
+    """Acerto no cache: abre o PDF e atualiza o mtime, que é o 'último uso' da política LRU."""
+    try:
+        arquivo = open(caminho, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(caminho)
+    except FileNotFoundError:
+        pass  # apagado entre o open e o utime; o descritor aberto continua valendo
+    return arquivo
+
+
+def _gravar(caminho, conteudo):
+    # Grava num temporário e renomeia: outro worker nunca lê um PDF pela metade
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    descritor, temporario = tempfile.mkstemp(dir=caminho.parent, suffix='.tmp')
+    with os.fdopen(descritor, 'wb') as arquivo:
+        arquivo.write(conteudo)
+    os.replace(temporario, caminho)
+
+
+def _despejar():
+    """LRU por tamanho: apaga os PDFs usados há mais tempo até caber em RELATORIOS_CACHE_MAX_MB."""
+    limite = settings.RELATORIOS_CACHE_MAX_MB * 1024 * 1024
+    arquivos = []
+    for caminho in diretorio_cache().glob('*.pdf'):
+        try:
+            info = caminho.stat()
+        except FileNotFoundError:
+            continue
+        arquivos.append((info.st_mtime, info.st_size, caminho))
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= limite:
+            break
+        caminho.unlink(missing_ok=True)
+        total -= tamanho
+
+
+# --- INVALIDAÇÃO EXPLÍCITA ---
+
+def invalidar_evento(evento_id, manter=None):
+    for caminho in diretorio_cache().glob(f'evento-{evento_id}-*.pdf'):
+        if caminho != manter:
+            caminho.unlink(missing_ok=True)
+
+
+def limpar():
+    for caminho in diretorio_cache().glob('*.pdf'):
+        caminho.unlink(missing_ok=True)
@@ -0,0 +1,73 @@
+# Em: core/dashboard.py
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q, Sum
+
+from .models import Equipamento, Evento
+from .serializers import EventoResumoSerializer
+
+# O painel é guardado em três partes, invalidadas de forma independente pelos signals:
+# - totais de estoque/manutenção (mudam com o inventário)
+# - lista de ids das operações exibidas (muda com status/datas)
+# - a linha serializada de cada operação (muda com materiais, retornos, equipe...)
+CHAVE_TOTAIS = 'dashboard:totais'
+CHAVE_EVENTOS = 'dashboard:eventos'
+PREFIXO_LINHA = 'dashboard:evento:'
+
+
+def _chave_linha(evento_id):
+    return f"{PREFIXO_LINHA}{evento_id}"
+
+
+def eventos_para_logistica():
+    # 1. Operações ativas (não em planejamento ou canceladas)
+    # 2. Operações finalizadas que TÊM avarias
+    return Evento.objects.com_resumo().filter(
+        Q(status__in=['AGUARDANDO_CONFERENCIA', 'AGUARDANDO_SAIDA', 'EM_ANDAMENTO']) |
+        (Q(status='FINALIZADO') & Q(tem_avarias=True))
+    ).order_by('data_evento')
+
+
+def _calcular_totais():
+    totais = Equipamento.objects.aggregate(estoque=Sum('quantidade_estoque'), manutencao=Sum('quantidade_manutencao'))
+    return {'total_equipamentos': totais['estoque'] or 0, 'em_manutencao': totais['manutencao'] or 0}
+
+
+def _linhas(ids):
+    linhas = cache.get_many([_chave_linha(evento_id) for evento_id in ids])
+    faltando = [evento_id for evento_id in ids if _chave_linha(evento_id) not in linhas]
+    if faltando:
+        # Só as operações invalidadas são serializadas de novo, numa única consulta
+        novas = {
+            _chave_linha(dados['id']): dict(dados)
+            for dados in EventoResumoSerializer(Evento.objects.com_resumo().filter(pk__in=faltando), many=True).data
+        }
+        cache.set_many(novas, settings.DASHBOARD_CACHE_TIMEOUT)
+        linhas.update(novas)
+    return [linhas[_chave_linha(evento_id)] for evento_id in ids if _chave_linha(evento_id) in linhas]
+
+
+def obter_estatisticas():
+    totais = cache.get_or_set(CHAVE_TOTAIS, _calcular_totais, settings.DASHBOARD_CACHE_TIMEOUT)
+    ids = cache.get(CHAVE_EVENTOS)
+    if ids is None:
+        ids = list(eventos_para_logistica().values_list('id', flat=True))
+        cache.set(CHAVE_EVENTOS, ids, settings.DASHBOARD_CACHE_TIMEOUT)
+    return {
+        **totais,
+        # O frontend espera o campo 'proximos_eventos', então mantemos o nome
+        'proximos_eventos': _linhas(ids),
+    }
+
+
+def invalidar_totais():
+    cache.delete(CHAVE_TOTAIS)
+
+
+def invalidar_lista_eventos():
+    cache.delete(CHAVE_EVENTOS)
+
+
+def invalidar_evento(*evento_ids):
+    cache.delete_many([_chave_linha(evento_id) for evento_id in evento_ids])
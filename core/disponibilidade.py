@@ -0,0 +1,116 @@
+# Em: core/disponibilidade.py
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import F
+from django.db.models.functions import Coalesce
+
+from .models import Equipamento, MaterialEvento
+
+# Status em que o material planejado está reservado para a operação
+STATUS_COMPROMETIDOS = ['PLANEJAMENTO', 'AGUARDANDO_CONFERENCIA', 'AGUARDANDO_SAIDA', 'EM_ANDAMENTO']
+
+
+def _reservas(equipamento_ids, inicio, fim, excluir_evento=None):
+    """
+    Linhas de material de operações ativas cuja janela (montagem…término)
+    cruza [inicio, fim], já com a quantidade ainda comprometida (planejada
+    menos o que já voltou). Uma única consulta para todos os equipamentos.
+    """
+    linhas = MaterialEvento.objects.filter(
+        equipamento_id__in=equipamento_ids,
+        evento__status__in=STATUS_COMPROMETIDOS,
+    ).annotate(
+        janela_inicio=Coalesce('evento__data_montagem', 'evento__data_evento'),
+        janela_fim=Coalesce('evento__data_termino', 'evento__data_evento'),
+        retornado=F('quantidade_retornada_ok') + F('quantidade_retornada_defeito'),
+    ).filter(janela_inicio__lte=fim, janela_fim__gte=inicio)
+    if excluir_evento:
+        linhas = linhas.exclude(evento_id=excluir_evento)
+    return linhas.values_list('equipamento_id', 'evento__status', 'janela_inicio', 'janela_fim', 'quantidade', 'quantidade_separada', 'retornado')
+
+
+def _pico(intervalos, inicio, fim):
+    """
+    Varredura (sweep-line): cada reserva vira +q no início e -q no dia seguinte
+    ao fim. Ordenando os pontos, a soma corrente dá o comprometido em cada dia;
+    o maior valor dentro da janela consultada é o pico. O(n log n).
+    """
+    pontos = []
+    for janela_inicio, janela_fim, quantidade in intervalos:
+        janela_inicio = max(janela_inicio, inicio)
+        janela_fim = max(min(janela_fim, fim), janela_inicio)
+        pontos.append((janela_inicio, quantidade))
+        pontos.append((janela_fim + timedelta(days=1), -quantidade))
+    # Saídas (-q) antes das entradas no mesmo dia: o fim é exclusivo
+    pontos.sort(key=lambda ponto: (ponto[0], ponto[1]))
+    pico, data_pico, corrente = 0, None, 0
+    for data, delta in pontos:
+        corrente += delta
+        if corrente > pico:
+            pico, data_pico = corrente, data
+    return pico, data_pico
+
+
+def calcular_disponibilidade(equipamento_ids, inicio, fim, excluir_evento=None):
+    """
+    Para cada equipamento, o pico de unidades comprometidas entre inicio e fim
+    e quanto sobra do patrimônio (estoque + unidades hoje em campo).
+    """
+    equipamentos = Equipamento.objects.in_bulk(equipamento_ids)
+    intervalos = defaultdict(list)
+    em_campo = defaultdict(int)
+    for equipamento_id, status_evento, janela_inicio, janela_fim, quantidade, separada, retornado in _reservas(equipamento_ids, inicio, fim, excluir_evento):
+        comprometido = max(quantidade, separada) - retornado
+        if status_evento == 'EM_ANDAMENTO':
+            em_campo[equipamento_id] += separada - retornado
+        if comprometido > 0:
+            intervalos[equipamento_id].append((janela_inicio, janela_fim, comprometido))
+
+    # Tudo o que está em campo hoje (inclusive de operações fora da janela, ex: retorno atrasado)
+    total_em_campo = defaultdict(int)
+    em_andamento = MaterialEvento.objects.filter(
+        equipamento_id__in=equipamento_ids, evento__status='EM_ANDAMENTO'
+    ).annotate(retornado=F('quantidade_retornada_ok') + F('quantidade_retornada_defeito'))
+    for equipamento_id, evento_id, separada, retornado in em_andamento.values_list('equipamento_id', 'evento_id', 'quantidade_separada', 'retornado'):
+        total_em_campo[equipamento_id] += separada - retornado
+        if evento_id == excluir_evento:
+            # O material da própria operação consultada conta como dela, não como ocupado
+            em_campo[equipamento_id] += separada - retornado
+
+    resultado = {}
+    for equipamento_id, equipamento in equipamentos.items():
+        pico, data_pico = _pico(intervalos[equipamento_id], inicio, fim)
+        # Em campo fora da janela: saiu e ainda não voltou, então também não está livre neste período
+        em_campo_fora = total_em_campo[equipamento_id] - em_campo[equipamento_id]
+        patrimonio = equipamento.quantidade_estoque + total_em_campo[equipamento_id]
+        resultado[equipamento_id] = {
+            'equipamento_id': equipamento_id,
+            'modelo': equipamento.modelo,
+            'patrimonio': patrimonio,
+            'em_manutencao': equipamento.quantidade_manutencao,
+            'pico_comprometido': pico + em_campo_fora,
+            'data_pico': data_pico,
+            'disponivel': patrimonio - pico - em_campo_fora,
+        }
+    return resultado
+
+
+def verificar_lista(itens, inicio, fim, excluir_evento=None):
+    """
+    Checagem em lote de uma lista [(equipamento_id, quantidade)] para o período:
+    devolve cada linha com o disponível e a falta (0 se cabe).
+    """
+    pedidos = defaultdict(int)
+    for equipamento_id, quantidade in itens:
+        pedidos[equipamento_id] += quantidade
+    disponibilidade = calcular_disponibilidade(list(pedidos), inicio, fim, excluir_evento)
+    linhas = []
+    for equipamento_id, quantidade in pedidos.items():
+        info = disponibilidade.get(equipamento_id)
+        if info is None:
+            linhas.append({'equipamento_id': equipamento_id, 'quantidade': quantidade, 'erro': 'Equipamento não encontrado.'})
+            continue
+        linhas.append({**info, 'quantidade': quantidade, 'falta': max(quantidade - info['disponivel'], 0)})
+    return linhas
@@ -0,0 +1,406 @@
+# Em: core/estoque.py
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import dashboard, guias, metricas, movimentacoes
+from .models import Equipamento, Evento, ItemRetornado, MaterialEvento, RegistroManutencao
+
+
+class ErroEstoque(Exception):
+    """Falha de validação numa movimentação de estoque; a mensagem vai direto para o usuário."""
+
+
+class EquipamentoNaoEncontrado(ErroEstoque):
+    """Equipamento pedido que não existe (a rota responde 404)."""
+
+
+def _linha(equipamento_id, modelo, solicitado, estoque):
+    return {
+        'equipamento_id': equipamento_id,
+        'modelo': modelo,
+        'solicitado': solicitado,
+        'estoque': estoque,
+        'falta': max(solicitado - estoque, 0),
+    }
+
+
+def verificar_estoque_evento(evento_id):
+    """
+    Confere o que ainda falta sair de uma operação (planejado - já separado)
+    contra o estoque atual, numa única consulta agregada com JOIN no equipamento.
+    """
+    agregados = MaterialEvento.objects.filter(
+        evento_id=evento_id, equipamento__isnull=False
+    ).values(
+        'equipamento_id', 'equipamento__modelo', 'equipamento__quantidade_estoque'
+    ).annotate(
+        solicitado=Sum(F('quantidade') - F('quantidade_separada'))
+    ).order_by('equipamento__modelo')
+    return [
+        _linha(a['equipamento_id'], a['equipamento__modelo'], a['solicitado'] or 0, a['equipamento__quantidade_estoque'])
+        for a in agregados
+    ]
+
+
+def verificar_estoque_itens(itens):
+    """
+    Mesma checagem para uma lista ainda não salva [(equipamento_id, quantidade)].
+    Linhas repetidas do mesmo equipamento são somadas antes da comparação.
+    """
+    solicitados = defaultdict(int)
+    for equipamento_id, quantidade in itens:
+        solicitados[equipamento_id] += quantidade
+    estoques = {
+        equipamento_id: (modelo, estoque)
+        for equipamento_id, modelo, estoque in Equipamento.objects.filter(
+            pk__in=solicitados
+        ).values_list('id', 'modelo', 'quantidade_estoque')
+    }
+    linhas = []
+    for equipamento_id, solicitado in solicitados.items():
+        if equipamento_id not in estoques:
+            linhas.append({'equipamento_id': equipamento_id, 'solicitado': solicitado, 'erro': 'Equipamento não encontrado.'})
+            continue
+        modelo, estoque = estoques[equipamento_id]
+        linhas.append(_linha(equipamento_id, modelo, solicitado, estoque))
+    return linhas
+
+
+def _bloquear_equipamentos(equipamento_ids):
+    # Sempre na mesma ordem (pk) para duas docas despachando ao mesmo tempo não entrarem em deadlock
+    return {
+        equipamento.pk: equipamento
+        for equipamento in Equipamento.objects.select_for_update().filter(pk__in=equipamento_ids).order_by('pk')
+    }
+
+
+@transaction.atomic
+def registrar_saida(evento, itens, usuario=None):
+    """
+    Saída de material em lote: trava de uma vez as linhas de material e os
+    equipamentos envolvidos, valida tudo em memória e aplica os decrementos com
+    F() + bulk_update. O número de consultas não depende do tamanho da lista.
+    Emite a guia de saída (core/guias.py) com o que realmente saiu.
+
+    'itens' é a lista enviada pelo frontend: [{'id': material_evento_id, 'qtd': n}].
+    Devolve (evento, guia).
+    """
+    evento = Evento.objects.select_for_update().get(pk=evento.pk)
+    if evento.status not in ['AGUARDANDO_SAIDA', 'EM_ANDAMENTO']:
+        raise ErroEstoque('Ação não permitida para o status atual.')
+
+    quantidades = defaultdict(int)
+    for item in itens:
+        try:
+            qtd = int(item['qtd'])
+            material_id = int(item['id'])
+        except (KeyError, TypeError, ValueError):
+            raise ErroEstoque('Item de saída inválido.')
+        if qtd < 0:
+            raise ErroEstoque('A quantidade de saída não pode ser negativa.')
+        if qtd:
+            quantidades[material_id] += qtd
+    if not quantidades:
+        raise ErroEstoque('Nenhuma quantidade de saída foi informada.')
+
+    materiais = {
+        material.pk: material
+        for material in MaterialEvento.objects.select_for_update().filter(evento=evento, pk__in=quantidades).order_by('pk')
+    }
+    faltando = set(quantidades) - set(materiais)
+    if faltando:
+        raise ErroEstoque(f"Material(is) não encontrado(s) nesta operação: {', '.join(map(str, sorted(faltando)))}.")
+
+    equipamentos = _bloquear_equipamentos({m.equipamento_id for m in materiais.values() if m.equipamento_id})
+    saida_por_equipamento = defaultdict(int)
+    itens_guia = []
+    for material_id, qtd in quantidades.items():
+        material = materiais[material_id]
+        equipamento = equipamentos.get(material.equipamento_id)
+        nome = equipamento.modelo if equipamento else material.item_descricao
+        if qtd > material.quantidade - material.quantidade_separada:
+            raise ErroEstoque(f"Quantidade de saída para '{nome}' excede a planejada.")
+        if equipamento:
+            saida_por_equipamento[equipamento.pk] += qtd
+        itens_guia.append({'modelo': nome, 'qtd': qtd})
+    for equipamento_id, qtd in saida_por_equipamento.items():
+        equipamento = equipamentos[equipamento_id]
+        if qtd > equipamento.quantidade_estoque:
+            raise ErroEstoque(f"Estoque insuficiente para {equipamento.modelo}.")
+
+    agora = timezone.now()
+    for equipamento_id, qtd in saida_por_equipamento.items():
+        equipamento = equipamentos[equipamento_id]
+        equipamento.quantidade_estoque = F('quantidade_estoque') - qtd
+        equipamento.modificado_em = agora
+    Equipamento.objects.bulk_update([equipamentos[pk] for pk in saida_por_equipamento], ['quantidade_estoque', 'modificado_em'])
+    movimentacoes.lancar([
+        movimentacoes.movimento(equipamento_id, 'SAIDA', estoque=-qtd, usuario=usuario, evento=evento)
+        for equipamento_id, qtd in saida_por_equipamento.items()
+    ])
+
+    for material_id, qtd in quantidades.items():
+        materiais[material_id].quantidade_separada = F('quantidade_separada') + qtd
+    MaterialEvento.objects.bulk_update(list(materiais.values()), ['quantidade_separada'])
+
+    # Se era a primeira saída, muda o status para "Em Andamento"; o save também atualiza a versão do evento
+    if evento.status == 'AGUARDANDO_SAIDA':
+        evento.status = 'EM_ANDAMENTO'
+    evento.save()
+    guia = guias.emitir(evento, 'SAIDA', itens_guia, usuario)
+    # bulk_update não dispara signals: o total de estoque do painel é invalidado aqui
+    transaction.on_commit(dashboard.invalidar_totais)
+    total_despachado = sum(quantidades.values())
+    transaction.on_commit(lambda: metricas.itens_despachados.labels(origem='saida').inc(total_despachado))
+    return evento, guia
+
+
+@transaction.atomic
+def registrar_reforco(evento, itens, usuario=None):
+    """
+    Reforço de material para uma operação em andamento, no mesmo molde da
+    saída: trava a operação e os equipamentos, valida o pacote inteiro antes
+    de gravar, tira do estoque com F() + bulk_update, soma nas linhas de
+    material da operação (criando as que faltam) e emite uma única guia de
+    reforço. Qualquer erro desfaz tudo.
+
+    'itens' é a lista enviada pelo frontend: [{'equipamento_id', 'quantidade'}];
+    linhas sem equipamento ou com quantidade zero são ignoradas.
+    Devolve (evento, guia).
+    """
+    evento = Evento.objects.select_for_update().get(pk=evento.pk)
+    if evento.status != 'EM_ANDAMENTO':
+        raise ErroEstoque('Só é possível adicionar reforço a operações "Em Andamento".')
+
+    quantidades = defaultdict(int)
+    for item in itens:
+        try:
+            equipamento_id = item.get('equipamento_id')
+            quantidade = int(item.get('quantidade', 0))
+            if equipamento_id:
+                equipamento_id = int(equipamento_id)
+        except (AttributeError, TypeError, ValueError):
+            raise ErroEstoque('Item de reforço inválido.')
+        if equipamento_id and quantidade > 0:
+            quantidades[equipamento_id] += quantidade
+    if not quantidades:
+        raise ErroEstoque('Nenhum material de reforço foi especificado.')
+
+    equipamentos = _bloquear_equipamentos(quantidades)
+    if set(quantidades) - set(equipamentos):
+        raise EquipamentoNaoEncontrado('Equipamento de reforço não encontrado.')
+    for equipamento_id, quantidade in quantidades.items():
+        equipamento = equipamentos[equipamento_id]
+        if quantidade > equipamento.quantidade_estoque:
+            raise ErroEstoque(f"Estoque insuficiente para o reforço de '{equipamento.modelo}'.")
+
+    agora = timezone.now()
+    for equipamento_id, quantidade in quantidades.items():
+        equipamento = equipamentos[equipamento_id]
+        equipamento.quantidade_estoque = F('quantidade_estoque') - quantidade
+        equipamento.modificado_em = agora
+    Equipamento.objects.bulk_update(list(equipamentos.values()), ['quantidade_estoque', 'modificado_em'])
+    movimentacoes.lancar([
+        movimentacoes.movimento(equipamento_id, 'REFORCO', estoque=-quantidade, usuario=usuario, evento=evento)
+        for equipamento_id, quantidade in quantidades.items()
+    ])
+
+    # O reforço entra na primeira linha do equipamento na operação; sem linha, cria uma já com saída
+    materiais = {}
+    for material in MaterialEvento.objects.select_for_update().filter(evento=evento, equipamento_id__in=quantidades).order_by('pk'):
+        materiais.setdefault(material.equipamento_id, material)
+    for equipamento_id, material in materiais.items():
+        material.quantidade = F('quantidade') + quantidades[equipamento_id]
+        material.quantidade_separada = F('quantidade_separada') + quantidades[equipamento_id]
+    MaterialEvento.objects.bulk_update(list(materiais.values()), ['quantidade', 'quantidade_separada'])
+    MaterialEvento.objects.bulk_create([
+        MaterialEvento(evento=evento, equipamento_id=equipamento_id, quantidade=quantidade, quantidade_separada=quantidade)
+        for equipamento_id, quantidade in quantidades.items() if equipamento_id not in materiais
+    ])
+
+    guia = guias.emitir(evento, 'REFORCO', [
+        {'modelo': equipamentos[equipamento_id].modelo, 'qtd': quantidade} for equipamento_id, quantidade in quantidades.items()
+    ], usuario)
+    # bulk_update/bulk_create não disparam os signals que versionam a operação e limpam o painel
+    Evento.objects.filter(pk=evento.pk).marcar_modificados()
+    transaction.on_commit(lambda: dashboard.invalidar_evento(evento.pk))
+    transaction.on_commit(dashboard.invalidar_totais)
+    total_despachado = sum(quantidades.values())
+    transaction.on_commit(lambda: metricas.itens_despachados.labels(origem='reforco').inc(total_despachado))
+    return evento, guia
+
+
+@transaction.atomic
+def registrar_retorno(evento, retornos, usuario=None):
+    """
+    Retorno de material em lote, no mesmo molde da saída: trava a operação e
+    todas as suas linhas de material, calcula o pendente de cada uma a partir
+    dos contadores desnormalizados, valida o pacote inteiro em memória e grava
+    com um INSERT de itens retornados, F() nos equipamentos e nos contadores.
+    A finalização sai da mesma leitura: se nada ficar pendente, a operação
+    fecha. O número de consultas não depende do tamanho da lista.
+
+    'retornos' é a lista enviada pelo frontend:
+    [{'material_evento_id', 'quantidade', 'condicao', 'observacao'}].
+    Devolve (evento, finalizado).
+    """
+    evento = Evento.objects.select_for_update().get(pk=evento.pk)
+    if evento.status != 'EM_ANDAMENTO':
+        raise ErroEstoque('A operação não está "Em Andamento".')
+
+    condicoes = dict(ItemRetornado.CONDICAO_CHOICES)
+    linhas = []
+    for item in retornos:
+        try:
+            material_id = int(item['material_evento_id'])
+            quantidade = int(item['quantidade'])
+            condicao = item['condicao']
+        except (KeyError, TypeError, ValueError):
+            raise ErroEstoque('Item de retorno inválido.')
+        if condicao not in condicoes:
+            raise ErroEstoque(f"Condição de retorno inválida: {condicao}.")
+        if quantidade <= 0:
+            raise ErroEstoque('A quantidade de retorno deve ser um número inteiro positivo.')
+        linhas.append((material_id, quantidade, condicao, item.get('observacao') or ''))
+    if not linhas:
+        raise ErroEstoque('Nenhum item de retorno foi especificado.')
+
+    # Todas as linhas da operação: as do pacote para validar, as demais para decidir a finalização
+    materiais = {
+        material.pk: material
+        for material in MaterialEvento.objects.select_for_update().filter(evento=evento).only(
+            'id', 'evento_id', 'equipamento_id', 'item_descricao', 'quantidade_separada', 'quantidade_retornada_ok', 'quantidade_retornada_defeito',
+        ).order_by('pk')
+    }
+    faltando = {material_id for material_id, _, _, _ in linhas} - set(materiais)
+    if faltando:
+        raise ErroEstoque(f"Material(is) não encontrado(s) nesta operação: {', '.join(map(str, sorted(faltando)))}.")
+
+    equipamentos = _bloquear_equipamentos({materiais[material_id].equipamento_id for material_id, _, _, _ in linhas} - {None})
+    pendentes = {
+        material.pk: material.quantidade_separada - material.quantidade_retornada_ok - material.quantidade_retornada_defeito
+        for material in materiais.values()
+    }
+    for material_id, quantidade, _, _ in linhas:
+        pendentes[material_id] -= quantidade
+        if pendentes[material_id] < 0:
+            material = materiais[material_id]
+            nome = equipamentos[material.equipamento_id].modelo if material.equipamento_id else material.item_descricao
+            raise ErroEstoque(f"Quantidade de retorno para '{nome}' excede a pendente.")
+
+    itens = ItemRetornado.objects.bulk_create([
+        ItemRetornado(material_evento=materiais[material_id], quantidade=quantidade, condicao=condicao, observacao=observacao)
+        for material_id, quantidade, condicao, observacao in linhas
+    ])
+    # bulk_create não dispara os signals que mantêm os contadores do material e as avarias da operação
+    MaterialEvento.objects.somar_retornos((material_id, condicao, quantidade) for material_id, quantidade, condicao, _ in linhas)
+
+    por_equipamento = defaultdict(lambda: [0, 0])
+    for material_id, quantidade, condicao, _ in linhas:
+        equipamento_id = materiais[material_id].equipamento_id
+        if equipamento_id:
+            por_equipamento[equipamento_id][0 if condicao == 'OK' else 1] += quantidade
+    agora = timezone.now()
+    for equipamento_id, (estoque, manutencao) in por_equipamento.items():
+        equipamento = equipamentos[equipamento_id]
+        equipamento.quantidade_estoque = F('quantidade_estoque') + estoque
+        equipamento.quantidade_manutencao = F('quantidade_manutencao') + manutencao
+        equipamento.modificado_em = agora
+    Equipamento.objects.bulk_update([equipamentos[pk] for pk in por_equipamento], ['quantidade_estoque', 'quantidade_manutencao', 'modificado_em'])
+    movimentacoes.lancar([
+        movimentacoes.movimento(equipamento_id, 'RETORNO', estoque=estoque, manutencao=manutencao, usuario=usuario, evento=evento)
+        for equipamento_id, (estoque, manutencao) in por_equipamento.items()
+    ])
+
+    # O que voltou avariado abre O.S.; a primeira de cada item fica ligada ao retorno
+    RegistroManutencao.objects.criar_em_lote([
+        {
+            'quantidade': item.quantidade,
+            'equipamento': equipamentos[materiais[item.material_evento_id].equipamento_id],
+            'item_retornado': item,
+            'descricao_problema': f"Retornou da operação '{evento.nome}' como '{item.get_condicao_display()}'. Obs: {item.observacao}",
+        }
+        for item in itens if item.condicao != 'OK' and materiais[item.material_evento_id].equipamento_id
+    ])
+
+    finalizado = not any(pendente > 0 for pendente in pendentes.values())
+    if finalizado:
+        # O save também atualiza a versão do evento e, pelos signals, o painel
+        evento.status = 'FINALIZADO'
+        evento.save()
+    else:
+        Evento.objects.filter(pk=evento.pk).marcar_modificados()
+        transaction.on_commit(lambda: dashboard.invalidar_evento(evento.pk))
+    transaction.on_commit(dashboard.invalidar_totais)
+
+    por_condicao = defaultdict(int)
+    for _, quantidade, condicao, _ in linhas:
+        por_condicao[condicao] += quantidade
+
+    def contar_metricas():
+        for condicao, quantidade in por_condicao.items():
+            metricas.itens_retornados.labels(condicao=condicao).inc(quantidade)
+    transaction.on_commit(contar_metricas)
+    return evento, finalizado
+
+
+@transaction.atomic
+def enviar_para_manutencao(pedidos, usuario=None):
+    """
+    Envia unidades do estoque para a manutenção em lote: trava os equipamentos,
+    valida, move as quantidades com F() e abre todas as O.S. com um único INSERT.
+
+    'pedidos' é uma lista de dicts com equipamento_id, quantidade e descricao_problema.
+    """
+    for pedido in pedidos:
+        if not pedido.get('descricao_problema'):
+            raise ErroEstoque('Quantidade e descrição do problema são obrigatórios.')
+        try:
+            pedido['quantidade'] = int(pedido['quantidade'])
+            pedido['equipamento_id'] = int(pedido['equipamento_id'])
+        except (KeyError, TypeError, ValueError):
+            raise ErroEstoque('A quantidade deve ser um número inteiro positivo.')
+        if pedido['quantidade'] <= 0:
+            raise ErroEstoque('A quantidade deve ser um número inteiro positivo.')
+
+    equipamentos = _bloquear_equipamentos({pedido['equipamento_id'] for pedido in pedidos})
+    por_equipamento = defaultdict(int)
+    for pedido in pedidos:
+        if pedido['equipamento_id'] not in equipamentos:
+            raise ErroEstoque(f"Equipamento {pedido['equipamento_id']} não encontrado.")
+        por_equipamento[pedido['equipamento_id']] += pedido['quantidade']
+    for equipamento_id, quantidade in por_equipamento.items():
+        equipamento = equipamentos[equipamento_id]
+        if quantidade > equipamento.quantidade_estoque:
+            raise ErroEstoque(f'Estoque insuficiente de {equipamento.modelo}. Apenas {equipamento.quantidade_estoque} unidades disponíveis.')
+
+    agora = timezone.now()
+    for equipamento_id, quantidade in por_equipamento.items():
+        equipamento = equipamentos[equipamento_id]
+        equipamento.quantidade_estoque = F('quantidade_estoque') - quantidade
+        equipamento.quantidade_manutencao = F('quantidade_manutencao') + quantidade
+        equipamento.modificado_em = agora
+    Equipamento.objects.bulk_update([equipamentos[pk] for pk in por_equipamento], ['quantidade_estoque', 'quantidade_manutencao', 'modificado_em'])
+    movimentacoes.lancar([
+        movimentacoes.movimento(
+            pedido['equipamento_id'], 'ENVIO_MANUTENCAO', estoque=-pedido['quantidade'], manutencao=pedido['quantidade'],
+            usuario=usuario, observacao=pedido['descricao_problema'][:255],
+        )
+        for pedido in pedidos
+    ])
+
+    # Note que 'item_retornado' fica nulo, pois não veio de um evento
+    registros = RegistroManutencao.objects.criar_em_lote([
+        {
+            'quantidade': pedido['quantidade'],
+            'equipamento': equipamentos[pedido['equipamento_id']],
+            'descricao_problema': pedido['descricao_problema'],
+        }
+        for pedido in pedidos
+    ])
+    transaction.on_commit(dashboard.invalidar_totais)
+    return registros
@@ -0,0 +1,39 @@
+# Em: core/filters.py
+
+from django_filters import rest_framework as filters
+
+from .models import Evento, MaterialEvento
+
+
+class EventoFilter(filters.FilterSet):
+    """
+    Filtros da listagem de operações (/api/eventos/), para o frontend pedir só
+    o que exibe em vez de baixar o histórico inteiro. Todos batem em índices
+    (ver PlanosDeConsultaTests):
+
+    ?inicio=&fim=              janela montagem…término cruzando o período (índice 'evento_janela')
+    ?status=A&status=B         um ou mais status (índice 'evento_status_data')
+    ?cliente=, ?chefe_de_equipe=, ?veiculo=   chaves estrangeiras / tabela da frota
+    ?pendente_suprimento=true  com material 'PENDENTE' (índice 'material_suprimento_evento')
+    """
+    inicio = filters.DateFilter(method='filtrar_janela')
+    fim = filters.DateFilter(method='filtrar_janela')
+    status = filters.MultipleChoiceFilter(choices=Evento.STATUS_CHOICES)
+    veiculo = filters.NumberFilter(field_name='veiculos')
+    pendente_suprimento = filters.BooleanFilter(method='filtrar_pendente_suprimento')
+
+    class Meta:
+        model = Evento
+        fields = ['inicio', 'fim', 'status', 'cliente', 'chefe_de_equipe', 'veiculo', 'pendente_suprimento']
+
+    def filtrar_janela(self, queryset, name, value):
+        # 'inicio' e 'fim' formam um único filtro; aplica uma vez, quando passa pelo primeiro informado
+        dados = self.form.cleaned_data
+        if name == 'fim' and dados.get('inicio') is not None:
+            return queryset
+        return queryset.na_janela(dados.get('inicio'), dados.get('fim'))
+
+    def filtrar_pendente_suprimento(self, queryset, name, value):
+        # Partindo das poucas linhas pendentes (IN), e não de um EXISTS avaliado operação por operação
+        pendentes = MaterialEvento.objects.filter(status_suprimento='PENDENTE').values('evento_id')
+        return queryset.filter(pk__in=pendentes) if value else queryset.exclude(pk__in=pendentes)
@@ -0,0 +1,62 @@
+# Em: core/guias.py
+
+import hashlib
+import logging
+
+from django.core.files.base import ContentFile
+
+from . import relatorios, tarefas
+from .models import GuiaSaida, SequenciaGuia
+
+logger = logging.getLogger(__name__)
+
+GERADORES = {
+    'SAIDA': relatorios.guia_saida,
+    'REFORCO': relatorios.guia_reforco,
+}
+
+
+def emitir(evento, tipo, itens, usuario=None):
+    """
+    Chamado dentro da transação da saída/reforço: numera a guia e congela os
+    itens [{'modelo', 'qtd'}] que saíram e os dados do evento. O PDF é gerado
+    e arquivado na fila de relatórios depois do commit, fora da requisição; se
+    falhar, a primeira reimpressão gera.
+    """
+    guia = GuiaSaida.objects.create(
+        numero=SequenciaGuia.proximo(), tipo=tipo, evento=evento, itens=itens,
+        dados=relatorios.dados_da_guia(evento),
+        emitida_por=usuario if usuario and usuario.is_authenticated else None,
+    )
+    tarefas.em_segundo_plano(arquivar, guia.pk)
+    return guia
+
+
+def arquivar(guia_id):
+    """
+    Gera o PDF uma única vez, a partir do que foi congelado na emissão, e grava
+    em guias/<sha256>.pdf. O nome vem do conteúdo: o arquivo nunca é
+    sobrescrito e o hash serve de conferência.
+    """
+    guia = GuiaSaida.objects.get(pk=guia_id)
+    if guia.sha256:
+        return guia
+    # Guias anteriores aos dados congelados (dados vazio) caem no evento atual
+    _, pdf = GERADORES[guia.tipo](guia.evento_id, guia.itens, numero=guia.numero, emitida_em=guia.emitida_em, dados=guia.dados or None)
+    sha256 = hashlib.sha256(pdf).hexdigest()
+    nome = f"guias/{sha256[:2]}/{sha256}.pdf"
+    storage = guia.arquivo.storage
+    if not storage.exists(nome):
+        nome = storage.save(nome, ContentFile(pdf))
+    # Só grava se ainda não foi arquivada: duas gerações simultâneas não trocam o arquivo de uma guia
+    GuiaSaida.objects.filter(pk=guia.pk, sha256='').update(sha256=sha256, arquivo=nome)
+    guia.refresh_from_db()
+    return guia
+
+
+def abrir(guia):
+    """Reimpressão: lê o arquivo arquivado, sem renderizar de novo."""
+    if not guia.sha256:
+        logger.warning("Guia %s sem PDF arquivado; gerando agora.", guia.numero)
+        guia = arquivar(guia.pk)
+    return guia.arquivo.open('rb')
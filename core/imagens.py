@@ -0,0 +1,85 @@
+# Em: core/imagens.py
+
+import logging
+import posixpath
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# Derivados das fotos do pré-evento. 'impressao' = 2.2 x 1.6 pol a 300 dpi, o tamanho usado no PDF.
+TAMANHOS = {
+    'miniatura': (320, 320),
+    'impressao': (660, 480),
+}
+QUALIDADE_JPEG = 80
+
+logger = logging.getLogger(__name__)
+
+
+def nome_derivado(nome_original, tamanho):
+    """fotos_pre_evento/palco.png -> fotos_pre_evento/derivados/palco_png_impressao.jpg (ao lado do original)."""
+    pasta, arquivo = posixpath.split(nome_original)
+    base, extensao = posixpath.splitext(arquivo)
+    # A extensão entra no nome para palco.png e palco.jpg não dividirem o mesmo derivado
+    return posixpath.join(pasta, 'derivados', f"{base}_{extensao.lstrip('.').lower()}_{tamanho}.jpg")
+
+
+def gerar_derivado(imagem, tamanho):
+    """Reduz (sem ampliar), corrige a rotação do EXIF e recomprime em JPEG. Devolve o nome no storage."""
+    storage = imagem.storage
+    nome = nome_derivado(imagem.name, tamanho)
+    with storage.open(imagem.name, 'rb') as original:
+        with Image.open(original) as foto:
+            # draft() deixa o decodificador JPEG já ler em escala menor: bem menos memória em fotos de câmera.
+            # Lado maior nos dois eixos porque a rotação do EXIF pode trocar largura e altura.
+            lado = max(TAMANHOS[tamanho])
+            foto.draft('RGB', (lado, lado))
+            foto = ImageOps.exif_transpose(foto).convert('RGB')
+            foto.thumbnail(TAMANHOS[tamanho], Image.LANCZOS)
+            saida = BytesIO()
+            foto.save(saida, 'JPEG', quality=QUALIDADE_JPEG, optimize=True, progressive=True)
+    if storage.exists(nome):
+        storage.delete(nome)
+    return storage.save(nome, ContentFile(saida.getvalue()))
+
+
+def gerar_derivados(imagem):
+    """Chamado após o upload; uma foto inválida não deve derrubar a requisição que a salvou."""
+    try:
+        return {tamanho: gerar_derivado(imagem, tamanho) for tamanho in TAMANHOS}
+    except OSError:
+        logger.warning("Não foi possível gerar os derivados de %s", imagem.name, exc_info=True)
+        return {}
+
+
+def obter_derivado(imagem, tamanho):
+    """Nome do derivado, gerando na primeira vez (fotos enviadas antes desta rotina)."""
+    nome = nome_derivado(imagem.name, tamanho)
+    if imagem.storage.exists(nome):
+        return nome
+    return gerar_derivado(imagem, tamanho)
+
+
+def caminho_derivado(imagem, tamanho):
+    """Caminho local do derivado, para o ReportLab; se a foto não puder ser processada, o original."""
+    try:
+        return imagem.storage.path(obter_derivado(imagem, tamanho))
+    except OSError:
+        logger.warning("Não foi possível gerar o derivado '%s' de %s", tamanho, imagem.name, exc_info=True)
+        return imagem.path
+
+
+def url_derivado(imagem, tamanho):
+    """URL do derivado se já existir; senão a do original (sem gerar dentro da resposta da API)."""
+    if not imagem:
+        return None
+    nome = nome_derivado(imagem.name, tamanho)
+    return imagem.storage.url(nome if imagem.storage.exists(nome) else imagem.name)
+
+
+def apagar_derivados(imagem):
+    for tamanho in TAMANHOS:
+        nome = nome_derivado(imagem.name, tamanho)
+        if imagem.storage.exists(nome):
+            imagem.storage.delete(nome)
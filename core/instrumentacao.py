@@ -0,0 +1,172 @@
+# Em: core/instrumentacao.py
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils import timezone
+
+logger = logging.getLogger('core.instrumentacao')
+
+# Métricas da requisição em andamento (None quando a instrumentação está desligada)
+_metricas = ContextVar('metricas_requisicao', default=None)
+
+# Buffer circular (opt-in) com as consultas que mais pesaram nas últimas requisições
+_buffer = deque(maxlen=max(getattr(settings, 'INSTRUMENTACAO_BUFFER_CONSULTAS', 0), 1))
+_buffer_lock = threading.Lock()
+
+_RE_LISTA_IN = re.compile(r'IN \((?:%s, )*%s\)')
+_RE_ESPACOS = re.compile(r'\s+')
+
+
+def impressao_digital(sql):
+    """SQL já vem parametrizado (%s); só colapsamos listas IN e espaços para agrupar variações."""
+    return _RE_ESPACOS.sub(' ', _RE_LISTA_IN.sub('IN (...)', sql)).strip()
+
+
+@contextmanager
+def medir(etapa):
+    """Acumula o tempo do bloco na etapa (ex: 'pdf') da requisição atual. Sem custo se desligado."""
+    metricas = _metricas.get()
+    if metricas is None:
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metricas['etapas'][etapa] = metricas['etapas'].get(etapa, 0.0) + (time.perf_counter() - inicio) * 1000
+
+
+_serializers_instrumentados = False
+
+
+def _instrumentar_serializers():
+    """Mede o tempo de serialização do DRF envolvendo BaseSerializer.data (feito uma única vez)."""
+    global _serializers_instrumentados
+    if _serializers_instrumentados:
+        return
+    from rest_framework.serializers import BaseSerializer
+
+    data_original = BaseSerializer.data
+
+    def data(self):
+        # Só a primeira leitura serializa; as seguintes devolvem o cache _data
+        if getattr(self, '_data', None) is not None:
+            return data_original.fget(self)
+        with medir('serializer'):
+            return data_original.fget(self)
+
+    BaseSerializer.data = property(data)
+    _serializers_instrumentados = True
+
+
+def consultas_registradas():
+    """Agrega o buffer por impressão digital, da mais cara para a mais barata."""
+    with _buffer_lock:
+        entradas = list(_buffer)
+    agregado = {}
+    for entrada in entradas:
+        item = agregado.setdefault(entrada['sql'], {'sql': entrada['sql'], 'execucoes': 0, 'tempo_ms': 0.0, 'rotas': Counter()})
+        item['execucoes'] += entrada['execucoes']
+        item['tempo_ms'] += entrada['tempo_ms']
+        item['rotas'][entrada['rota']] += 1
+    resultado = sorted(agregado.values(), key=lambda item: item['tempo_ms'], reverse=True)
+    for item in resultado:
+        item['tempo_ms'] = round(item['tempo_ms'], 2)
+        item['rotas'] = dict(item['rotas'].most_common(5))
+    return resultado
+
+
+def limpar_buffer():
+    with _buffer_lock:
+        _buffer.clear()
+
+
+class InstrumentacaoMiddleware:
+    """
+    Por requisição: nº de consultas, tempo de banco, de serialização e de PDF.
+    Sai no cabeçalho Server-Timing (visível no DevTools) e numa linha de log JSON.
+    Desligado (INSTRUMENTACAO_ATIVA=False), o Django remove o middleware da cadeia.
+    """
+
+    def __init__(self, get_response):
+        global _buffer
+        if not getattr(settings, 'INSTRUMENTACAO_ATIVA', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.tamanho_buffer = getattr(settings, 'INSTRUMENTACAO_BUFFER_CONSULTAS', 0)
+        self.top_consultas = getattr(settings, 'INSTRUMENTACAO_TOP_CONSULTAS', 5)
+        if self.tamanho_buffer and _buffer.maxlen != self.tamanho_buffer:
+            with _buffer_lock:
+                _buffer = deque(_buffer, maxlen=self.tamanho_buffer)
+        _instrumentar_serializers()
+
+    def __call__(self, request):
+        metricas = {'consultas': 0, 'db_ms': 0.0, 'etapas': {}, 'por_sql': {}}
+        token = _metricas.set(metricas)
+        inicio = time.perf_counter()
+        try:
+            with connection.execute_wrapper(self._coletar(metricas)):
+                response = self.get_response(request)
+        finally:
+            _metricas.reset(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        response['Server-Timing'] = self._server_timing(metricas, total_ms)
+        self._registrar(request, response, metricas, total_ms)
+        return response
+
+    def _coletar(self, metricas):
+        guardar_sql = bool(self.tamanho_buffer)
+
+        def coletor(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duracao = (time.perf_counter() - inicio) * 1000
+                metricas['consultas'] += 1
+                metricas['db_ms'] += duracao
+                if guardar_sql:
+                    chave = impressao_digital(sql)
+                    execucoes, tempo = metricas['por_sql'].get(chave, (0, 0.0))
+                    metricas['por_sql'][chave] = (execucoes + 1, tempo + duracao)
+        return coletor
+
+    def _server_timing(self, metricas, total_ms):
+        partes = [f'db;dur={metricas["db_ms"]:.1f};desc="{metricas["consultas"]} consultas"']
+        partes += [f'{etapa};dur={duracao:.1f}' for etapa, duracao in metricas['etapas'].items()]
+        partes.append(f'total;dur={total_ms:.1f}')
+        return ', '.join(partes)
+
+    def _registrar(self, request, response, metricas, total_ms):
+        match = getattr(request, 'resolver_match', None)
+        rota = match.view_name if match else request.path
+        logger.info(json.dumps({
+            'evento': 'requisicao',
+            'metodo': request.method,
+            'rota': rota,
+            'caminho': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'db_ms': round(metricas['db_ms'], 1),
+            'consultas': metricas['consultas'],
+            **{f'{etapa}_ms': round(duracao, 1) for etapa, duracao in metricas['etapas'].items()},
+        }, ensure_ascii=False))
+
+        if not metricas['por_sql']:
+            return
+        mais_caras = sorted(metricas['por_sql'].items(), key=lambda item: item[1][1], reverse=True)[:self.top_consultas]
+        agora = timezone.now().isoformat()
+        with _buffer_lock:
+            for sql, (execucoes, tempo) in mais_caras:
+                _buffer.append({'sql': sql, 'execucoes': execucoes, 'tempo_ms': tempo, 'rota': rota, 'em': agora})
@@ -0,0 +1,194 @@
+# Em: core/management/commands/benchmark_api.py
+
+import json
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, F
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Equipamento, Evento, MaterialEvento, Usuario
+
+
+class Rollback(Exception):
+    """Desfaz as alterações de um cenário que escreve no banco (saída, retorno)."""
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    if not ordenados:
+        return None
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * (len(ordenados) - 1))))
+    return ordenados[indice]
+
+
+class Command(BaseCommand):
+    help = "Mede latência (percentis), número de consultas SQL e pico de memória dos endpoints principais e grava em JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=10)
+        parser.add_argument('--aquecimento', type=int, default=1, help="Execuções descartadas antes de medir.")
+        parser.add_argument('--saida', default=None, help="Arquivo JSON de resultado (padrão: benchmarks/benchmark-<data>.json).")
+        parser.add_argument('--cenarios', default=None, help="Lista separada por vírgulas para rodar só alguns cenários.")
+
+    def handle(self, *args, **options):
+        usuario, _ = Usuario.objects.get_or_create(username='benchmark', defaults={'role': 'admin', 'is_staff': True})
+        self.client = APIClient()
+        self.client.force_authenticate(usuario)
+        # Um endpoint quebrado vira status 500 no relatório, em vez de abortar a rodada
+        self.client.raise_request_exception = False
+
+        cenarios = self.cenarios()
+        if options['cenarios']:
+            escolhidos = set(options['cenarios'].split(','))
+            cenarios = {nome: cenario for nome, cenario in cenarios.items() if nome in escolhidos}
+        if not cenarios:
+            raise CommandError("Nenhum cenário selecionado.")
+
+        resultados = {}
+        # O cliente de teste usa o host 'testserver'
+        with override_settings(ALLOWED_HOSTS=['*']):
+            for nome, cenario in cenarios.items():
+                self.stdout.write(f"-> {nome}")
+                resultados[nome] = self.medir(cenario, options['repeticoes'], options['aquecimento'])
+
+        relatorio = {
+            'executado_em': timezone.now().isoformat(),
+            'banco': connection.vendor,
+            'repeticoes': options['repeticoes'],
+            'volumes': {
+                'eventos': Evento.objects.count(),
+                'materiais': MaterialEvento.objects.count(),
+            },
+            'resultados': resultados,
+        }
+        saida = Path(options['saida'] or Path(settings.BASE_DIR) / 'benchmarks' / f"benchmark-{timezone.now():%Y%m%d-%H%M%S}.json")
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+        for nome, resultado in resultados.items():
+            if 'erro' in resultado:
+                self.stdout.write(self.style.WARNING(f"{nome:<28} {resultado['erro']}"))
+                continue
+            self.stdout.write(
+                f"{nome:<28} p50={resultado['latencia_ms']['p50']:>9.1f}ms p95={resultado['latencia_ms']['p95']:>9.1f}ms "
+                f"consultas={resultado['consultas_sql']['max']:>6} memoria={resultado['pico_memoria_kb']['max']:>9.0f}KB"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {saida}"))
+
+    def medir(self, cenario, repeticoes, aquecimento):
+        try:
+            contexto = cenario['preparar']()
+        except Evento.DoesNotExist:
+            return {'erro': 'Sem dados para este cenário (rode gerar_dados_sinteticos).'}
+        for _ in range(aquecimento):
+            self.executar_uma_vez(cenario, contexto)
+        latencias, consultas, memoria, status_http = [], [], [], set()
+        for _ in range(repeticoes):
+            duracao, total_consultas, pico, codigo = self.executar_uma_vez(cenario, contexto)
+            latencias.append(duracao)
+            consultas.append(total_consultas)
+            memoria.append(pico)
+            status_http.add(codigo)
+        return {
+            'status_http': sorted(status_http),
+            'latencia_ms': {
+                'p50': percentil(latencias, 50), 'p90': percentil(latencias, 90), 'p95': percentil(latencias, 95),
+                'p99': percentil(latencias, 99), 'max': max(latencias), 'media': statistics.fmean(latencias),
+            },
+            'consultas_sql': {'min': min(consultas), 'max': max(consultas)},
+            'pico_memoria_kb': {'media': statistics.fmean(memoria), 'max': max(memoria)},
+        }
+
+    def executar_uma_vez(self, cenario, contexto):
+        try:
+            with transaction.atomic():
+                # Ajustes de dados antes da medição (ex: repor quantidades a sair)
+                if cenario.get('antes'):
+                    cenario['antes'](contexto)
+                tracemalloc.start()
+                try:
+                    with CaptureQueriesContext(connection) as capturadas:
+                        inicio = time.perf_counter()
+                        resposta = cenario['executar'](contexto)
+                        duracao = (time.perf_counter() - inicio) * 1000
+                    _, pico = tracemalloc.get_traced_memory()
+                finally:
+                    tracemalloc.stop()
+                if cenario.get('escreve'):
+                    raise Rollback()
+        except Rollback:
+            pass
+        return duracao, len(capturadas), pico / 1024, resposta.status_code
+
+    # --- CENÁRIOS: 'preparar' escolhe os dados uma vez, fora da medição ---
+
+    def cenarios(self):
+        client = self.client
+        sem_preparo = lambda: None
+
+        def evento_com_mais_materiais():
+            evento = Evento.objects.annotate(total=Count('materialevento')).order_by('-total').first()
+            if evento is None:
+                raise Evento.DoesNotExist
+            return evento
+
+        def com_status(status_evento):
+            evento = Evento.objects.filter(status=status_evento).order_by('-data_evento').first()
+            if evento is None:
+                raise Evento.DoesNotExist
+            return evento
+
+        def preparar_saida():
+            evento = com_status('AGUARDANDO_SAIDA')
+            return {'evento': evento, 'materiais': [{'id': m.id, 'qtd': 1} for m in MaterialEvento.objects.filter(evento=evento)]}
+
+        def repor_saida(contexto):
+            # Garante algo a sair em cada linha e estoque suficiente; desfeito no rollback
+            MaterialEvento.objects.filter(evento=contexto['evento']).update(quantidade_separada=0)
+            Equipamento.objects.filter(materialevento__evento=contexto['evento']).update(quantidade_estoque=F('quantidade_estoque') + 1000)
+
+        def preparar_retorno():
+            evento = com_status('EM_ANDAMENTO')
+            materiais = MaterialEvento.objects.filter(evento=evento)
+            return {'evento': evento, 'retornos': [
+                {'material_evento_id': m.id, 'quantidade': 1, 'condicao': 'OK' if i % 5 else 'DEFEITO'} for i, m in enumerate(materiais)
+            ]}
+
+        def repor_retorno(contexto):
+            MaterialEvento.objects.filter(evento=contexto['evento']).update(quantidade_separada=F('quantidade_separada') + 1)
+
+        def preparar_guia():
+            evento = com_status('EM_ANDAMENTO')
+            itens = [{'modelo': m.equipamento.modelo if m.equipamento else m.item_descricao, 'qtd': m.quantidade_separada}
+                     for m in MaterialEvento.objects.filter(evento=evento).select_related('equipamento')]
+            return {'evento': evento, 'itens': itens}
+
+        return {
+            'eventos_lista': {'preparar': sem_preparo, 'executar': lambda _: client.get('/api/eventos/')},
+            'eventos_lista_pagina': {'preparar': sem_preparo, 'executar': lambda _: client.get('/api/eventos/?page_size=50')},
+            'eventos_lista_expandida': {'preparar': sem_preparo, 'executar': lambda _: client.get('/api/eventos/?expand=1&page_size=50')},
+            'eventos_detalhe': {'preparar': evento_com_mais_materiais, 'executar': lambda evento: client.get(f'/api/eventos/{evento.id}/')},
+            'dashboard_stats': {'preparar': sem_preparo, 'executar': lambda _: client.get('/api/dashboard-stats/')},
+            'dar_saida': {
+                'preparar': preparar_saida, 'antes': repor_saida, 'escreve': True,
+                'executar': lambda c: client.post(f"/api/eventos/{c['evento'].id}/dar_saida/", {'materiais': c['materiais']}, format='json'),
+            },
+            'registrar_retorno': {
+                'preparar': preparar_retorno, 'antes': repor_retorno, 'escreve': True,
+                'executar': lambda c: client.post(f"/api/eventos/{c['evento'].id}/registrar_retorno/", {'retornos': c['retornos']}, format='json'),
+            },
+            'pdf_evento': {'preparar': evento_com_mais_materiais, 'executar': lambda evento: client.get(f'/api/reports/evento/{evento.id}/')},
+            'pdf_guia_saida': {
+                'preparar': preparar_guia,
+                'executar': lambda c: client.post(f"/api/reports/guia-saida/{c['evento'].id}/", {'itens': c['itens']}, format='json'),
+            },
+            'pdf_avarias': {'preparar': lambda: com_status('FINALIZADO'), 'executar': lambda evento: client.get(f'/api/reports/avarias/{evento.id}/')},
+        }
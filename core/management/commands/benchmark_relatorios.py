@@ -0,0 +1,98 @@
+# Em: core/management/commands/benchmark_relatorios.py
+
+import json
+import statistics
+import time
+import tracemalloc
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.utils import timezone
+from pypdf import PdfReader
+
+from core import relatorios
+from core.models import Evento, ItemRetornado
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark dos PDFs: tempo por página e alocação de memória de cada relatório, gravados em JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticoes', type=int, default=20)
+        parser.add_argument('--aquecimento', type=int, default=2, help="Execuções descartadas antes de medir.")
+        parser.add_argument('--evento', type=int, default=None, help="Operação usada (padrão: a com mais materiais).")
+        parser.add_argument('--itens', type=int, default=60, help="Linhas nas guias de saída e de reforço.")
+        parser.add_argument('--saida', default=None, help="Arquivo JSON de resultado (padrão: benchmarks/relatorios-<data>.json).")
+
+    def handle(self, *args, **options):
+        evento = self.escolher_evento(options['evento'])
+        itens = [{'modelo': f"Equipamento {i}", 'qtd': i % 7 + 1} for i in range(options['itens'])]
+        cenarios = {
+            'evento': lambda: relatorios.relatorio_evento(evento.id),
+            'guia_saida': lambda: relatorios.guia_saida(evento.id, itens),
+            'guia_reforco': lambda: relatorios.guia_reforco(evento.id, itens),
+        }
+        avariado = ItemRetornado.objects.exclude(condicao='OK').values_list('material_evento__evento_id', flat=True).first()
+        if avariado:
+            cenarios['avarias'] = lambda: relatorios.relatorio_avarias(avariado)
+
+        resultados = {}
+        for nome, gerar in cenarios.items():
+            self.stdout.write(f"-> {nome}")
+            resultados[nome] = self.medir(gerar, options['repeticoes'], options['aquecimento'])
+
+        relatorio = {
+            'executado_em': timezone.now().isoformat(),
+            'evento': evento.id,
+            'repeticoes': options['repeticoes'],
+            'resultados': resultados,
+        }
+        saida = Path(options['saida'] or Path(settings.BASE_DIR) / 'benchmarks' / f"relatorios-{timezone.now():%Y%m%d-%H%M%S}.json")
+        saida.parent.mkdir(parents=True, exist_ok=True)
+        saida.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+        for nome, resultado in resultados.items():
+            self.stdout.write(
+                f"{nome:<14} {resultado['paginas']:>3} pág  mediana {resultado['mediana_ms']:>8.1f} ms  "
+                f"{resultado['ms_por_pagina']:>7.1f} ms/pág  alocado {resultado['alocado_kb']:>8.0f} KB"
+            )
+        self.stdout.write(self.style.SUCCESS(f"Resultado gravado em {saida}"))
+
+    def escolher_evento(self, evento_id):
+        if evento_id:
+            try:
+                return Evento.objects.get(pk=evento_id)
+            except Evento.DoesNotExist:
+                raise CommandError(f"Operação {evento_id} não encontrada.")
+        evento = Evento.objects.annotate(n=Count('materialevento')).order_by('-n').first()
+        if evento is None:
+            raise CommandError("Nenhuma operação no banco. Rode gerar_dados_sinteticos antes.")
+        return evento
+
+    def medir(self, gerar, repeticoes, aquecimento):
+        for _ in range(aquecimento):
+            gerar()
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            _, pdf = gerar()
+            tempos.append((time.perf_counter() - inicio) * 1000)
+
+        # Memória medida à parte: o tracemalloc deixa a geração bem mais lenta
+        tracemalloc.start()
+        gerar()
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        paginas = len(PdfReader(BytesIO(pdf)).pages)
+        mediana = statistics.median(tempos)
+        return {
+            'paginas': paginas,
+            'mediana_ms': round(mediana, 2),
+            'media_ms': round(statistics.mean(tempos), 2),
+            'ms_por_pagina': round(mediana / paginas, 2),
+            'alocado_kb': round(pico / 1024, 1),
+        }
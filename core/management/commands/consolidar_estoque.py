@@ -0,0 +1,26 @@
+# Em: core/management/commands/consolidar_estoque.py
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import movimentacoes
+
+
+class Command(BaseCommand):
+    help = "Grava a fotografia diária do estoque (SaldoEstoque) a partir do razão. Agende uma vez por dia, logo após a meia-noite."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--data', default=None, help="Dia a consolidar, AAAA-MM-DD (padrão: ontem).")
+
+    def handle(self, *args, **options):
+        if options['data']:
+            try:
+                data = datetime.strptime(options['data'], '%Y-%m-%d').date()
+            except ValueError:
+                raise CommandError("Data inválida. Use o formato AAAA-MM-DD.")
+        else:
+            data = timezone.localdate() - timedelta(days=1)
+        total = movimentacoes.consolidar(data)
+        self.stdout.write(self.style.SUCCESS(f"Saldo de {total} equipamento(s) consolidado em {data:%d/%m/%Y}."))
@@ -0,0 +1,152 @@
+# Em: core/management/commands/gerar_dados_sinteticos.py
+
+import random
+from datetime import date, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from core.models import (
+    Cliente, Equipamento, Evento, Funcionario, Veiculo, MaterialEvento, ItemRetornado,
+    RegistroManutencao, SequenciaOS, EscalaFuncionario, MovimentacaoEstoque,
+)
+
+# Volumes de referência (escala 1.0), próximos do que esperamos em produção em alguns anos
+VOLUMES_PADRAO = {
+    'clientes': 1_000,
+    'funcionarios': 300,
+    'veiculos': 40,
+    'equipamentos': 3_000,
+    'eventos': 50_000,
+    'materiais': 2_000_000,
+    'retornos': 500_000,
+    'manutencoes': 100_000,
+}
+
+MODELOS = ['Moving Beam', 'Par LED', 'Elipsoidal', 'Strobo', 'Cabo DMX', 'Prolonga', 'Box Truss', 'Mesa de Luz', 'Máquina de Fumaça', 'Painel de LED']
+
+
+class Command(BaseCommand):
+    help = "Gera dados sintéticos em escala de produção para benchmarks (NÃO usar no banco de produção)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', type=float, default=1.0, help="Multiplicador sobre os volumes padrão (ex: 0.01 para um teste rápido).")
+        for nome, valor in VOLUMES_PADRAO.items():
+            parser.add_argument(f'--{nome}', type=int, default=None, help=f"Quantidade de {nome} (padrão: {valor:,} x escala).")
+        parser.add_argument('--lote', type=int, default=5_000, help="Tamanho de cada bulk_create.")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.lote = options['lote']
+        volumes = {
+            nome: options[nome] if options[nome] is not None else max(1, int(valor * options['escala']))
+            for nome, valor in VOLUMES_PADRAO.items()
+        }
+        self.stdout.write(f"Gerando: {volumes}")
+
+        clientes = self.criar(Cliente, (
+            Cliente(empresa=f"Cliente Sintético {i}", representante=f"Representante {i}") for i in range(volumes['clientes'])
+        ), volumes['clientes'])
+        funcionarios = self.criar(Funcionario, (
+            Funcionario(nome=f"Técnico {i}", funcao='Técnico', email=f"tecnico{i}@sintetico.local") for i in range(volumes['funcionarios'])
+        ), volumes['funcionarios'])
+        self.criar(Veiculo, (
+            Veiculo(nome=f"Caminhão {i}", placa=f"SIN{i:04d}") for i in range(volumes['veiculos'])
+        ), volumes['veiculos'])
+        categorias = [categoria for categoria, _ in Equipamento.CATEGORIAS]
+        equipamentos = self.criar(Equipamento, (
+            Equipamento(
+                modelo=f"{random.choice(MODELOS)} {i}", categoria=random.choice(categorias),
+                quantidade_estoque=random.randint(0, 400), quantidade_manutencao=random.randint(0, 10),
+            ) for i in range(volumes['equipamentos'])
+        ), volumes['equipamentos'])
+        # bulk_create não dispara signals: o razão do estoque começa com o saldo de cada equipamento
+        self.criar(MovimentacaoEstoque, (
+            MovimentacaoEstoque(equipamento_id=equipamento_id, origem='AJUSTE', delta_estoque=estoque, delta_manutencao=manutencao, observacao='Saldo inicial sintético')
+            for equipamento_id, estoque, manutencao in Equipamento.objects.filter(
+                pk__range=(min(equipamentos), max(equipamentos))
+            ).values_list('id', 'quantidade_estoque', 'quantidade_manutencao').iterator()
+        ), volumes['equipamentos'], guardar_ids=False)
+
+        status_pesos = [('FINALIZADO', 70), ('CANCELADO', 5), ('PLANEJAMENTO', 8), ('AGUARDANDO_CONFERENCIA', 5), ('AGUARDANDO_SAIDA', 5), ('EM_ANDAMENTO', 7)]
+        status_evento = [s for s, _ in status_pesos]
+        pesos = [p for _, p in status_pesos]
+        hoje = date.today()
+
+        def novo_evento(i):
+            inicio = hoje - timedelta(days=random.randint(-60, 5 * 365))
+            return Evento(
+                nome=f"Operação Sintética {i}", cliente_id=random.choice(clientes), local='Local sintético',
+                status=random.choices(status_evento, pesos)[0],
+                data_montagem=inicio - timedelta(days=1), data_evento=inicio, data_termino=inicio + timedelta(days=random.randint(0, 4)),
+                chefe_de_equipe_id=random.choice(funcionarios),
+            )
+        eventos = self.criar(Evento, (novo_evento(i) for i in range(volumes['eventos'])), volumes['eventos'])
+
+        def escalas():
+            for evento_id in eventos:
+                for funcionario_id in random.sample(funcionarios, min(3, len(funcionarios))):
+                    yield EscalaFuncionario(evento_id=evento_id, funcionario_id=funcionario_id, data_inicio=hoje, hora_inicio=time(8), data_fim=hoje, hora_fim=time(18))
+        self.criar(EscalaFuncionario, escalas(), len(eventos) * min(3, len(funcionarios)), guardar_ids=False)
+
+        def materiais():
+            for i in range(volumes['materiais']):
+                quantidade = random.randint(1, 40)
+                yield MaterialEvento(
+                    evento_id=eventos[i % len(eventos)], equipamento_id=random.choice(equipamentos),
+                    quantidade=quantidade, quantidade_separada=quantidade, conferido=True,
+                )
+        self.criar(MaterialEvento, materiais(), volumes['materiais'], guardar_ids=False)
+        faixa = MaterialEvento.objects.aggregate(menor=Min('id'), maior=Max('id'))
+
+        condicoes = ['OK'] * 8 + ['DEFEITO', 'QUEBRADO', 'PERDIDO']
+
+        def retornos():
+            for _ in range(volumes['retornos']):
+                yield ItemRetornado(
+                    material_evento_id=random.randint(faixa['menor'], faixa['maior']),
+                    quantidade=random.randint(1, 5), condicao=random.choice(condicoes), observacao='',
+                )
+        self.criar(ItemRetornado, retornos(), volumes['retornos'], guardar_ids=False)
+        # bulk_create não passa pelos signals que mantêm os contadores de retorno
+        MaterialEvento.objects.recalcular_retornos()
+        Evento.objects.recalcular_avarias()
+
+        ano, numeros = SequenciaOS.reservar(volumes['manutencoes'])
+        numeros = iter(numeros)
+        status_os = [s for s, _ in RegistroManutencao.STATUS_MANUTENCAO]
+
+        def manutencoes():
+            for _ in range(volumes['manutencoes']):
+                yield RegistroManutencao(
+                    os_number=SequenciaOS.formatar(ano, next(numeros)), equipamento_id=random.choice(equipamentos),
+                    status=random.choice(status_os), descricao_problema='Problema sintético',
+                )
+        self.criar(RegistroManutencao, manutencoes(), volumes['manutencoes'], guardar_ids=False)
+
+        self.stdout.write(self.style.SUCCESS("Dados sintéticos gerados."))
+
+    def criar(self, model, objetos, total, guardar_ids=True):
+        """bulk_create em lotes a partir de um gerador, sem montar tudo em memória."""
+        ids = []
+        criados = 0
+        lote = []
+        for objeto in objetos:
+            lote.append(objeto)
+            if len(lote) >= self.lote:
+                criados += self._gravar(model, lote, ids, guardar_ids)
+                lote = []
+                self.stdout.write(f"  {model._meta.verbose_name_plural}: {criados:,}/{total:,}", ending='\r')
+        if lote:
+            criados += self._gravar(model, lote, ids, guardar_ids)
+        self.stdout.write(f"  {model._meta.verbose_name_plural}: {criados:,}/{total:,}")
+        return ids
+
+    def _gravar(self, model, lote, ids, guardar_ids):
+        with transaction.atomic():
+            criados = model.objects.bulk_create(lote)
+        if guardar_ids:
+            ids.extend(objeto.pk for objeto in criados)
+        return len(criados)
@@ -0,0 +1,28 @@
+# Em: core/management/commands/gerar_derivados_fotos.py
+
+from django.core.management.base import BaseCommand
+
+from core import imagens
+from core.models import FotoPreEvento
+
+
+class Command(BaseCommand):
+    help = "Gera miniatura e versão de impressão das fotos do pré-evento que ainda não têm (ou refaz todas com --refazer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refazer', action='store_true', help="Regera mesmo quando o derivado já existe.")
+
+    def handle(self, *args, **options):
+        gerados = falhas = 0
+        for foto in FotoPreEvento.objects.exclude(imagem='').iterator():
+            for tamanho in imagens.TAMANHOS:
+                try:
+                    if options['refazer']:
+                        imagens.gerar_derivado(foto.imagem, tamanho)
+                    else:
+                        imagens.obter_derivado(foto.imagem, tamanho)
+                    gerados += 1
+                except OSError as e:
+                    falhas += 1
+                    self.stderr.write(f"Foto {foto.pk} ({foto.imagem.name}): {e}")
+        self.stdout.write(self.style.SUCCESS(f"{gerados} derivado(s) prontos, {falhas} falha(s)."))
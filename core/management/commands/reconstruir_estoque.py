@@ -0,0 +1,23 @@
+# Em: core/management/commands/reconstruir_estoque.py
+
+from django.core.management.base import BaseCommand
+
+from core import movimentacoes
+
+
+class Command(BaseCommand):
+    help = "Recalcula quantidade_estoque e quantidade_manutencao de todos os equipamentos a partir do razão de movimentações."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true', help="Só lista as divergências, sem corrigir.")
+
+    def handle(self, *args, **options):
+        divergentes = movimentacoes.reconstruir_contadores(aplicar=not options['verificar'])
+        for equipamento, atuais, esperados in divergentes:
+            self.stdout.write(f"{equipamento.pk} {equipamento.modelo}: estoque/manutenção {atuais[0]}/{atuais[1]} -> {esperados[0]}/{esperados[1]}")
+        if not divergentes:
+            self.stdout.write(self.style.SUCCESS("Contadores conferem com o razão."))
+        elif options['verificar']:
+            self.stdout.write(self.style.WARNING(f"{len(divergentes)} equipamento(s) divergente(s); rode sem --verificar para corrigir."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(divergentes)} equipamento(s) corrigido(s)."))
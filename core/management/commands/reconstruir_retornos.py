@@ -0,0 +1,60 @@
+# Em: core/management/commands/reconstruir_retornos.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Q, Sum
+
+from core import dashboard
+from core.models import Evento, MaterialEvento
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula, a partir dos itens retornados, os contadores de retorno dos materiais "
+        "(quantidade_retornada_ok/defeito) e o resumo de avarias das operações."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--evento', type=int, default=None, help="Só esta operação e os seus materiais.")
+        parser.add_argument('--verificar', action='store_true', help="Só lista as divergências, sem corrigir.")
+
+    def handle(self, *args, **options):
+        materiais = MaterialEvento.objects.all()
+        eventos = Evento.objects.all()
+        if options['evento']:
+            materiais = materiais.filter(evento_id=options['evento'])
+            eventos = eventos.filter(pk=options['evento'])
+
+        with transaction.atomic():
+            divergentes = [
+                (f"Material {pk}", "ok/avaria", atuais, esperados) for pk, atuais, esperados in self.comparar(materiais, {
+                    'quantidade_retornada_ok': Q(itens_retornados__condicao='OK'),
+                    'quantidade_retornada_defeito': ~Q(itens_retornados__condicao='OK'),
+                }, 'itens_retornados__quantidade')
+            ] + [
+                (f"Operação {pk}", "defeito/quebrado/perdido", atuais, esperados) for pk, atuais, esperados in self.comparar(eventos, {
+                    campo: Q(materialevento__itens_retornados__condicao=condicao) for condicao, campo in Evento.CONTADORES_AVARIA.items()
+                }, 'materialevento__itens_retornados__quantidade')
+            ]
+            if divergentes and not options['verificar']:
+                materiais.recalcular_retornos()
+                eventos.recalcular_avarias()
+                # tem_avarias decide se uma operação finalizada aparece no painel
+                transaction.on_commit(dashboard.invalidar_lista_eventos)
+
+        for nome, rotulo, atuais, esperados in divergentes:
+            self.stdout.write(f"{nome}: {rotulo} {'/'.join(map(str, atuais))} -> {'/'.join(map(str, esperados))}")
+        if not divergentes:
+            self.stdout.write(self.style.SUCCESS("Contadores de retorno conferem com os itens retornados."))
+        elif options['verificar']:
+            self.stdout.write(self.style.WARNING(f"{len(divergentes)} divergência(s); rode sem --verificar para corrigir."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"{len(divergentes)} divergência(s) corrigida(s)."))
+
+    def comparar(self, queryset, filtros, caminho_quantidade):
+        """[(pk, valores gravados, valores somados dos retornos)] das linhas em que eles diferem."""
+        esperados = {f"esperado_{campo}": Sum(caminho_quantidade, filter=filtro, default=0) for campo, filtro in filtros.items()}
+        linhas = queryset.annotate(**esperados).exclude(
+            **{campo: F(f"esperado_{campo}") for campo in filtros}
+        ).values_list('pk', *filtros, *esperados).order_by('pk')
+        return [(pk, valores[:len(filtros)], valores[len(filtros):]) for pk, *valores in linhas]
@@ -0,0 +1,114 @@
+# Em: core/metricas.py
+
+import hmac
+import ipaddress
+import os
+
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseForbidden
+from django_prometheus.exports import ExportToDjangoView
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Latência por rota e contadores de SQL vêm do django_prometheus (middlewares e backend de banco);
+# aqui ficam só as métricas do domínio da operação.
+
+itens_despachados = Counter(
+    'novalite_itens_despachados_total',
+    'Unidades de equipamento que saíram do estoque para operações.',
+    ['origem'],
+)
+
+itens_retornados = Counter(
+    'novalite_itens_retornados_total',
+    'Unidades que voltaram de operações, por condição.',
+    ['condicao'],
+)
+
+duracao_pdf = Histogram(
+    'novalite_pdf_geracao_segundos',
+    'Tempo de montagem dos PDFs (ReportLab).',
+    ['relatorio'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+
+
+class ManutencoesAbertasCollector:
+    """Ordens de serviço abertas por status, lidas do banco a cada coleta (um GROUP BY)."""
+
+    def _familia(self):
+        return GaugeMetricFamily(
+            'novalite_manutencoes_abertas', 'Ordens de serviço ainda não reparadas, por status.', labels=['status'],
+        )
+
+    def describe(self):
+        # Sem isso o registry chamaria collect() (e o banco) já no registro, durante o ready()
+        yield self._familia()
+
+    def collect(self):
+        from .models import RegistroManutencao
+
+        metrica = self._familia()
+        totais = dict(
+            RegistroManutencao.objects.filter(status__in=RegistroManutencao.STATUS_ABERTOS)
+            .values_list('status').annotate(total=Count('id')).order_by()
+        )
+        for status in RegistroManutencao.STATUS_ABERTOS:
+            metrica.add_metric([status], totais.get(status, 0))
+        yield metrica
+
+
+_collector_registrado = False
+
+
+def registrar_collectors():
+    """Chamado no ready() do app; idempotente para não duplicar no registry global."""
+    global _collector_registrado
+    # No modo multiprocesso o registry global não é exportado; o collector entra no da coleta
+    if not _collector_registrado and not _multiprocesso():
+        REGISTRY.register(ManutencoesAbertasCollector())
+        _collector_registrado = True
+
+
+# --- EXPORTAÇÃO (/metrics) ---
+# Com vários workers (gunicorn), cada processo tem os próprios contadores: a coleta precisa
+# do modo multiprocesso do prometheus_client (PROMETHEUS_MULTIPROC_DIR, ver gunicorn.conf.py),
+# que soma os arquivos de todos os workers. Aí o collector do banco roda só no worker que
+# atende a coleta, uma vez por coleta.
+
+def _multiprocesso():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def _registry_multiprocesso():
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(ManutencoesAbertasCollector())
+    return registry
+
+
+def _ip_permitido(endereco):
+    try:
+        ip = ipaddress.ip_address(endereco)
+    except ValueError:
+        return False
+    return any(ip in ipaddress.ip_network(rede, strict=False) for rede in settings.METRICAS_IPS_PERMITIDOS)
+
+
+def _acesso_permitido(request):
+    if _ip_permitido(request.META.get('REMOTE_ADDR', '')):
+        return True
+    if settings.METRICAS_TOKEN and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {settings.METRICAS_TOKEN}'):
+        return True
+    usuario = getattr(request, 'user', None)
+    return usuario is not None and usuario.is_authenticated and usuario.is_staff
+
+
+def exportar(request):
+    """/metrics para o Prometheus: só IPs de METRICAS_IPS_PERMITIDOS, quem traz o METRICAS_TOKEN ou admin logado."""
+    if not _acesso_permitido(request):
+        return HttpResponseForbidden()
+    if _multiprocesso():
+        return HttpResponse(generate_latest(_registry_multiprocesso()), content_type=CONTENT_TYPE_LATEST)
+    return ExportToDjangoView(request)
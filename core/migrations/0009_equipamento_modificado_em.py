@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_remove_evento_equipe_escalafuncionario'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipamento',
+            name='modificado_em',
+            field=models.DateTimeField(auto_now=True, verbose_name='Última Modificação'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_equipamento_modificado_em'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaOS',
+            fields=[
+                ('ano', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('ultimo_numero', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequência de O.S.',
+                'verbose_name_plural': 'Sequências de O.S.',
+            },
+        ),
+    ]
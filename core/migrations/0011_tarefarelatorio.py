@@ -0,0 +1,38 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:37
+
+import core.models
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_sequenciaos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TarefaRelatorio',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tipo', models.CharField(max_length=30)),
+                ('parametros', models.JSONField(default=dict)),
+                ('status', models.CharField(choices=[('PENDENTE', 'Na Fila'), ('PROCESSANDO', 'Gerando'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro')], default='PENDENTE', max_length=20)),
+                ('arquivo', models.FileField(blank=True, storage=core.models.armazenamento_relatorios, upload_to='tarefas/')),
+                ('nome_arquivo', models.CharField(blank=True, max_length=255)),
+                ('erro', models.TextField(blank=True)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('iniciado_em', models.DateTimeField(blank=True, null=True)),
+                ('concluido_em', models.DateTimeField(blank=True, null=True)),
+                ('solicitado_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tarefas_relatorio', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Tarefa de Relatório',
+                'verbose_name_plural': 'Tarefas de Relatório',
+                'ordering': ['-criado_em'],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_tarefarelatorio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarefarelatorio',
+            name='progresso',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='tarefarelatorio',
+            name='total',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
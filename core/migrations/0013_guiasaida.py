@@ -0,0 +1,47 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:49
+
+import core.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_tarefarelatorio_progresso'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaGuia',
+            fields=[
+                ('ano', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('ultimo_numero', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequência de Guias',
+                'verbose_name_plural': 'Sequências de Guias',
+            },
+        ),
+        migrations.CreateModel(
+            name='GuiaSaida',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero', models.CharField(max_length=20, unique=True)),
+                ('tipo', models.CharField(choices=[('SAIDA', 'Saída de Material'), ('REFORCO', 'Reforço')], max_length=10)),
+                ('itens', models.JSONField(default=list)),
+                ('emitida_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sha256', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('arquivo', models.FileField(blank=True, storage=core.models.armazenamento_relatorios, upload_to='guias/')),
+                ('emitida_por', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='guias_emitidas', to=settings.AUTH_USER_MODEL)),
+                ('evento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='guias', to='core.evento')),
+            ],
+            options={
+                'verbose_name': 'Guia de Saída',
+                'verbose_name_plural': 'Guias de Saída',
+                'ordering': ['-emitida_em'],
+            },
+        ),
+    ]
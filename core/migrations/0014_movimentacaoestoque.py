@@ -0,0 +1,67 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:52
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def saldo_inicial(apps, schema_editor):
+    # O razão começa com os contadores atuais de cada equipamento, como um ajuste
+    Equipamento = apps.get_model('core', 'Equipamento')
+    MovimentacaoEstoque = apps.get_model('core', 'MovimentacaoEstoque')
+    MovimentacaoEstoque.objects.bulk_create([
+        MovimentacaoEstoque(
+            equipamento_id=equipamento_id, origem='AJUSTE', delta_estoque=estoque, delta_manutencao=manutencao,
+            observacao='Saldo inicial do razão',
+        )
+        for equipamento_id, estoque, manutencao in Equipamento.objects.values_list('id', 'quantidade_estoque', 'quantidade_manutencao').iterator()
+        if estoque or manutencao
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_guiasaida'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentacaoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('origem', models.CharField(choices=[('AJUSTE', 'Cadastro / Ajuste Manual'), ('SAIDA', 'Saída para Operação'), ('REFORCO', 'Reforço para Operação'), ('RETORNO', 'Retorno de Operação'), ('ENVIO_MANUTENCAO', 'Envio para Manutenção'), ('RETORNO_MANUTENCAO', 'Retorno da Manutenção'), ('REPARO', 'O.S. Reparada')], max_length=20)),
+                ('delta_estoque', models.IntegerField(default=0)),
+                ('delta_manutencao', models.IntegerField(default=0)),
+                ('observacao', models.CharField(blank=True, max_length=255)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('equipamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimentacoes', to='core.equipamento')),
+                ('evento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimentacoes_estoque', to='core.evento')),
+                ('registro_manutencao', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimentacoes_estoque', to='core.registromanutencao')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimentacoes_estoque', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Movimentação de Estoque',
+                'verbose_name_plural': 'Movimentações de Estoque',
+                'ordering': ['criado_em', 'id'],
+                'indexes': [models.Index(fields=['equipamento', 'criado_em'], name='mov_estoque_equip_data')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SaldoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField()),
+                ('quantidade_estoque', models.IntegerField()),
+                ('quantidade_manutencao', models.IntegerField()),
+                ('equipamento', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='core.equipamento')),
+            ],
+            options={
+                'verbose_name': 'Saldo de Estoque',
+                'verbose_name_plural': 'Saldos de Estoque',
+                'unique_together': {('equipamento', 'data')},
+            },
+        ),
+        migrations.RunPython(saldo_inicial, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:56
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_contadores(apps, schema_editor):
+    # Mesma conta de MaterialEventoQuerySet.recalcular_retornos (o manager customizado não existe aqui)
+    MaterialEvento = apps.get_model('core', 'MaterialEvento')
+    ItemRetornado = apps.get_model('core', 'ItemRetornado')
+    retornos = ItemRetornado.objects.filter(material_evento=OuterRef('pk')).order_by().values('material_evento')
+
+    def soma(consulta):
+        return Coalesce(Subquery(consulta.annotate(total=Sum('quantidade')).values('total')), Value(0))
+
+    MaterialEvento.objects.filter(pk__in=ItemRetornado.objects.values('material_evento')).update(
+        quantidade_retornada_ok=soma(retornos.filter(condicao='OK')),
+        quantidade_retornada_defeito=soma(retornos.exclude(condicao='OK')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_movimentacaoestoque'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialevento',
+            name='quantidade_retornada_defeito',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Qtd. Retornada com Avaria'),
+        ),
+        migrations.AddField(
+            model_name='materialevento',
+            name='quantidade_retornada_ok',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Qtd. Retornada OK'),
+        ),
+        migrations.RunPython(preencher_contadores, migrations.RunPython.noop),
+    ]
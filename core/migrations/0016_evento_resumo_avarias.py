@@ -0,0 +1,58 @@
+# Generated by Django 5.2.2 on 2026-10-18 09:58
+
+from django.db import migrations, models
+from django.db.models import Exists, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def preencher_avarias(apps, schema_editor):
+    # Mesma conta de EventoQuerySet.recalcular_avarias, só para as operações que têm avarias
+    Evento = apps.get_model('core', 'Evento')
+    ItemRetornado = apps.get_model('core', 'ItemRetornado')
+    avarias = ItemRetornado.objects.exclude(condicao='OK')
+    retornos = avarias.filter(material_evento__evento=OuterRef('pk')).order_by().values('material_evento__evento')
+
+    def soma(condicao):
+        return Coalesce(Subquery(retornos.filter(condicao=condicao).annotate(total=Sum('quantidade')).values('total')), Value(0))
+
+    Evento.objects.filter(pk__in=avarias.values('material_evento__evento')).update(
+        tem_avarias=Exists(retornos),
+        itens_com_defeito=soma('DEFEITO'),
+        itens_quebrados=soma('QUEBRADO'),
+        itens_perdidos=soma('PERDIDO'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_materialevento_contadores_retorno'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evento',
+            name='itens_com_defeito',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Itens com Defeito'),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='itens_perdidos',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Itens Perdidos'),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='itens_quebrados',
+            field=models.IntegerField(default=0, editable=False, verbose_name='Itens Quebrados'),
+        ),
+        migrations.AddField(
+            model_name='evento',
+            name='tem_avarias',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Retornou com Avarias'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['status', 'tem_avarias'], name='evento_status_avarias'),
+        ),
+        migrations.RunPython(preencher_avarias, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_evento_resumo_avarias'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(fields=['status', 'data_evento'], name='evento_status_data'),
+        ),
+        migrations.AddIndex(
+            model_name='funcionario',
+            index=models.Index(fields=['email'], name='funcionario_email'),
+        ),
+        migrations.AddIndex(
+            model_name='itemretornado',
+            index=models.Index(fields=['material_evento', 'condicao'], name='retorno_material_condicao'),
+        ),
+        migrations.AddIndex(
+            model_name='itemretornado',
+            index=models.Index(fields=['condicao', 'data_retorno'], name='retorno_condicao_data'),
+        ),
+        migrations.AddIndex(
+            model_name='registromanutencao',
+            index=models.Index(fields=['status', 'data_entrada'], name='manutencao_status_entrada'),
+        ),
+        migrations.AddIndex(
+            model_name='registromanutencao',
+            index=models.Index(fields=['status', 'data_saida'], name='manutencao_status_saida'),
+        ),
+    ]
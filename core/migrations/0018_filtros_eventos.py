@@ -0,0 +1,26 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:07
+
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('data_termino', 'data_evento'), django.db.models.functions.comparison.Coalesce('data_montagem', 'data_evento'), name='evento_janela'),
+        ),
+        migrations.AddIndex(
+            model_name='evento',
+            index=models.Index(django.db.models.functions.comparison.Coalesce('data_montagem', 'data_evento'), name='evento_janela_inicio'),
+        ),
+        migrations.AddIndex(
+            model_name='materialevento',
+            index=models.Index(fields=['status_suprimento', 'evento'], name='material_suprimento_evento'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 10:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_filtros_eventos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guiasaida',
+            name='dados',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -1,8 +1,17 @@
 # Em: core/models.py (Versão Final com Confirmação de Presença)
 
-from django.db import models
+import operator
+import os
+import uuid
+from functools import reduce
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import models, transaction
 from django.contrib.auth.models import AbstractUser, Group, Permission
-from django.db.models import Sum
+from django.db.models import Case, Count, Exists, F, OuterRef, Prefetch, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan
 from django.utils import timezone
 
 class Cliente(models.Model):
@@ -27,6 +36,7 @@ class Equipamento(models.Model):
     quantidade_estoque = models.IntegerField(default=0)
     quantidade_manutencao = models.IntegerField(default=0)
     peso = models.FloatField(default=0.0, blank=True, null=True)
+    modificado_em = models.DateTimeField(auto_now=True, verbose_name="Última Modificação")
     class Meta:
         verbose_name = "Equipamento"
         verbose_name_plural = "Equipamentos"
@@ -62,6 +72,10 @@ class Funcionario(models.Model):
         verbose_name = "Funcionário"
         verbose_name_plural = "Funcionários"
         ordering = ['nome']
+        indexes = [
+            # Usuário logado -> funcionário (Meus Eventos, ponto, confirmação de presença)
+            models.Index(fields=['email'], name='funcionario_email'),
+        ]
     def __str__(self):
         return self.nome
 
@@ -108,7 +122,123 @@ class Usuario(AbstractUser):
         related_query_name="user",
     )
 
-class Evento(models.Model):
+class ContadoresDesnormalizadosMixin:
+    """
+    Campos em 'campos_contadores' só mudam por UPDATE com F(). Um save() de uma
+    instância já existente grava os demais campos e deixa esses de fora: uma
+    instância lida antes de um retorno não desfaz o que ele somou. Uma linha
+    nova (inclusive a cópia de outra, com pk=None) começa com eles zerados.
+    """
+    campos_contadores = ()
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or self.pk is None:
+            for nome in self.campos_contadores:
+                setattr(self, nome, self._meta.get_field(nome).get_default())
+        elif not args and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.campos_contadores
+            ]
+        super().save(*args, **kwargs)
+
+def _somas_por_linha(campos):
+    """
+    {campo: {pk: variação}} -> argumentos de update() que somam a cada linha a
+    sua variação (campo = campo + CASE pk WHEN ... END), tudo numa UPDATE.
+    """
+    def variacao(totais):
+        totais = {pk: total for pk, total in totais.items() if total}
+        if not totais:
+            return Value(0)
+        return Case(*(When(pk=pk, then=Value(total)) for pk, total in totais.items()), default=Value(0))
+
+    return {campo: F(campo) + variacao(totais) for campo, totais in campos.items()}
+
+class EventoQuerySet(models.QuerySet):
+    def marcar_modificados(self):
+        # Atualiza a versão (modificado_em) sem passar pelo save(); usado quando linhas filhas mudam
+        return self.update(modificado_em=timezone.now())
+
+    def somar_avarias(self, variacoes):
+        """
+        Aplica variações (evento_id, condicao, quantidade) de itens que voltaram
+        avariados nos contadores por condição e recalcula tem_avarias na mesma
+        UPDATE (no SET, os F() ainda enxergam os valores anteriores).
+        """
+        campos = {campo: {} for campo in Evento.CONTADORES_AVARIA.values()}
+        for evento_id, condicao, quantidade in variacoes:
+            totais = campos[Evento.CONTADORES_AVARIA[condicao]]
+            totais[evento_id] = totais.get(evento_id, 0) + quantidade
+        somas = _somas_por_linha(campos)
+        evento_ids = {evento_id for totais in campos.values() for evento_id in totais}
+        if not evento_ids:
+            return 0
+        return self.filter(pk__in=evento_ids).update(
+            **somas, tem_avarias=GreaterThan(reduce(operator.add, somas.values()), 0),
+        )
+
+    def recalcular_avarias(self):
+        """Refaz tem_avarias e os contadores por condição a partir dos ItemRetornado (comando reconstruir_retornos)."""
+        retornos = ItemRetornado.objects.filter(material_evento__evento=OuterRef('pk')).order_by().values('material_evento__evento')
+
+        def soma(condicao):
+            return Coalesce(Subquery(retornos.filter(condicao=condicao).annotate(total=Sum('quantidade')).values('total')), Value(0))
+
+        return self.update(
+            **{campo: soma(condicao) for condicao, campo in Evento.CONTADORES_AVARIA.items()},
+            tem_avarias=Exists(ItemRetornado.objects.filter(material_evento__evento=OuterRef('pk'), condicao__in=ItemRetornado.CONDICOES_AVARIA)),
+        )
+
+    def na_janela(self, inicio=None, fim=None):
+        """
+        Operações cuja janela (montagem…término, ver Evento.janela) cruza
+        [inicio, fim]; qualquer um dos limites pode faltar. As expressões são as
+        do índice 'evento_janela', para o banco conseguir usá-lo.
+        """
+        consulta = self.alias(janela_inicio=Evento.JANELA_INICIO, janela_fim=Evento.JANELA_FIM)
+        if inicio is not None:
+            consulta = consulta.filter(janela_fim__gte=inicio)
+        if fim is not None:
+            consulta = consulta.filter(janela_inicio__lte=fim)
+        return consulta
+
+    def com_detalhes(self):
+        """
+        Carrega de uma vez tudo o que o EventoSerializer percorre (materiais,
+        retornos, escala, frota, consumíveis e presenças), para que a listagem
+        faça um número fixo de consultas independente da quantidade de eventos.
+        """
+        return self.select_related('cliente', 'criado_por', 'chefe_de_equipe').prefetch_related(
+            Prefetch('materialevento_set', queryset=MaterialEvento.objects.select_related('equipamento').prefetch_related('itens_retornados')),
+            Prefetch('escala_equipe', queryset=EscalaFuncionario.objects.select_related('funcionario')),
+            Prefetch('consumiveis_set', queryset=ConsumivelEvento.objects.select_related('consumivel')),
+            Prefetch('confirmacoes_presenca', queryset=ConfirmacaoPresenca.objects.select_related('funcionario')),
+            'veiculos',
+        )
+
+    def com_resumo(self):
+        """
+        Versão enxuta para listagens: só as FKs exibidas e contadores pré-calculados
+        via subconsultas (sem JOINs que multiplicariam as somas).
+        """
+        def soma(queryset, campo):
+            total = queryset.filter(evento=OuterRef('pk')).order_by().values('evento').annotate(total=Sum(campo)).values('total')
+            return Coalesce(Subquery(total), Value(0))
+
+        def contagem(queryset):
+            total = queryset.filter(evento=OuterRef('pk')).order_by().values('evento').annotate(total=Count('pk')).values('total')
+            return Coalesce(Subquery(total), Value(0))
+
+        return self.select_related('cliente', 'criado_por').annotate(
+            total_materiais=contagem(MaterialEvento.objects.all()),
+            total_itens_planejados=soma(MaterialEvento.objects.all(), 'quantidade'),
+            total_itens_separados=soma(MaterialEvento.objects.all(), 'quantidade_separada'),
+            total_pendencias_suprimento=contagem(MaterialEvento.objects.filter(status_suprimento='PENDENTE')),
+            total_equipe=contagem(EscalaFuncionario.objects.all()),
+        )
+
+class Evento(ContadoresDesnormalizadosMixin, models.Model):
     STATUS_CHOICES = (
         ('PLANEJAMENTO', 'Em Planejamento'),
         ('AGUARDANDO_CONFERENCIA', 'Aguardando Conferência'),
@@ -138,6 +268,13 @@ class Evento(models.Model):
     necessita_gerador = models.BooleanField(default=False, verbose_name="Necessita de Gerador?")
     observacoes_tecnicas = models.TextField(blank=True, null=True, verbose_name="Observações Técnicas Adicionais")
     motivo_cancelamento = models.TextField(blank=True, null=True, verbose_name="Motivo do Cancelamento")
+    # Resumo das avarias no retorno, mantido junto com os contadores do MaterialEvento (EventoQuerySet.somar_avarias)
+    CONTADORES_AVARIA = {'DEFEITO': 'itens_com_defeito', 'QUEBRADO': 'itens_quebrados', 'PERDIDO': 'itens_perdidos'}
+    tem_avarias = models.BooleanField(default=False, editable=False, verbose_name="Retornou com Avarias")
+    itens_com_defeito = models.IntegerField(default=0, editable=False, verbose_name="Itens com Defeito")
+    itens_quebrados = models.IntegerField(default=0, editable=False, verbose_name="Itens Quebrados")
+    itens_perdidos = models.IntegerField(default=0, editable=False, verbose_name="Itens Perdidos")
+    campos_contadores = ('tem_avarias', *CONTADORES_AVARIA.values())
     veiculos = models.ManyToManyField('Veiculo', blank=True, related_name="eventos")
     chefe_de_equipe = models.ForeignKey(
         'Funcionario',
@@ -155,12 +292,36 @@ class Evento(models.Model):
         verbose_name="Criado por",
         related_name="operacoes_criadas"
     )
+
+    objects = EventoQuerySet.as_manager()
+
+    # Início e fim da janela em que o material fica comprometido, como expressões (EventoQuerySet.na_janela)
+    JANELA_INICIO = Coalesce('data_montagem', 'data_evento')
+    JANELA_FIM = Coalesce('data_termino', 'data_evento')
+
     class Meta:
         verbose_name = "Operação"
         verbose_name_plural = "Operações (Eventos, Empréstimos, etc)"
         ordering = ['-data_evento']
+        indexes = [
+            # Painel de logística e listagens por status, na ordem de data
+            models.Index(fields=['status', 'data_evento'], name='evento_status_data'),
+            # Painel de logística: operações finalizadas com avarias
+            models.Index(fields=['status', 'tem_avarias'], name='evento_status_avarias'),
+            # Filtro por período: o fim vem primeiro porque "termina depois do início
+            # pedido" é o limite seletivo (o histórico todo começa antes do fim pedido);
+            # o segundo atende quem informa só o fim
+            models.Index(Coalesce('data_termino', 'data_evento'), Coalesce('data_montagem', 'data_evento'), name='evento_janela'),
+            models.Index(Coalesce('data_montagem', 'data_evento'), name='evento_janela_inicio'),
+        ]
     def __str__(self):
         return self.nome or f"{self.get_tipo_evento_display()} para {self.cliente.empresa}"
+
+    def janela(self):
+        """Período em que o material fica comprometido: da montagem (ou saída) até o término."""
+        inicio = self.data_montagem or self.data_evento
+        fim = self.data_termino or self.data_evento
+        return inicio, max(inicio, fim)
     
 class FotoPreEvento(models.Model):
     evento = models.ForeignKey('Evento', related_name='fotos', on_delete=models.CASCADE)
@@ -170,7 +331,44 @@ class FotoPreEvento(models.Model):
         verbose_name = "Foto do Pré-Evento"
         verbose_name_plural = "Fotos do Pré-Evento"
 
-class MaterialEvento(models.Model):
+class MaterialEventoQuerySet(models.QuerySet):
+    def somar_retornos(self, variacoes):
+        """
+        Aplica nos contadores de retorno as variações (material_evento_id,
+        condicao, quantidade) numa única UPDATE com F(): devoluções simultâneas
+        do mesmo material se somam em vez de uma sobrescrever a outra. As
+        avarias seguem para os contadores da operação (Evento.somar_avarias).
+        """
+        variacoes = [(material_id, condicao, quantidade) for material_id, condicao, quantidade in variacoes if quantidade]
+        if not variacoes:
+            return 0
+        campos = {'quantidade_retornada_ok': {}, 'quantidade_retornada_defeito': {}}
+        for material_id, condicao, quantidade in variacoes:
+            totais = campos['quantidade_retornada_ok' if condicao == 'OK' else 'quantidade_retornada_defeito']
+            totais[material_id] = totais.get(material_id, 0) + quantidade
+        atualizados = self.filter(pk__in={material_id for material_id, _, _ in variacoes}).update(**_somas_por_linha(campos))
+
+        avarias = [variacao for variacao in variacoes if variacao[1] != 'OK']
+        if avarias:
+            eventos = dict(self.filter(pk__in={material_id for material_id, _, _ in avarias}).values_list('pk', 'evento_id'))
+            Evento.objects.somar_avarias([
+                (eventos[material_id], condicao, quantidade) for material_id, condicao, quantidade in avarias if material_id in eventos
+            ])
+        return atualizados
+
+    def recalcular_retornos(self):
+        """Refaz os contadores a partir dos ItemRetornado, numa UPDATE com subconsultas (comando reconstruir_retornos)."""
+        retornos = ItemRetornado.objects.filter(material_evento=OuterRef('pk')).order_by().values('material_evento')
+
+        def soma(consulta):
+            return Coalesce(Subquery(consulta.annotate(total=Sum('quantidade')).values('total')), Value(0))
+
+        return self.update(
+            quantidade_retornada_ok=soma(retornos.filter(condicao='OK')),
+            quantidade_retornada_defeito=soma(retornos.exclude(condicao='OK')),
+        )
+
+class MaterialEvento(ContadoresDesnormalizadosMixin, models.Model):
     evento = models.ForeignKey('Evento', on_delete=models.CASCADE)
     equipamento = models.ForeignKey('Equipamento', on_delete=models.CASCADE, null=True, blank=True)
     item_descricao = models.CharField(max_length=255, blank=True, null=True, verbose_name="Item de Consumo/Descrição")
@@ -179,20 +377,23 @@ class MaterialEvento(models.Model):
     conferido = models.BooleanField(default=False, verbose_name="Item Conferido")
     STATUS_SUPRIMENTO_CHOICES = (('OK', 'Estoque OK'), ('PENDENTE', 'Insuficiente - Pendente de Ação'), ('SUBLOCADO', 'Resolvido (Sublocação)'), ('EMPRESTIMO', 'Resolvido (Empréstimo)'), ('COMPRADO', 'Resolvido (Compra)'), ('SUBSTITUIDO', 'Resolvido (Substituição)'))
     status_suprimento = models.CharField(max_length=20, choices=STATUS_SUPRIMENTO_CHOICES, default='OK', verbose_name="Status do Suprimento")
+    # Somas dos ItemRetornado por condição, mantidas pelos signals (MaterialEventoQuerySet.somar_retornos)
+    quantidade_retornada_ok = models.IntegerField(default=0, editable=False, verbose_name="Qtd. Retornada OK")
+    quantidade_retornada_defeito = models.IntegerField(default=0, editable=False, verbose_name="Qtd. Retornada com Avaria")
+    campos_contadores = ('quantidade_retornada_ok', 'quantidade_retornada_defeito')
+    objects = MaterialEventoQuerySet.as_manager()
     def save(self, *args, **kwargs):
         if self.status_suprimento in ['OK', 'PENDENTE']:
             if self.equipamento and self.quantidade > self.equipamento.quantidade_estoque: self.status_suprimento = 'PENDENTE'
             else: self.status_suprimento = 'OK'
         super().save(*args, **kwargs)
-    @property
-    def quantidade_retornada_ok(self):
-        return self.itens_retornados.filter(condicao='OK').aggregate(total=Sum('quantidade'))['total'] or 0
-    @property
-    def quantidade_retornada_defeito(self):
-        return self.itens_retornados.exclude(condicao='OK').aggregate(total=Sum('quantidade'))['total'] or 0
     class Meta:
         verbose_name = "Material do Evento"
         verbose_name_plural = "Materiais dos Eventos"
+        indexes = [
+            # Operações com suprimento pendente (EventoFilter.pendente_suprimento)
+            models.Index(fields=['status_suprimento', 'evento'], name='material_suprimento_evento'),
+        ]
     def __str__(self):
         nome_item = self.equipamento.modelo if self.equipamento else self.item_descricao
         return f"{self.quantidade}x {nome_item} para {self.evento.nome}"
@@ -216,9 +417,73 @@ class ItemRetornado(models.Model):
     condicao = models.CharField(max_length=20, choices=CONDICAO_CHOICES, default='OK')
     observacao = models.TextField(blank=True, null=True, verbose_name="Observação (ex: lente trincada, cabo partido)")
     data_retorno = models.DateTimeField(auto_now_add=True)
+    # Tudo o que não voltou em bom estado; filtrado por inclusão (IN) para o banco poder usar os índices
+    CONDICOES_AVARIA = ('DEFEITO', 'QUEBRADO', 'PERDIDO')
+    class Meta:
+        indexes = [
+            # Retornos de um material por condição (relatório de avarias, contadores)
+            models.Index(fields=['material_evento', 'condicao'], name='retorno_material_condicao'),
+            # Avarias mais recentes
+            models.Index(fields=['condicao', 'data_retorno'], name='retorno_condicao_data'),
+        ]
     def __str__(self):
         return f"{self.quantidade}x {self.material_evento.equipamento.modelo} retornado(s) como {self.get_condicao_display()}"
 
+class SequenciaOS(models.Model):
+    """Contador de números de O.S. por ano; reservado em blocos com a linha travada."""
+    ano = models.PositiveIntegerField(primary_key=True)
+    ultimo_numero = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Sequência de O.S."
+        verbose_name_plural = "Sequências de O.S."
+
+    @classmethod
+    def reservar(cls, quantidade, ano=None):
+        """
+        Reserva 'quantidade' números consecutivos num único passo e devolve o range.
+        Números reservados por uma transação desfeita ficam sem uso (buracos são aceitos).
+        """
+        ano = ano or timezone.now().year
+        with transaction.atomic():
+            sequencia = cls.objects.select_for_update().filter(pk=ano).first()
+            if sequencia is None:
+                # Na criação parte do maior id existente: as O.S. antigas usavam o pk como número
+                maior_antigo = RegistroManutencao.objects.aggregate(maior=models.Max('pk'))['maior'] or 0
+                sequencia, _ = cls.objects.select_for_update().get_or_create(ano=ano, defaults={'ultimo_numero': maior_antigo})
+            inicio = sequencia.ultimo_numero + 1
+            cls.objects.filter(pk=ano).update(ultimo_numero=models.F('ultimo_numero') + quantidade)
+        return ano, range(inicio, inicio + quantidade)
+
+    @staticmethod
+    def formatar(ano, numero):
+        return f"OS-{ano}-{numero:05d}"
+
+class RegistroManutencaoQuerySet(models.QuerySet):
+    def criar_em_lote(self, pedidos):
+        """
+        Cria as O.S. (uma por unidade) de vários pedidos com um único INSERT, com
+        todos os números reservados de uma vez na SequenciaOS. Cada pedido é um
+        dict com quantidade, equipamento, descricao_problema e, opcionalmente,
+        item_retornado; como este é OneToOne, só a primeira O.S. do pedido fica
+        ligada ao retorno que a originou.
+        """
+        pedidos = [pedido for pedido in pedidos if pedido['quantidade'] > 0]
+        if not pedidos:
+            return []
+        ano, numeros = SequenciaOS.reservar(sum(pedido['quantidade'] for pedido in pedidos))
+        numeros = iter(numeros)
+        registros = []
+        for pedido in pedidos:
+            for indice in range(pedido['quantidade']):
+                registros.append(self.model(
+                    os_number=SequenciaOS.formatar(ano, next(numeros)),
+                    equipamento=pedido['equipamento'],
+                    item_retornado=pedido.get('item_retornado') if indice == 0 else None,
+                    descricao_problema=pedido['descricao_problema'],
+                ))
+        return self.bulk_create(registros)
+
 class RegistroManutencao(models.Model):
     os_number = models.CharField(
         max_length=20, 
@@ -228,6 +493,8 @@ class RegistroManutencao(models.Model):
         verbose_name="Número da O.S."
     )
     STATUS_MANUTENCAO = (('AGUARDANDO_AVALIACAO', 'Aguardando Avaliação'), ('EM_REPARO', 'Em Reparo'), ('AGUARDANDO_PECAS', 'Aguardando Peças'), ('REPARADO', 'Reparado / Pronto para Estoque'))
+    # Fila de manutenção: tudo menos REPARADO, por inclusão (IN) para usar o índice de status
+    STATUS_ABERTOS = ('AGUARDANDO_AVALIACAO', 'EM_REPARO', 'AGUARDANDO_PECAS')
     equipamento = models.ForeignKey('Equipamento', on_delete=models.CASCADE)
     item_retornado = models.OneToOneField('ItemRetornado', on_delete=models.SET_NULL, null=True, blank=True)
     status = models.CharField(max_length=30, choices=STATUS_MANUTENCAO, default='AGUARDANDO_AVALIACAO')
@@ -236,12 +503,21 @@ class RegistroManutencao(models.Model):
     data_entrada = models.DateTimeField(auto_now_add=True)
     data_saida = models.DateTimeField(null=True, blank=True)
 
+    objects = RegistroManutencaoQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Fila aberta (por entrada) e histórico de reparados (por saída)
+            models.Index(fields=['status', 'data_entrada'], name='manutencao_status_entrada'),
+            models.Index(fields=['status', 'data_saida'], name='manutencao_status_saida'),
+        ]
+
     def save(self, *args, **kwargs):
-        is_new = self._state.adding
+        # Número reservado antes do INSERT: uma única escrita por O.S.
+        if self._state.adding and not self.os_number:
+            ano, numeros = SequenciaOS.reservar(1)
+            self.os_number = SequenciaOS.formatar(ano, numeros[0])
         super().save(*args, **kwargs)
-        if is_new and not self.os_number:
-            self.os_number = f"OS-{self.data_entrada.year}-{self.pk:05d}"
-            self.save(update_fields=['os_number'])
 
     def __str__(self):
         return f"{self.os_number or 'O.S. Pendente'} - Manutenção para {self.equipamento.modelo}"
@@ -319,3 +595,155 @@ class EscalaFuncionario(models.Model):
 
     def __str__(self):
         return f"{self.funcionario.nome} escalado para {self.evento.nome}"    
+
+
+class ArmazenamentoRelatorios(FileSystemStorage):
+    """Pasta dos PDFs gerados em segundo plano; lê RELATORIOS_DIR a cada uso."""
+    @property
+    def base_location(self):
+        return str(settings.RELATORIOS_DIR)
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+def armazenamento_relatorios():
+    return ArmazenamentoRelatorios()
+
+class TarefaRelatorio(models.Model):
+    """PDF pedido para geração em segundo plano (core/tarefas.py); o frontend consulta o status e baixa o arquivo."""
+    STATUS_TAREFA = (('PENDENTE', 'Na Fila'), ('PROCESSANDO', 'Gerando'), ('CONCLUIDA', 'Concluída'), ('ERRO', 'Erro'))
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    tipo = models.CharField(max_length=30)
+    parametros = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_TAREFA, default='PENDENTE')
+    solicitado_por = models.ForeignKey('Usuario', on_delete=models.SET_NULL, null=True, blank=True, related_name='tarefas_relatorio')
+    arquivo = models.FileField(upload_to='tarefas/', storage=armazenamento_relatorios, blank=True)
+    nome_arquivo = models.CharField(max_length=255, blank=True)
+    erro = models.TextField(blank=True)
+    # Tarefas com várias partes (pacote de saída): quantas já foram geradas de quantas
+    progresso = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    criado_em = models.DateTimeField(auto_now_add=True)
+    iniciado_em = models.DateTimeField(null=True, blank=True)
+    concluido_em = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Tarefa de Relatório"
+        verbose_name_plural = "Tarefas de Relatório"
+        ordering = ['-criado_em']
+
+    def __str__(self):
+        return f"{self.tipo} ({self.get_status_display()})"
+
+
+class SequenciaGuia(models.Model):
+    """Contador dos números das guias de saída por ano; a linha fica travada até o fim da transação da saída."""
+    ano = models.PositiveIntegerField(primary_key=True)
+    ultimo_numero = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Sequência de Guias"
+        verbose_name_plural = "Sequências de Guias"
+
+    @classmethod
+    def proximo(cls, ano=None):
+        ano = ano or timezone.now().year
+        with transaction.atomic():
+            # Sempre as mesmas três consultas (a saída em lote tem número fixo de consultas):
+            # cria a linha do ano se faltar, incrementa (o UPDATE trava a linha até o commit) e lê
+            cls.objects.bulk_create([cls(ano=ano)], ignore_conflicts=True)
+            cls.objects.filter(pk=ano).update(ultimo_numero=models.F('ultimo_numero') + 1)
+            numero = cls.objects.get(pk=ano).ultimo_numero
+        return f"GS-{ano}-{numero:05d}"
+
+
+class GuiaSaida(models.Model):
+    """
+    Guia emitida pelo servidor a cada saída ou reforço (core/guias.py), com os
+    itens que realmente saíram e os dados do evento daquele momento. Imutável:
+    o PDF é gerado uma vez e arquivado pelo SHA-256 do conteúdo; reimpressões
+    leem o arquivo.
+    """
+    TIPOS_GUIA = (('SAIDA', 'Saída de Material'), ('REFORCO', 'Reforço'))
+    numero = models.CharField(max_length=20, unique=True)
+    tipo = models.CharField(max_length=10, choices=TIPOS_GUIA)
+    evento = models.ForeignKey('Evento', on_delete=models.CASCADE, related_name='guias')
+    itens = models.JSONField(default=list)
+    # Cabeçalho e consumíveis do evento no momento da emissão (relatorios.dados_da_guia)
+    dados = models.JSONField(default=dict, blank=True)
+    emitida_por = models.ForeignKey('Usuario', on_delete=models.SET_NULL, null=True, blank=True, related_name='guias_emitidas')
+    emitida_em = models.DateTimeField(default=timezone.now)
+    sha256 = models.CharField(max_length=64, blank=True, db_index=True)
+    arquivo = models.FileField(upload_to='guias/', storage=armazenamento_relatorios, blank=True)
+
+    class Meta:
+        verbose_name = "Guia de Saída"
+        verbose_name_plural = "Guias de Saída"
+        ordering = ['-emitida_em']
+
+    def __str__(self):
+        return f"{self.numero} ({self.get_tipo_display()})"
+
+    @property
+    def nome_arquivo(self):
+        prefixo = 'Guia_Reforco' if self.tipo == 'REFORCO' else 'Guia_Saida'
+        return f"{prefixo}_{self.numero}.pdf"
+
+
+class MovimentacaoEstoque(models.Model):
+    """
+    Razão do estoque: cada variação de quantidade_estoque/quantidade_manutencao
+    vira uma linha que nunca é alterada. Os contadores do Equipamento são a
+    projeção deste razão e podem ser reconstruídos a partir dele (core/movimentacoes.py).
+    """
+    ORIGENS = (
+        ('AJUSTE', 'Cadastro / Ajuste Manual'),
+        ('SAIDA', 'Saída para Operação'),
+        ('REFORCO', 'Reforço para Operação'),
+        ('RETORNO', 'Retorno de Operação'),
+        ('ENVIO_MANUTENCAO', 'Envio para Manutenção'),
+        ('RETORNO_MANUTENCAO', 'Retorno da Manutenção'),
+        ('REPARO', 'O.S. Reparada'),
+    )
+    equipamento = models.ForeignKey('Equipamento', on_delete=models.CASCADE, related_name='movimentacoes')
+    origem = models.CharField(max_length=20, choices=ORIGENS)
+    delta_estoque = models.IntegerField(default=0)
+    delta_manutencao = models.IntegerField(default=0)
+    evento = models.ForeignKey('Evento', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimentacoes_estoque')
+    registro_manutencao = models.ForeignKey('RegistroManutencao', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimentacoes_estoque')
+    usuario = models.ForeignKey('Usuario', on_delete=models.SET_NULL, null=True, blank=True, related_name='movimentacoes_estoque')
+    observacao = models.CharField(max_length=255, blank=True)
+    criado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Movimentação de Estoque"
+        verbose_name_plural = "Movimentações de Estoque"
+        ordering = ['criado_em', 'id']
+        # Saldo numa data: as movimentações de um equipamento depois da última fotografia
+        indexes = [models.Index(fields=['equipamento', 'criado_em'], name='mov_estoque_equip_data')]
+
+    def __str__(self):
+        return f"{self.equipamento} {self.delta_estoque:+d}/{self.delta_manutencao:+d} ({self.get_origem_display()})"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Movimentações de estoque não podem ser alteradas; lance um ajuste.")
+        super().save(*args, **kwargs)
+
+
+class SaldoEstoque(models.Model):
+    """Fotografia dos contadores de um equipamento no fim de um dia (comando consolidar_estoque)."""
+    equipamento = models.ForeignKey('Equipamento', on_delete=models.CASCADE, related_name='saldos')
+    data = models.DateField()
+    quantidade_estoque = models.IntegerField()
+    quantidade_manutencao = models.IntegerField()
+
+    class Meta:
+        verbose_name = "Saldo de Estoque"
+        verbose_name_plural = "Saldos de Estoque"
+        # O índice único também atende "última fotografia até a data D" por equipamento
+        unique_together = ('equipamento', 'data')
+
+    def __str__(self):
+        return f"{self.equipamento} em {self.data:%d/%m/%Y}: {self.quantidade_estoque} ({self.quantidade_manutencao} em manutenção)"
@@ -0,0 +1,127 @@
+# Em: core/motor_relatorios.py
+
+import os
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
+
+from . import instrumentacao, metricas
+
+# Motor comum dos PDFs (core/relatorios.py). O que não depende da requisição
+# (estilos, TableStyles, logo decodificado) é montado uma vez por processo;
+# por requisição só se criam os flowables, que o ReportLab altera ao paginar
+# e por isso não podem ser compartilhados entre documentos.
+
+# Resolução em que imagens fixas (logo) entram no PDF: acima disso é só peso no arquivo
+DPI_IMAGENS = 300
+
+
+@lru_cache(maxsize=None)
+def estilos():
+    """Folha de estilos padrão do ReportLab, criada uma vez; os Paragraphs só leem dela."""
+    return getSampleStyleSheet()
+
+
+def paragrafo(texto, estilo='Normal'):
+    return Paragraph(texto, estilos()[estilo])
+
+
+def espaco(polegadas):
+    return Spacer(1, polegadas*inch)
+
+
+# --- TABELAS ---
+
+class ModeloTabela:
+    """
+    Tabela declarada uma vez no módulo: colunas, larguras (pol) e cores. O
+    TableStyle é compilado na definição e reaproveitado por todas as tabelas
+    montadas a partir dele.
+    """
+
+    def __init__(self, colunas, larguras, cor_cabecalho, cor_texto_cabecalho=colors.whitesmoke, centralizar=True, alinhamento_vertical=None):
+        self.colunas = list(colunas)
+        self.larguras = [largura*inch for largura in larguras]
+        comandos = [('BACKGROUND', (0,0), (-1,0), cor_cabecalho)]
+        if cor_texto_cabecalho:
+            comandos.append(('TEXTCOLOR', (0,0), (-1,0), cor_texto_cabecalho))
+        comandos.append(('GRID', (0,0), (-1,-1), 1, colors.black))
+        if centralizar:
+            comandos.append(('ALIGN', (1,1), (-1,-1), 'CENTER'))
+        if alinhamento_vertical:
+            comandos.append(('VALIGN', (0,0), (-1,-1), alinhamento_vertical))
+        comandos.append(('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'))
+        self.estilo = TableStyle(comandos)
+
+    def montar(self, linhas):
+        return Table([self.colunas, *linhas], colWidths=self.larguras, style=self.estilo)
+
+
+ESTILO_TOPO = TableStyle([('VALIGN', (0,0), (-1,-1), 'TOP')])
+ESTILO_ASSINATURAS = TableStyle([('ALIGN', (0,0), (-1,-1), 'CENTER')])
+
+
+def tabela_campos(campos, larguras=(1.8, 5.2)):
+    """Pares (rótulo, valor) em duas colunas sem grade: o bloco de dados gerais dos relatórios."""
+    linhas = [[paragrafo(f"<b>{rotulo}:</b>"), paragrafo(valor)] for rotulo, valor in campos]
+    return Table(linhas, colWidths=[largura*inch for largura in larguras])
+
+
+def campos_em_linhas(campos):
+    """Os mesmos pares (rótulo, valor), um parágrafo por linha (cabeçalho das guias)."""
+    return [paragrafo(f"<b>{rotulo}:</b> {valor}") for rotulo, valor in campos]
+
+
+def assinaturas(esquerda="Conferido por (Novalite)", direita="Recebido por (Cliente/Produção)"):
+    linhas = [
+        ["__________________________________", "__________________________________"],
+        [paragrafo(esquerda), paragrafo(direita)],
+    ]
+    return Table(linhas, colWidths=[3*inch, 3*inch], style=ESTILO_ASSINATURAS)
+
+
+# --- LOGO ---
+
+@lru_cache(maxsize=8)
+def _imagem_reduzida(caminho, _mtime, largura, altura):
+    """Imagem fixa decodificada e reduzida para o tamanho de impressão (PNG), uma vez por processo (e por versão do arquivo)."""
+    with Image.open(caminho) as original:
+        imagem = original.copy()
+    imagem.thumbnail((round(largura / inch * DPI_IMAGENS), round(altura / inch * DPI_IMAGENS)), Image.LANCZOS)
+    buffer = BytesIO()
+    imagem.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def imagem_fixa(caminho, largura, altura):
+    """Flowable de uma imagem que se repete em todo PDF (logo): cada documento ganha o seu, a partir dos bytes já reduzidos."""
+    if not os.path.exists(caminho):
+        return paragrafo("")
+    return RLImage(BytesIO(_imagem_reduzida(caminho, os.path.getmtime(caminho), largura, altura)), width=largura, height=altura)
+
+
+def cabecalho_com_logo(caminho_logo, linhas):
+    """Logo à esquerda e o bloco de título (lista de flowables) à direita."""
+    logo = imagem_fixa(caminho_logo, 1.5*inch, 0.75*inch)
+    return Table([[logo, linhas]], colWidths=[2*inch, 5*inch], style=ESTILO_TOPO)
+
+
+# --- DOCUMENTO ---
+
+def renderizar(tipo, story, invariante=False):
+    """
+    Monta o PDF (carta, margens de 0,5 pol), medindo o tempo na instrumentação e
+    no Prometheus. 'invariante' tira data de criação e id aleatório do arquivo:
+    o mesmo conteúdo gera sempre os mesmos bytes (guias arquivadas pelo hash).
+    """
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch, invariant=invariante)
+    with instrumentacao.medir('pdf'), metricas.duracao_pdf.labels(relatorio=tipo).time():
+        doc.build(story)
+    return buffer.getvalue()
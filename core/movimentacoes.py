@@ -0,0 +1,156 @@
+# Em: core/movimentacoes.py
+
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from django.db.models.expressions import Combinable
+from django.utils import timezone
+
+from . import dashboard
+from .models import Equipamento, MovimentacaoEstoque, SaldoEstoque
+
+# Razão do estoque. Toda rota que mexe nos contadores do Equipamento lança aqui
+# a variação com a origem; edições diretas (tela de inventário, admin,
+# importação) viram 'AJUSTE' pelos signals. Os contadores continuam sendo o que
+# a aplicação lê, mas são só a projeção do razão: reconstruir_contadores()
+# refaz tudo numa passada e saldo_em() responde o estoque numa data passada.
+
+CONTADORES = ('quantidade_estoque', 'quantidade_manutencao')
+
+
+def movimento(equipamento_id, origem, estoque=0, manutencao=0, usuario=None, **referencias):
+    """Linha do razão ainda não gravada; 'referencias' aceita evento, registro_manutencao e observacao."""
+    return MovimentacaoEstoque(
+        equipamento_id=equipamento_id, origem=origem, delta_estoque=estoque, delta_manutencao=manutencao,
+        usuario=usuario if usuario and usuario.is_authenticated else None, **referencias,
+    )
+
+
+def lancar(movimentos):
+    """Grava as movimentações num único INSERT (variações zeradas são descartadas)."""
+    movimentos = [m for m in movimentos if m.delta_estoque or m.delta_manutencao]
+    return MovimentacaoEstoque.objects.bulk_create(movimentos) if movimentos else []
+
+
+def movimentar(equipamento, origem, estoque=0, manutencao=0, usuario=None, **referencias):
+    """
+    Para as rotas que mexem num equipamento por vez: aplica a variação com F()
+    (sem sobrescrever o que outra requisição gravou), lança no razão e
+    atualiza a instância com os valores novos.
+    """
+    Equipamento.objects.filter(pk=equipamento.pk).update(
+        quantidade_estoque=F('quantidade_estoque') + estoque,
+        quantidade_manutencao=F('quantidade_manutencao') + manutencao,
+        modificado_em=timezone.now(),
+    )
+    lancar([movimento(equipamento.pk, origem, estoque, manutencao, usuario, **referencias)])
+    equipamento.refresh_from_db(fields=[*CONTADORES, 'modificado_em'])
+    # update() não dispara signals
+    transaction.on_commit(dashboard.invalidar_totais)
+
+
+# --- AJUSTES DIRETOS (signals de Equipamento) ---
+
+def preparar_ajuste(equipamento, update_fields=None):
+    """pre_save: guarda os contadores gravados no banco para lançar a diferença depois do save."""
+    if update_fields is not None and not set(CONTADORES) & set(update_fields):
+        return
+    anteriores = None
+    if equipamento.pk:
+        anteriores = Equipamento.objects.filter(pk=equipamento.pk).values_list(*CONTADORES).first()
+    equipamento._contadores_anteriores = anteriores or (0, 0)
+
+
+def lancar_ajuste(equipamento):
+    """post_save: cadastro ou edição manual das quantidades vira um 'AJUSTE' no razão."""
+    anteriores = equipamento.__dict__.pop('_contadores_anteriores', None)
+    atuais = tuple(getattr(equipamento, campo) for campo in CONTADORES)
+    if anteriores is None or any(isinstance(valor, Combinable) for valor in atuais):
+        return
+    lancar([movimento(equipamento.pk, 'AJUSTE', atuais[0] - anteriores[0], atuais[1] - anteriores[1])])
+
+
+# --- SALDOS POR DATA ---
+
+def _fim_do_dia(data):
+    return timezone.make_aware(datetime.combine(data + timedelta(days=1), time.min))
+
+
+def saldo_em(equipamento_id, data):
+    """
+    Estoque e manutenção de um equipamento no fim do dia 'data': a última
+    fotografia até a data (índice único equipamento+data) mais as poucas
+    movimentações depois dela (índice equipamento+criado_em). Nada é reprocessado desde o início.
+    """
+    fotografia = SaldoEstoque.objects.filter(equipamento_id=equipamento_id, data__lte=data).order_by('-data').first()
+    movimentacoes = MovimentacaoEstoque.objects.filter(equipamento_id=equipamento_id, criado_em__lt=_fim_do_dia(data))
+    estoque = manutencao = 0
+    if fotografia:
+        estoque, manutencao = fotografia.quantidade_estoque, fotografia.quantidade_manutencao
+        movimentacoes = movimentacoes.filter(criado_em__gte=_fim_do_dia(fotografia.data))
+    soma = movimentacoes.aggregate(estoque=Sum('delta_estoque'), manutencao=Sum('delta_manutencao'))
+    return {
+        'quantidade_estoque': estoque + (soma['estoque'] or 0),
+        'quantidade_manutencao': manutencao + (soma['manutencao'] or 0),
+    }
+
+
+@transaction.atomic
+def consolidar(data):
+    """
+    Grava a fotografia de todos os equipamentos no fim de 'data': fotografia
+    anterior + uma consulta agregada das movimentações do intervalo. Rodar de
+    novo para a mesma data substitui as linhas dela.
+    """
+    anterior = SaldoEstoque.objects.filter(data__lt=data).aggregate(ultima=Max('data'))['ultima']
+    saldos = {}
+    movimentacoes = MovimentacaoEstoque.objects.filter(criado_em__lt=_fim_do_dia(data))
+    if anterior:
+        saldos = {
+            equipamento_id: [estoque, manutencao]
+            for equipamento_id, estoque, manutencao in SaldoEstoque.objects.filter(data=anterior).values_list('equipamento_id', *CONTADORES)
+        }
+        movimentacoes = movimentacoes.filter(criado_em__gte=_fim_do_dia(anterior))
+    for linha in movimentacoes.values('equipamento_id').annotate(estoque=Sum('delta_estoque'), manutencao=Sum('delta_manutencao')).order_by():
+        saldo = saldos.setdefault(linha['equipamento_id'], [0, 0])
+        saldo[0] += linha['estoque']
+        saldo[1] += linha['manutencao']
+
+    SaldoEstoque.objects.filter(data=data).delete()
+    SaldoEstoque.objects.bulk_create([
+        SaldoEstoque(equipamento_id=equipamento_id, data=data, quantidade_estoque=estoque, quantidade_manutencao=manutencao)
+        for equipamento_id, (estoque, manutencao) in saldos.items()
+    ], batch_size=1000)
+    return len(saldos)
+
+
+# --- RECONSTRUÇÃO DOS CONTADORES ---
+
+def reconstruir_contadores(aplicar=True):
+    """
+    Soma o razão inteiro numa consulta agregada e compara com os contadores.
+    Com 'aplicar', corrige as divergências (bulk_update, sem gerar ajustes).
+    Devolve [(equipamento, (estoque, manutenção) atuais, esperados)].
+    """
+    with transaction.atomic():
+        equipamentos = list(Equipamento.objects.select_for_update().only('id', 'modelo', *CONTADORES).order_by('pk'))
+        somas = {
+            linha['equipamento_id']: (linha['estoque'], linha['manutencao'])
+            for linha in MovimentacaoEstoque.objects.values('equipamento_id').annotate(
+                estoque=Sum('delta_estoque'), manutencao=Sum('delta_manutencao'),
+            ).order_by()
+        }
+        divergentes = []
+        agora = timezone.now()
+        for equipamento in equipamentos:
+            atuais = (equipamento.quantidade_estoque, equipamento.quantidade_manutencao)
+            esperados = somas.get(equipamento.pk, (0, 0))
+            if atuais != esperados:
+                divergentes.append((equipamento, atuais, esperados))
+                equipamento.quantidade_estoque, equipamento.quantidade_manutencao = esperados
+                equipamento.modificado_em = agora
+        if aplicar and divergentes:
+            Equipamento.objects.bulk_update([equipamento for equipamento, _, _ in divergentes], [*CONTADORES, 'modificado_em'], batch_size=1000)
+            transaction.on_commit(dashboard.invalidar_totais)
+    return divergentes
@@ -0,0 +1,167 @@
+# Em: core/pacote_saida.py
+
+import multiprocessing
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+from django.conf import settings
+from django.db import connections
+from django.db.models.functions import Coalesce
+from pypdf import PdfWriter
+
+from . import cache_relatorios, relatorios
+from .models import Evento, MaterialEvento
+
+# Operações encerradas não entram no pacote do dia (o resto sai, mesmo ainda em planejamento)
+STATUS_ENCERRADOS = ['FINALIZADO', 'CANCELADO']
+FORMATOS = {'pdf': 'application/pdf', 'zip': 'application/zip'}
+
+
+def eventos_do_dia(dia):
+    """Operações cuja saída (montagem, ou o próprio dia do evento) cai em 'dia'."""
+    return list(
+        Evento.objects.annotate(saida=Coalesce('data_montagem', 'data_evento'))
+        .filter(saida=dia).exclude(status__in=STATUS_ENCERRADOS)
+        .order_by('saida', 'id').values_list('id', flat=True)
+    )
+
+
+def itens_da_guia(evento_id):
+    """Linhas da guia de saída a partir da lista de material: o que já foi separado, ou o planejado."""
+    itens = []
+    for material in MaterialEvento.objects.filter(evento_id=evento_id).select_related('equipamento').order_by('id'):
+        quantidade = material.quantidade_separada or material.quantidade
+        if quantidade:
+            itens.append({'modelo': material.equipamento.modelo if material.equipamento else material.item_descricao, 'qtd': quantidade})
+    return itens
+
+
+def documentos_do_evento(evento_id):
+    """Relatório completo (do cache em disco, se estiver lá) + guia de saída de uma operação."""
+    nome, arquivo = cache_relatorios.relatorio_evento(evento_id)
+    with arquivo:
+        documentos = [(nome, arquivo.read())]
+    itens = itens_da_guia(evento_id)
+    if itens:
+        documentos.append(relatorios.guia_saida(evento_id, itens))
+    return documentos
+
+
+def _renderizar(evento_id):
+    try:
+        return evento_id, documentos_do_evento(evento_id), None
+    except Exception as e:
+        return evento_id, [], str(e) or e.__class__.__name__
+
+
+def _inicializar_processo():
+    import django
+    django.setup()
+
+
+def _renderizar_no_processo(evento_id):
+    try:
+        return _renderizar(evento_id)
+    finally:
+        connections.close_all()
+
+
+_pool = None
+_pool_trava = threading.Lock()
+
+
+def _obter_pool():
+    """
+    Pool de processos do processo atual, criado no primeiro pacote grande e
+    reaproveitado pelos seguintes: subir interpretadores e rodar django.setup()
+    custa mais que renderizar algumas operações.
+    """
+    global _pool
+    with _pool_trava:
+        if _pool is None:
+            # 'spawn': nada de fork de um processo com threads e conexões abertas (gunicorn, pool de relatórios)
+            contexto = multiprocessing.get_context('spawn')
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RELATORIOS_PACOTE_PROCESSOS, mp_context=contexto, initializer=_inicializar_processo,
+            )
+        return _pool
+
+
+def _descartar_pool(pool):
+    # Um processo filho que morre quebra o pool inteiro; o próximo pacote cria outro
+    global _pool
+    with _pool_trava:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def renderizar(evento_ids, ao_progredir=None, paralelo=True):
+    """
+    Gera os documentos de cada operação. Com 'paralelo' (pacotes da fila), usa
+    o pool de processos do processo (RELATORIOS_PACOTE_PROCESSOS; o ReportLab é
+    CPU e não escala com threads); sem, renderiza em série na própria requisição.
+    Devolve [(evento_id, [(nome, pdf)], erro)] na ordem pedida.
+    """
+    resultados = {}
+    if not paralelo or min(settings.RELATORIOS_PACOTE_PROCESSOS, len(evento_ids)) <= 1:
+        for feitos, evento_id in enumerate(evento_ids, 1):
+            resultados[evento_id] = _renderizar(evento_id)
+            if ao_progredir:
+                ao_progredir(feitos, len(evento_ids))
+    else:
+        pool = _obter_pool()
+        try:
+            futuros = [pool.submit(_renderizar_no_processo, evento_id) for evento_id in evento_ids]
+            for feitos, futuro in enumerate(as_completed(futuros), 1):
+                evento_id, documentos, erro = futuro.result()
+                resultados[evento_id] = (evento_id, documentos, erro)
+                if ao_progredir:
+                    ao_progredir(feitos, len(evento_ids))
+        except BrokenProcessPool:
+            _descartar_pool(pool)
+            raise
+    return [resultados[evento_id] for evento_id in evento_ids]
+
+
+def empacotar(resultados, formato):
+    """
+    Junta tudo num PDF só (na ordem das operações, com uma página final de
+    erros) ou num ZIP com uma pasta por operação (e ERROS.txt). Se nenhuma
+    operação saiu, levanta RelatorioIndisponivel em vez de entregar um pacote vazio.
+    """
+    saida = BytesIO()
+    erros = [f"Operação {evento_id}: {erro}" for evento_id, _, erro in resultados if erro]
+    if not any(documentos for _, documentos, _ in resultados):
+        raise relatorios.RelatorioIndisponivel("Nenhum documento gerado para o pacote. " + "; ".join(erros))
+    if formato == 'zip':
+        # PDFs já são comprimidos: ZIP_STORED poupa CPU sem perder tamanho
+        with zipfile.ZipFile(saida, 'w', zipfile.ZIP_STORED) as pacote:
+            for evento_id, documentos, _ in resultados:
+                for nome, pdf in documentos:
+                    pacote.writestr(f"{evento_id}/{nome}", pdf)
+            if erros:
+                pacote.writestr('ERROS.txt', '\n'.join(erros))
+    else:
+        juntado = PdfWriter()
+        for _, documentos, _ in resultados:
+            for _, pdf in documentos:
+                juntado.append(BytesIO(pdf))
+        if erros:
+            juntado.append(BytesIO(relatorios.erros_do_pacote(erros)[1]))
+        juntado.write(saida)
+    return saida.getvalue(), erros
+
+
+def gerar_pacote(evento_ids, formato='pdf', ao_progredir=None, paralelo=True):
+    """
+    Pacote de saída completo. Devolve (nome_arquivo, conteúdo). A fila
+    (core/tarefas.py) usa o pool de processos; a rota síncrona, só com
+    poucas operações, passa paralelo=False e renderiza em série.
+    """
+    resultados = renderizar(evento_ids, ao_progredir, paralelo)
+    conteudo, _ = empacotar(resultados, formato)
+    return f"Pacote_Saida_{len(evento_ids)}_operacoes.{formato}", conteudo
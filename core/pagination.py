@@ -0,0 +1,29 @@
+# Em: core/pagination.py
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class CursorPaginacao(CursorPagination):
+    """
+    Paginação por cursor (keyset): cada página é um "WHERE chave < última vista",
+    sem OFFSET nem COUNT(*), então o custo não cresce com o histórico.
+
+    A ordenação vem do atributo 'ordenacao_paginacao' de cada viewset.
+    Enquanto API_PAGINACAO_OBRIGATORIA estiver desligada, só pagina quando o
+    cliente pede (?page_size= ou ?cursor=), mantendo as telas que esperam listas.
+    """
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = settings.API_PAGINACAO_MAX_PAGE_SIZE
+    ordering = '-pk'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        pediu_paginacao = self.cursor_query_param in request.query_params or self.page_size_query_param in request.query_params
+        if not settings.API_PAGINACAO_OBRIGATORIA and not pediu_paginacao:
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        self.ordering = getattr(view, 'ordenacao_paginacao', self.ordering)
+        return super().get_ordering(request, queryset, view)
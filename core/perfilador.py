@@ -0,0 +1,168 @@
+# Em: core/perfilador.py
+
+import cProfile
+import json
+import re
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
+from django.db import connection
+from django.http import FileResponse, Http404
+from django.shortcuts import render
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+CABECALHO = 'HTTP_X_PERFILAR'
+PARAMETRO = 'perfilar'
+_RE_ID = re.compile(r'^[0-9]{8}-[0-9]{6}-[0-9a-f]{8}$')
+
+# cProfile não aceita dois perfis ativos ao mesmo tempo no processo; um por vez
+_em_uso = threading.Lock()
+
+
+def diretorio_perfis():
+    return Path(getattr(settings, 'PERFILADOR_DIR', Path(settings.BASE_DIR) / 'perfis'))
+
+
+def _usuario_staff(request):
+    """Admin logado no /admin (sessão) ou via JWT, como nas chamadas do frontend."""
+    usuario = getattr(request, 'user', None)
+    if usuario is not None and usuario.is_authenticated:
+        return usuario if usuario.is_staff else None
+    try:
+        autenticado = JWTAuthentication().authenticate(request)
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        # Token válido de usuário apagado/inativo: get_user levanta AuthenticationFailed
+        return None
+    if autenticado and autenticado[0].is_staff:
+        return autenticado[0]
+    return None
+
+
+def listar_perfis():
+    """Metadados dos perfis guardados, do mais recente para o mais antigo."""
+    perfis = []
+    for metadados in sorted(diretorio_perfis().glob('*.json'), reverse=True):
+        try:
+            dados = json.loads(metadados.read_text())
+        except (OSError, ValueError):
+            continue
+        dados.pop('consultas', None)
+        perfis.append(dados)
+    return perfis
+
+
+def _despejar_antigos(diretorio):
+    """Mantém no máximo PERFILADOR_MAX_ARQUIVOS perfis e PERFILADOR_MAX_MB no disco, apagando os mais antigos."""
+    max_arquivos = getattr(settings, 'PERFILADOR_MAX_ARQUIVOS', 50)
+    max_bytes = getattr(settings, 'PERFILADOR_MAX_MB', 200) * 1024 * 1024
+    perfis = []
+    for arquivo in diretorio.glob('*.pstats'):
+        # Outro worker pode estar despejando ao mesmo tempo: o que já sumiu fica de fora
+        try:
+            estado = arquivo.stat()
+        except FileNotFoundError:
+            continue
+        perfis.append((estado.st_mtime, estado.st_size, arquivo))
+    perfis.sort(key=lambda perfil: perfil[0], reverse=True)
+    total = 0
+    for indice, (_, tamanho, arquivo) in enumerate(perfis):
+        sql = arquivo.with_suffix('.json')
+        try:
+            total += tamanho + sql.stat().st_size
+        except FileNotFoundError:
+            total += tamanho
+        if indice >= max_arquivos or total > max_bytes:
+            arquivo.unlink(missing_ok=True)
+            sql.unlink(missing_ok=True)
+
+
+class PerfiladorMiddleware:
+    """
+    Captura cProfile + log de SQL de uma requisição quando um admin pede,
+    com o cabeçalho "X-Perfilar: 1" ou "?perfilar=1". O resultado vai para
+    PERFILADOR_DIR e pode ser baixado em /admin/perfis/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not (request.META.get(CABECALHO) or PARAMETRO in request.GET):
+            return self.get_response(request)
+        usuario = _usuario_staff(request)
+        if usuario is None:
+            return self.get_response(request)
+        if not _em_uso.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Perfil'] = 'ocupado'
+            return response
+        try:
+            return self._perfilar(request, usuario)
+        finally:
+            _em_uso.release()
+
+    def _perfilar(self, request, usuario):
+        consultas = []
+
+        def registrar_sql(execute, sql, params, many, context):
+            inicio = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                consultas.append({'sql': sql, 'params': repr(params)[:500], 'ms': round((time.perf_counter() - inicio) * 1000, 3)})
+
+        perfil = cProfile.Profile()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(registrar_sql):
+            perfil.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                perfil.disable()
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        identificador = f"{timezone.localtime():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+        diretorio = diretorio_perfis()
+        diretorio.mkdir(parents=True, exist_ok=True)
+        perfil.dump_stats(diretorio / f'{identificador}.pstats')
+        (diretorio / f'{identificador}.json').write_text(json.dumps({
+            'id': identificador,
+            'metodo': request.method,
+            'caminho': request.get_full_path(),
+            'usuario': usuario.username,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'total_consultas': len(consultas),
+            'db_ms': round(sum(consulta['ms'] for consulta in consultas), 1),
+            'consultas': consultas,
+        }, ensure_ascii=False, indent=1))
+        _despejar_antigos(diretorio)
+
+        response['X-Perfil'] = identificador
+        return response
+
+
+# --- PÁGINA NO ADMIN ---
+
+@staff_member_required
+def lista_perfis(request):
+    contexto = {**admin.site.each_context(request), 'title': 'Perfis de requisições', 'perfis': listar_perfis()}
+    return render(request, 'admin/perfis.html', contexto)
+
+
+@staff_member_required
+def baixar_perfil(request, identificador, tipo):
+    if not _RE_ID.match(identificador):
+        raise Http404
+    arquivo = diretorio_perfis() / f"{identificador}.{'pstats' if tipo == 'pstats' else 'json'}"
+    if not arquivo.exists():
+        raise Http404
+    return FileResponse(arquivo.open('rb'), as_attachment=True, filename=arquivo.name)
@@ -0,0 +1,255 @@
+# Em: core/relatorios.py
+
+import os
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.units import inch
+from reportlab.platypus import Table, Image as RLImage
+
+from . import imagens
+from .models import Evento, ItemRetornado
+from .motor_relatorios import (
+    ModeloTabela, assinaturas, cabecalho_com_logo, campos_em_linhas, espaco, paragrafo, renderizar, tabela_campos,
+)
+
+
+class RelatorioIndisponivel(Exception):
+    """Não há o que imprimir (ex: operação sem avarias)."""
+
+
+# Suba ao mudar o layout do relatório completo: invalida os PDFs já guardados em cache (core/cache_relatorios.py)
+VERSAO_RELATORIO_EVENTO = 3
+LOGO_PATH = os.path.join(settings.BASE_DIR, 'static', 'img', 'novalite_logo.png')
+
+# Tabelas dos relatórios: declaradas uma vez, com o TableStyle já compilado (core/motor_relatorios.py)
+TABELA_MATERIAIS = ModeloTabela(["Item / Modelo", "Qtd."], [5.5, 1.5], colors.grey)
+TABELA_CONSUMIVEIS = ModeloTabela(["Item", "Qtd.", "Unidade"], [4.5, 1, 1.5], colors.lightgrey, cor_texto_cabecalho=None)
+TABELA_EQUIPE = ModeloTabela(["Nome", "Função"], [3.5, 3.5], colors.HexColor("#4F81BD"), centralizar=False)
+TABELA_FROTA = ModeloTabela(["Veículo", "Placa"], [3.5, 3.5], colors.darkgreen, centralizar=False)
+TABELA_GUIA_EQUIPAMENTOS = ModeloTabela(["Item / Modelo", "Qtd."], [5.5, 1.5], colors.darkgrey)
+TABELA_GUIA_CONSUMIVEIS = ModeloTabela(["Item / Modelo", "Qtd."], [5.5, 1.5], colors.lightgrey, cor_texto_cabecalho=None)
+TABELA_REFORCO = ModeloTabela(["Item / Modelo", "Quantidade"], [5.5, 1.5], colors.darkgrey)
+TABELA_AVARIAS = ModeloTabela(
+    ["Item / Modelo", "Qtd.", "Condição", "Observação"], [3, 0.5, 1, 3], colors.HexColor("#c00000"),
+    centralizar=False, alinhamento_vertical='MIDDLE',
+)
+
+
+def _titulos_evento(evento):
+    """(título, subtítulo, nome do arquivo) do relatório completo, conforme o tipo da operação."""
+    if evento.tipo_evento == 'PROPRIO':
+        main_title_text = "Relatório Completo do Evento"
+        subtitle_text = evento.nome or "Evento Sem Nome"
+        filename_prefix = evento.nome or "Evento"
+    else:
+        main_title_text = evento.get_tipo_evento_display()
+        subtitle_text = f"Para: {evento.cliente.empresa}"
+        filename_prefix = evento.get_tipo_evento_display()
+    return main_title_text, subtitle_text, f"{filename_prefix.replace(' ', '_')}_{evento.id}.pdf"
+
+
+def nome_arquivo_evento(evento):
+    return _titulos_evento(evento)[2]
+
+
+def _nome_do_item(material):
+    return material.equipamento.modelo if material.equipamento else material.item_descricao
+
+
+def _secao(story, titulo, tabela, espaco_depois=0.25):
+    story += [paragrafo(f"<b>{titulo}</b>", 'h3'), tabela]
+    if espaco_depois:
+        story.append(espaco(espaco_depois))
+
+
+def _cabecalho_guia(titulo, operacao, campos):
+    return [
+        paragrafo(titulo, 'h1'),
+        paragrafo(f"<b>Operação:</b> {operacao}", 'h2'),
+        *campos_em_linhas(campos),
+        espaco(0.3),
+    ]
+
+
+def relatorio_evento(evento_id):
+    """Relatório completo da operação (dados, fotos, materiais, equipe e frota). Devolve (nome_arquivo, pdf)."""
+    evento = Evento.objects.select_related('cliente').get(id=evento_id)
+    main_title_text, subtitle_text, filename = _titulos_evento(evento)
+
+    # 1. Cabeçalho com Logo
+    header_text = [paragrafo(main_title_text, 'h1'), paragrafo(f"<b>{subtitle_text}</b>", 'h2')]
+    datas = []
+    if evento.data_montagem:
+        datas.append(("Montagem", evento.data_montagem.strftime('%d/%m/%Y')))
+    if evento.data_termino:
+        datas.append(("Término/Retorno", evento.data_termino.strftime('%d/%m/%Y')))
+    header_text += campos_em_linhas(datas)
+    story = [cabecalho_com_logo(LOGO_PATH, header_text), espaco(0.2)]
+
+    # 2. Informações Gerais
+    info = [("Cliente", evento.cliente.empresa if evento.cliente else 'N/A'), ("Local", evento.local or 'N/A')]
+    if evento.responsavel_local_nome:
+        info.append(("Responsável no Local", f"{evento.responsavel_local_nome} ({evento.responsavel_local_contato or 'sem contato'})"))
+    story += [tabela_campos(info), espaco(0.25)]
+
+    # 3. Detalhes Técnicos (Pré-Evento)
+    tecnicos = [
+        ("Tipo de Energia", evento.get_tipo_energia_display() or 'Não informado'),
+        ("Distância do Ponto (m)", str(evento.distancia_energia_metros)),
+        ("Acesso de Veículo", evento.get_ponto_acesso_veiculo_display() or 'Não informado'),
+        ("Necessita Gerador", "Sim" if evento.necessita_gerador else "Não"),
+    ]
+    if evento.observacoes_tecnicas:
+        tecnicos.append(("Observações", evento.observacoes_tecnicas.replace('\n', '<br/>')))
+    _secao(story, "Detalhes Técnicos (Pré-Evento)", tabela_campos(tecnicos))
+
+    # 4. Fotos do Pré-Evento
+    fotos = evento.fotos.all()
+    if fotos:
+        story.append(paragrafo("<b>Fotos do Local</b>", 'h3'))
+        # Derivado em resolução de impressão (core/imagens.py), não o original da câmera
+        imagens_fotos = [
+            RLImage(imagens.caminho_derivado(foto.imagem, 'impressao'), width=2.2*inch, height=1.6*inch)
+            for foto in fotos if os.path.exists(foto.imagem.path)
+        ]
+        if imagens_fotos:
+            story.append(Table([imagens_fotos[i:i + 3] for i in range(0, len(imagens_fotos), 3)]))
+        story.append(espaco(0.25))
+
+    # 5. Lista de Materiais e Consumíveis
+    materiais = evento.materialevento_set.select_related('equipamento')
+    if materiais:
+        _secao(story, "Lista de Materiais", TABELA_MATERIAIS.montar([[_nome_do_item(item), item.quantidade] for item in materiais]))
+
+    consumiveis = evento.consumiveis_set.select_related('consumivel')
+    if consumiveis:
+        linhas = [[item.consumivel.nome, item.quantidade, item.consumivel.unidade_medida] for item in consumiveis]
+        _secao(story, "Lista de Consumíveis", TABELA_CONSUMIVEIS.montar(linhas))
+
+    # 6. Equipe Designada (a partir da escala; o antigo campo 'equipe' não existe mais)
+    escala = evento.escala_equipe.select_related('funcionario').order_by('funcionario__nome')
+    if escala:
+        _secao(story, "Equipe Designada", TABELA_EQUIPE.montar([[item.funcionario.nome, item.funcionario.funcao] for item in escala]))
+
+    # 7. Frota Designada
+    veiculos = evento.veiculos.all()
+    if veiculos:
+        _secao(story, "Frota Designada", TABELA_FROTA.montar([[veiculo.nome, veiculo.placa] for veiculo in veiculos]), espaco_depois=0)
+
+    return filename, renderizar('evento', story)
+
+
+def dados_da_guia(evento):
+    """
+    Cabeçalho e consumíveis da guia como estão agora. A GuiaSaida guarda isto
+    na emissão, para a guia arquivada não mudar quando o evento for editado.
+    """
+    return {
+        'operacao': evento.nome or evento.get_tipo_evento_display(),
+        'nome': evento.nome or str(evento.id),
+        'cliente': evento.cliente.empresa,
+        'local': evento.local or '',
+        'data_evento': evento.data_evento.strftime('%d/%m/%Y') if evento.data_evento else '',
+        'data_termino': evento.data_termino.strftime('%d/%m/%Y') if evento.data_termino else '',
+        'consumiveis': [[item.consumivel.nome, item.quantidade] for item in evento.consumiveis_set.select_related('consumivel')],
+    }
+
+
+def guia_saida(evento_id, itens, numero=None, emitida_em=None, dados=None):
+    """
+    Guia de saída com os itens [{'modelo', 'qtd'}]. Com 'numero', 'emitida_em'
+    e 'dados' (congelados na emissão) é a guia arquivada (core/guias.py):
+    saída determinística, sem o relógio e sem reler o evento.
+    """
+    if dados is None:
+        dados = dados_da_guia(Evento.objects.select_related('cliente').get(id=evento_id))
+    if not itens:
+        raise RelatorioIndisponivel('Nenhum equipamento fornecido para a guia.')
+
+    emissao = timezone.localtime(emitida_em) if emitida_em else datetime.now()
+    filename = f"Guia_Saida_{numero or dados['nome']}_{emissao:%Y%m%d-%H%M}.pdf"
+
+    campos = [("Guia Nº", numero)] if numero else []
+    campos.append(("Cliente", dados['cliente']))
+    if dados['local']:
+        campos.append(("Endereço / Local", dados['local']))
+    if dados['data_evento']:
+        campos.append(("Data de Saída", dados['data_evento']))
+    if dados['data_termino']:
+        campos.append(("Data de Retorno Previsto", dados['data_termino']))
+    campos.append(("Data de Emissão do Documento", emissao.strftime('%d/%m/%Y %H:%M')))
+    story = _cabecalho_guia("Guia de Saída de Material", dados['operacao'], campos)
+
+    _secao(story, "Equipamentos", TABELA_GUIA_EQUIPAMENTOS.montar([[item['modelo'], item['qtd']] for item in itens]))
+
+    if dados['consumiveis']:
+        _secao(story, "Consumíveis", TABELA_GUIA_CONSUMIVEIS.montar(dados['consumiveis']), espaco_depois=0)
+
+    story += [espaco(1), assinaturas()]
+    return filename, renderizar('guia_saida', story, invariante=bool(numero))
+
+
+def relatorio_avarias(evento_id):
+    """Relatório de perdas e avarias: tudo o que voltou da operação fora de 'Bom Estado'."""
+    evento = Evento.objects.select_related('cliente').get(id=evento_id)
+
+    # Busca todos os itens retornados para este evento que NÃO ESTÃO em "Bom Estado"
+    itens_avariados = ItemRetornado.objects.filter(
+        material_evento__evento_id=evento_id, condicao__in=ItemRetornado.CONDICOES_AVARIA,
+    ).select_related('material_evento__equipamento').order_by('material_evento__equipamento__modelo')
+
+    if not itens_avariados.exists():
+        raise RelatorioIndisponivel("Nenhum item com avaria foi registrado para esta operação.")
+
+    filename = f"Relatorio_Avarias_{evento.nome.replace(' ', '_')}_{evento.id}.pdf"
+
+    story = _cabecalho_guia("Relatório de Perdas e Avarias", evento.nome or evento.get_tipo_evento_display(), [
+        ("Cliente", evento.cliente.empresa),
+        ("Data de Emissão", datetime.now().strftime('%d/%m/%Y')),
+    ])
+    story.append(TABELA_AVARIAS.montar([
+        [_nome_do_item(item.material_evento), item.quantidade, item.get_condicao_display(), item.observacao or "Nenhuma"]
+        for item in itens_avariados
+    ]))
+    return filename, renderizar('avarias', story)
+
+
+def guia_reforco(evento_id, itens, numero=None, emitida_em=None, dados=None):
+    """Guia de saída do material extra (reforço) enviado para uma operação em andamento."""
+    if dados is None:
+        dados = dados_da_guia(Evento.objects.select_related('cliente').get(id=evento_id))
+    if not itens:
+        raise RelatorioIndisponivel('Nenhum item fornecido para a guia de reforço.')
+
+    emissao = timezone.localtime(emitida_em or timezone.now())
+    filename = f"Guia_Reforco_{numero or dados['nome']}_{emissao:%Y%m%d-%H%M}.pdf"
+
+    campos = [("Guia Nº", numero)] if numero else []
+    campos += [("Cliente", dados['cliente']), ("Data de Emissão", emissao.strftime('%d/%m/%Y %H:%M'))]
+    story = _cabecalho_guia("Guia de Saída de Material Extra (Reforço)", dados['operacao'], campos)
+    story += [TABELA_REFORCO.montar([[item['modelo'], item['qtd']] for item in itens]), espaco(1), assinaturas()]
+    return filename, renderizar('guia_reforco', story, invariante=bool(numero))
+
+
+def erros_do_pacote(erros):
+    """Página final do pacote de saída listando as operações que não puderam ser geradas."""
+    story = [
+        paragrafo("Operações fora do pacote", 'h1'),
+        paragrafo("Os documentos abaixo não foram gerados; gere-os individualmente pela tela da operação.", 'Normal'),
+        espaco(0.2),
+        *[paragrafo(escape(erro), 'Normal') for erro in erros],
+    ]
+    return "Erros_do_pacote.pdf", renderizar('pacote_erros', story)
+
+
+# Tipos aceitos pela fila de relatórios (core/tarefas.py) e quais parâmetros cada um recebe
+RELATORIOS = {
+    'evento': (relatorio_evento, ['evento_id']),
+    'guia_saida': (guia_saida, ['evento_id', 'itens']),
+    'avarias': (relatorio_avarias, ['evento_id']),
+    'guia_reforco': (guia_reforco, ['evento_id', 'itens']),
+}
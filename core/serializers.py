@@ -1,14 +1,31 @@
 # Em: core/serializers.py (Versão com a correção no EventoSerializer)
 
 from rest_framework import serializers
+from . import imagens
 from .models import (
     Cliente, Equipamento, Evento, Funcionario, Veiculo, 
     MaterialEvento, FotoPreEvento, ItemRetornado, RegistroManutencao, Usuario,
     Consumivel, ConsumivelEvento, AditivoOperacao, MaterialAditivo, 
-    ConfirmacaoPresenca, HistoricoManutencao, EscalaFuncionario
+    ConfirmacaoPresenca, HistoricoManutencao, EscalaFuncionario, TarefaRelatorio, GuiaSaida
 )
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+class CamposDinamicosMixin:
+    """
+    Permite ao cliente pedir só parte dos campos com ?fields=id,nome,status.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None:
+            return
+        campos = request.query_params.get('fields')
+        if not campos:
+            return
+        permitidos = {campo.strip() for campo in campos.split(',') if campo.strip()}
+        for campo in set(self.fields) - permitidos:
+            self.fields.pop(campo)
+
 class ClienteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Cliente
@@ -30,9 +47,24 @@ class VeiculoSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class FotoPreEventoSerializer(serializers.ModelSerializer):
+    # Listas usam a miniatura; 'imagem' continua sendo o original
+    miniatura = serializers.SerializerMethodField()
+    imagem_impressao = serializers.SerializerMethodField()
+
     class Meta:
         model = FotoPreEvento
-        fields = '__all__'        
+        fields = '__all__'
+
+    def _url(self, obj, tamanho):
+        url = imagens.url_derivado(obj.imagem, tamanho)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request and url else url
+
+    def get_miniatura(self, obj):
+        return self._url(obj, 'miniatura')
+
+    def get_imagem_impressao(self, obj):
+        return self._url(obj, 'impressao')
 
 class ConsumivelSerializer(serializers.ModelSerializer):
     class Meta:
@@ -128,7 +160,7 @@ class EscalaFuncionarioSerializer(serializers.ModelSerializer):
         fields = ['id', 'evento', 'funcionario', 'funcionario_id', 'data_inicio', 'hora_inicio', 'data_fim', 'hora_fim']
 
 # --- CLASSE EventoSerializer CORRIGIDA ---
-class EventoSerializer(serializers.ModelSerializer):
+class EventoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     cliente = ClienteSerializer(read_only=True)
     # A linha 'equipe' foi removida. Usamos 'escala_equipe' agora.
     escala_equipe = EscalaFuncionarioSerializer(many=True, read_only=True)
@@ -137,7 +169,6 @@ class EventoSerializer(serializers.ModelSerializer):
     consumiveis_set = ConsumivelEventoSerializer(many=True, read_only=True)
     status_display = serializers.CharField(source='get_status_display', read_only=True)
     criado_por = UsuarioSimpleSerializer(read_only=True)
-    tem_avarias = serializers.SerializerMethodField()
     chefe_de_equipe = FuncionarioSerializer(read_only=True)
     confirmacoes_presenca = ConfirmacaoPresencaSerializer(many=True, read_only=True)
     
@@ -152,11 +183,36 @@ class EventoSerializer(serializers.ModelSerializer):
             'data_montagem', 'data_evento', 'data_termino', 'modificado_em', 
             'observacao_correcao', 'motivo_cancelamento', 'escala_equipe', 'veiculos', 
             'chefe_de_equipe', 'confirmacoes_presenca',
-            'materialevento_set', 'consumiveis_set', 'criado_por', 'tem_avarias'
+            'materialevento_set', 'consumiveis_set', 'criado_por', 'tem_avarias',
+            'itens_com_defeito', 'itens_quebrados', 'itens_perdidos'
         ]
 
-    def get_tem_avarias(self, obj):
-        return ItemRetornado.objects.filter(material_evento__evento=obj).exclude(condicao='OK').exists()
+class ClienteResumoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Cliente
+        fields = ['id', 'empresa']
+
+# --- REPRESENTAÇÃO COMPACTA PARA LISTAGENS (depende de EventoQuerySet.com_resumo) ---
+class EventoResumoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    cliente = ClienteResumoSerializer(read_only=True)
+    cliente_nome = serializers.CharField(source='cliente.empresa', read_only=True)
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    criado_por = UsuarioSimpleSerializer(read_only=True)
+    total_materiais = serializers.IntegerField(read_only=True)
+    total_itens_planejados = serializers.IntegerField(read_only=True)
+    total_itens_separados = serializers.IntegerField(read_only=True)
+    total_pendencias_suprimento = serializers.IntegerField(read_only=True)
+    total_equipe = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Evento
+        fields = [
+            'id', 'nome', 'status', 'status_display', 'tipo_evento', 'local',
+            'cliente', 'cliente_nome', 'data_montagem', 'data_evento', 'data_termino',
+            'modificado_em', 'observacao_correcao', 'criado_por', 'tem_avarias',
+            'itens_com_defeito', 'itens_quebrados', 'itens_perdidos', 'total_materiais', 'total_itens_planejados', 'total_itens_separados',
+            'total_pendencias_suprimento', 'total_equipe'
+        ]
 
 class RegistroManutencaoSerializer(serializers.ModelSerializer):
     equipamento = EquipamentoSerializer(read_only=True)
@@ -168,6 +224,41 @@ class RegistroManutencaoSerializer(serializers.ModelSerializer):
                   'descricao_problema', 'solucao_aplicada', 'data_entrada',
                   'data_saida', 'historico_detalhado']
 
+class PedidoManutencaoSerializer(serializers.Serializer):
+    """Uma linha do POST /manutencao/lote/ (validada antes de travar o estoque)."""
+    equipamento_id = serializers.IntegerField()
+    quantidade = serializers.IntegerField(min_value=1)
+    descricao_problema = serializers.CharField()
+
+class TarefaRelatorioSerializer(serializers.ModelSerializer):
+    status_display = serializers.CharField(source='get_status_display', read_only=True)
+    download = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TarefaRelatorio
+        fields = ['id', 'tipo', 'parametros', 'status', 'status_display', 'nome_arquivo', 'erro',
+                  'progresso', 'total', 'criado_em', 'iniciado_em', 'concluido_em', 'download']
+
+    def get_download(self, obj):
+        if obj.status != 'CONCLUIDA':
+            return None
+        url = f'/api/relatorios/tarefas/{obj.pk}/download/'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+class GuiaSaidaSerializer(serializers.ModelSerializer):
+    tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
+    pdf = serializers.SerializerMethodField()
+
+    class Meta:
+        model = GuiaSaida
+        fields = ['id', 'numero', 'tipo', 'tipo_display', 'evento', 'itens', 'emitida_por', 'emitida_em', 'sha256', 'pdf']
+
+    def get_pdf(self, obj):
+        url = f'/api/guias/{obj.pk}/pdf/'
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
 class UsuarioSerializer(serializers.ModelSerializer):
     class Meta:
         model = Usuario
@@ -0,0 +1,187 @@
+# Em: core/signals.py
+
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from . import cache_relatorios, dashboard, imagens, movimentacoes
+from .models import (
+    Cliente, Consumivel, Funcionario, Veiculo, Equipamento, Evento, MaterialEvento, ItemRetornado, EscalaFuncionario, ConsumivelEvento,
+    ConfirmacaoPresenca, FotoPreEvento, Usuario,
+)
+
+
+# --- VERSIONAMENTO DO EVENTO: alterações nas linhas filhas "tocam" o modificado_em do pai ---
+# Assim o ETag/Last-Modified do evento (core/cache_http.py) muda quando qualquer parte dele muda.
+# O cache do painel só é apagado depois do commit: apagado antes, uma leitura no meio da
+# transação guardaria de novo a versão antiga pelo timeout inteiro.
+
+def _depois_do_commit(funcao, *argumentos):
+    transaction.on_commit(lambda: funcao(*argumentos))
+
+
+@receiver([post_save, post_delete], sender=MaterialEvento)
+@receiver([post_save, post_delete], sender=EscalaFuncionario)
+@receiver([post_save, post_delete], sender=ConsumivelEvento)
+@receiver([post_save, post_delete], sender=ConfirmacaoPresenca)
+@receiver([post_save, post_delete], sender=FotoPreEvento)
+def tocar_evento_da_linha(sender, instance, **kwargs):
+    Evento.objects.filter(pk=instance.evento_id).marcar_modificados()
+    _depois_do_commit(dashboard.invalidar_evento, instance.evento_id)
+
+
+@receiver([post_save, post_delete], sender=ItemRetornado)
+def tocar_evento_do_retorno(sender, instance, **kwargs):
+    evento_ids = list(MaterialEvento.objects.filter(pk=instance.material_evento_id).values_list('evento_id', flat=True))
+    Evento.objects.filter(pk__in=evento_ids).marcar_modificados()
+    _depois_do_commit(dashboard.invalidar_evento, *evento_ids)
+    # Retornos mexem em tem_avarias por update(), sem post_save do Evento, e uma operação
+    # finalizada entra ou sai do painel conforme tenha avarias
+    _depois_do_commit(dashboard.invalidar_lista_eventos)
+
+
+@receiver(m2m_changed, sender=Evento.veiculos.through)
+def tocar_evento_da_frota(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Evento):
+        Evento.objects.filter(pk=instance.pk).marcar_modificados()
+
+
+# Cadastros que aparecem aninhados no evento (cliente, equipe, frota, itens): editar
+# um deles muda a representação de todos os eventos que o citam.
+
+def _tocar_eventos(eventos):
+    evento_ids = list(eventos.values_list('pk', flat=True).distinct())
+    if evento_ids:
+        Evento.objects.filter(pk__in=evento_ids).marcar_modificados()
+        _depois_do_commit(dashboard.invalidar_evento, *evento_ids)
+
+
+@receiver(post_save, sender=Cliente)
+def tocar_eventos_do_cliente(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        _tocar_eventos(Evento.objects.filter(cliente=instance))
+
+
+@receiver(post_save, sender=Funcionario)
+def tocar_eventos_do_funcionario(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        _tocar_eventos(Evento.objects.filter(Q(chefe_de_equipe=instance) | Q(escala_equipe__funcionario=instance)))
+
+
+@receiver(post_save, sender=Veiculo)
+def tocar_eventos_do_veiculo(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        _tocar_eventos(Evento.objects.filter(veiculos=instance))
+
+
+@receiver(post_save, sender=Consumivel)
+def tocar_eventos_do_consumivel(sender, instance, created=False, raw=False, **kwargs):
+    if not created and not raw:
+        _tocar_eventos(Evento.objects.filter(consumiveis_set__consumivel=instance))
+
+
+@receiver(post_save, sender=Equipamento)
+def tocar_eventos_do_equipamento(sender, instance, created=False, raw=False, **kwargs):
+    # As rotas de estoque gravam via update/bulk_update e já tocam o evento que movimentaram
+    if not created and not raw:
+        _tocar_eventos(Evento.objects.filter(materialevento__equipamento=instance))
+
+
+@receiver(post_save, sender=Usuario)
+def tocar_eventos_do_usuario(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    # O login só grava last_login, que não aparece no evento
+    if created or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    _tocar_eventos(Evento.objects.filter(criado_por=instance))
+
+
+# --- CACHE DO PAINEL DE LOGÍSTICA (core/dashboard.py) ---
+
+@receiver([post_save, post_delete], sender=Evento)
+def invalidar_painel_do_evento(sender, instance, **kwargs):
+    # Status e datas definem quais operações aparecem no painel e em que ordem
+    _depois_do_commit(dashboard.invalidar_lista_eventos)
+    _depois_do_commit(dashboard.invalidar_evento, instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Equipamento)
+def invalidar_totais_do_painel(sender, instance, **kwargs):
+    transaction.on_commit(dashboard.invalidar_totais)
+
+
+# --- RAZÃO DO ESTOQUE (core/movimentacoes.py) ---
+# As rotas de movimentação lançam no razão por conta própria (update/bulk_update);
+# um save() direto do Equipamento (cadastro, edição, admin, importação) vira ajuste.
+
+@receiver(pre_save, sender=Equipamento)
+def guardar_contadores_anteriores(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Fixtures (raw) trazem o próprio razão
+    if not raw:
+        movimentacoes.preparar_ajuste(instance, update_fields)
+
+
+@receiver(post_save, sender=Equipamento)
+def lancar_ajuste_de_estoque(sender, instance, raw=False, **kwargs):
+    if not raw:
+        movimentacoes.lancar_ajuste(instance)
+
+
+# --- CONTADORES DE RETORNO DO MATERIAL (MaterialEvento.quantidade_retornada_*) ---
+# Rodam na mesma transação do save/delete do ItemRetornado. Quem grava em massa
+# (bulk_create) chama MaterialEvento.objects.somar_retornos() por conta própria.
+
+@receiver(pre_save, sender=ItemRetornado)
+def guardar_retorno_anterior(sender, instance, raw=False, **kwargs):
+    if not raw and instance.pk:
+        instance._retorno_anterior = ItemRetornado.objects.filter(pk=instance.pk).values_list(
+            'material_evento_id', 'condicao', 'quantidade',
+        ).first()
+
+
+@receiver(post_save, sender=ItemRetornado)
+def somar_retorno(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    variacoes = [(instance.material_evento_id, instance.condicao, instance.quantidade)]
+    anterior = instance.__dict__.pop('_retorno_anterior', None)
+    if anterior:
+        material_id, condicao, quantidade = anterior
+        variacoes.append((material_id, condicao, -quantidade))
+    MaterialEvento.objects.somar_retornos(variacoes)
+
+
+@receiver(post_delete, sender=ItemRetornado)
+def descontar_retorno(sender, instance, **kwargs):
+    MaterialEvento.objects.somar_retornos([(instance.material_evento_id, instance.condicao, -instance.quantidade)])
+
+
+# --- CACHE DE PDFs (core/cache_relatorios.py) ---
+
+@receiver(post_delete, sender=Evento)
+def descartar_relatorios_do_evento(sender, instance, **kwargs):
+    cache_relatorios.invalidar_evento(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Cliente)
+@receiver([post_save, post_delete], sender=Funcionario)
+@receiver([post_save, post_delete], sender=Veiculo)
+@receiver([post_save, post_delete], sender=Consumivel)
+def limpar_relatorios_em_cache(sender, instance, **kwargs):
+    # Cadastros não versionam os eventos que os usam; como mudam pouco, limpa tudo
+    cache_relatorios.limpar()
+
+
+# --- DERIVADOS DAS FOTOS (core/imagens.py) ---
+
+@receiver(post_save, sender=FotoPreEvento)
+def gerar_derivados_da_foto(sender, instance, **kwargs):
+    if instance.imagem:
+        transaction.on_commit(lambda: imagens.gerar_derivados(instance.imagem))
+
+
+@receiver(post_delete, sender=FotoPreEvento)
+def apagar_derivados_da_foto(sender, instance, **kwargs):
+    if instance.imagem:
+        imagens.apagar_derivados(instance.imagem)
+
@@ -0,0 +1,143 @@
+# Em: core/tarefas.py
+
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import pacote_saida, relatorios
+from .models import TarefaRelatorio
+
+logger = logging.getLogger(__name__)
+
+
+class FilaCheia(Exception):
+    """Muitas tarefas pendentes; o cliente deve tentar de novo mais tarde."""
+
+
+# Relatórios avulsos + o pacote de saída do dia (vários eventos num arquivo só).
+# 'ao_progredir' na lista de parâmetros = a função recebe o callback de progresso da tarefa.
+TIPOS = {
+    **relatorios.RELATORIOS,
+    'pacote_saida': (pacote_saida.gerar_pacote, ['evento_ids', 'formato', 'ao_progredir']),
+}
+
+
+# --- EXECUÇÃO ---
+
+def executar_tarefa(tarefa_id):
+    """Gera o PDF de uma tarefa. Roda no worker do rq, no pool local ou direto (modo síncrono)."""
+    # Marca como em andamento só se ainda estiver pendente: evita que duas execuções peguem a mesma tarefa
+    assumida = TarefaRelatorio.objects.filter(pk=tarefa_id, status='PENDENTE').update(status='PROCESSANDO', iniciado_em=timezone.now())
+    if not assumida:
+        return
+    tarefa = TarefaRelatorio.objects.get(pk=tarefa_id)
+    funcao, parametros = TIPOS[tarefa.tipo]
+    argumentos = {nome: tarefa.parametros.get(nome) for nome in parametros if nome != 'ao_progredir'}
+    if 'ao_progredir' in parametros:
+        argumentos['ao_progredir'] = lambda feitos, total: TarefaRelatorio.objects.filter(pk=tarefa.pk).update(progresso=feitos, total=total)
+    try:
+        nome_arquivo, conteudo = funcao(**argumentos)
+    except Exception as e:
+        logger.exception("Falha ao gerar relatório %s (%s)", tarefa.pk, tarefa.tipo)
+        tarefa.status = 'ERRO'
+        tarefa.erro = str(e) or e.__class__.__name__
+        tarefa.concluido_em = timezone.now()
+        tarefa.save(update_fields=['status', 'erro', 'concluido_em'])
+        return
+    extensao = posixpath.splitext(nome_arquivo)[1] or '.pdf'
+    tarefa.arquivo.save(f'{tarefa.pk}{extensao}', ContentFile(conteudo), save=False)
+    tarefa.nome_arquivo = nome_arquivo
+    tarefa.status = 'CONCLUIDA'
+    tarefa.concluido_em = timezone.now()
+    tarefa.save(update_fields=['arquivo', 'nome_arquivo', 'status', 'concluido_em'])
+
+
+# --- BACKENDS DA FILA ---
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executar_no_pool(funcao, *argumentos):
+    try:
+        funcao(*argumentos)
+    except Exception:
+        logger.exception("Falha no trabalho em segundo plano %s%r", funcao.__name__, argumentos)
+    finally:
+        # Threads do pool não passam pelo ciclo de requisição: fecha a conexão aqui
+        close_old_connections()
+
+
+def _enfileirar_thread(funcao, *argumentos):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Poucas threads de propósito: o ReportLab é CPU e disputa o GIL com as requisições da API
+            _pool = ThreadPoolExecutor(max_workers=settings.RELATORIOS_MAX_CONCORRENCIA, thread_name_prefix='relatorios')
+    _pool.submit(_executar_no_pool, funcao, *argumentos)
+
+
+def _enfileirar_rq(funcao, *argumentos):
+    import django_rq
+    django_rq.get_queue('relatorios').enqueue(funcao, *argumentos)
+
+
+def _executar_agora(funcao, *argumentos):
+    funcao(*argumentos)
+
+
+BACKENDS = {
+    'rq': _enfileirar_rq,
+    'thread': _enfileirar_thread,
+    'sincrono': _executar_agora,
+}
+
+
+def em_segundo_plano(funcao, *argumentos):
+    """
+    Roda funcao(*argumentos) na fila de relatórios depois do commit, fora da
+    requisição. Para trabalho sem TarefaRelatorio (ex.: arquivar a guia emitida);
+    'funcao' precisa ser importável pelo worker do rq.
+    """
+    backend = BACKENDS[settings.RELATORIOS_FILA]
+    transaction.on_commit(lambda: backend(funcao, *argumentos), robust=True)
+
+
+# --- API USADA PELAS VIEWS ---
+
+def solicitar(tipo, parametros, usuario=None):
+    """
+    Registra a tarefa e a envia para a fila depois do commit. Recusa (FilaCheia)
+    quando já há tarefas demais esperando, para um pico de relatórios não tomar
+    os workers das requisições normais.
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de relatório desconhecido: {tipo}.")
+    limpar_expiradas()
+
+    abertas = TarefaRelatorio.objects.filter(status__in=['PENDENTE', 'PROCESSANDO'])
+    if abertas.count() >= settings.RELATORIOS_MAX_PENDENTES:
+        raise FilaCheia("A fila de relatórios está cheia. Tente novamente em instantes.")
+    if usuario is not None and abertas.filter(solicitado_por=usuario).count() >= settings.RELATORIOS_MAX_PENDENTES_USUARIO:
+        raise FilaCheia("Você já tem relatórios sendo gerados. Aguarde a conclusão deles.")
+
+    tarefa = TarefaRelatorio.objects.create(tipo=tipo, parametros=parametros, solicitado_por=usuario)
+    backend = BACKENDS[settings.RELATORIOS_FILA]
+    transaction.on_commit(lambda: backend(executar_tarefa, str(tarefa.pk)))
+    return tarefa
+
+
+def limpar_expiradas():
+    """Apaga tarefas finalizadas (e seus PDFs) mais antigas que RELATORIOS_RETENCAO_HORAS."""
+    limite = timezone.now() - timedelta(hours=settings.RELATORIOS_RETENCAO_HORAS)
+    for tarefa in TarefaRelatorio.objects.filter(status__in=['CONCLUIDA', 'ERRO'], concluido_em__lt=limite):
+        if tarefa.arquivo:
+            tarefa.arquivo.delete(save=False)
+        tarefa.delete()
@@ -1,3 +1,1169 @@
-from django.test import TestCase
+import hashlib
+import json
+import os
+import re
+import tempfile
+import zipfile
+from datetime import date, datetime, time, timedelta
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from prometheus_client import REGISTRY
+from pypdf import PdfReader
+from reportlab.lib.units import inch
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import (
+    cache_relatorios, dashboard, guias, imagens, instrumentacao, motor_relatorios, movimentacoes, pacote_saida,
+    perfilador, relatorios,
+)
+from .filters import EventoFilter
+from .models import (
+    Cliente, Equipamento, Evento, Funcionario, Veiculo, MaterialEvento, ItemRetornado,
+    Consumivel, ConsumivelEvento, ConfirmacaoPresenca, EscalaFuncionario, Usuario, RegistroManutencao,
+    FotoPreEvento, GuiaSaida, MovimentacaoEstoque, SaldoEstoque, SequenciaOS,
+)
+from .views import RegistroManutencaoHistoryViewSet, RegistroManutencaoViewSet
+
+def criar_evento_completo(cliente, funcionario, veiculo, consumivel, equipamentos, indice):
+    evento = Evento.objects.create(
+        nome=f"Evento {indice}", cliente=cliente, data_evento=date(2025, 1, 1 + indice % 28),
+        status='EM_ANDAMENTO', chefe_de_equipe=funcionario,
+    )
+    evento.veiculos.add(veiculo)
+    EscalaFuncionario.objects.create(
+        evento=evento, funcionario=funcionario, data_inicio=evento.data_evento, hora_inicio=time(8),
+        data_fim=evento.data_evento, hora_fim=time(18),
+    )
+    ConsumivelEvento.objects.create(evento=evento, consumivel=consumivel, quantidade=2)
+    ConfirmacaoPresenca.objects.create(evento=evento, funcionario=funcionario)
+    for equipamento in equipamentos:
+        material = MaterialEvento.objects.create(evento=evento, equipamento=equipamento, quantidade=4, quantidade_separada=4)
+        ItemRetornado.objects.create(material_evento=material, quantidade=2, condicao='OK')
+        ItemRetornado.objects.create(material_evento=material, quantidade=1, condicao='DEFEITO')
+    return evento
+
+
+class DiretorioTemporarioMixin:
+    def usar_configuracoes(self, **configuracoes):
+        configuracao = override_settings(**configuracoes)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+    def usar_diretorio_temporario(self, *nomes, **configuracoes):
+        # Diretório apagado no fim do teste; os settings em `nomes` passam a apontar para ele
+        diretorio = tempfile.TemporaryDirectory()
+        self.addCleanup(diretorio.cleanup)
+        self.usar_configuracoes(**dict.fromkeys(nomes, diretorio.name), **configuracoes)
+        return Path(diretorio.name)
+
+
+class EventoQueryBudgetTests(TestCase):
+    # Consultas esperadas: sondagem do ETag + eventos + materiais + retornos + escala + consumíveis + presenças + veículos
+    CONSULTAS_LISTAGEM = 8
+
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='planejador', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.funcionario = Funcionario.objects.create(nome='Técnico')
+        self.veiculo = Veiculo.objects.create(nome='Caminhão', placa='ABC1234')
+        self.consumivel = Consumivel.objects.create(nome='Fita Silver Tape')
+        self.equipamentos = [
+            Equipamento.objects.create(modelo=f"Moving {i}", quantidade_estoque=10) for i in range(3)
+        ]
+
+    def criar_eventos(self, quantidade):
+        for indice in range(Evento.objects.count(), Evento.objects.count() + quantidade):
+            criar_evento_completo(self.cliente, self.funcionario, self.veiculo, self.consumivel, self.equipamentos, indice)
+
+    def test_listagem_com_numero_fixo_de_consultas(self):
+        self.criar_eventos(2)
+        with self.assertNumQueries(self.CONSULTAS_LISTAGEM):
+            resposta = self.client.get('/api/eventos/?expand=1')
+        self.assertEqual(resposta.status_code, 200)
+
+        self.criar_eventos(8)
+        with self.assertNumQueries(self.CONSULTAS_LISTAGEM):
+            resposta = self.client.get('/api/eventos/?expand=1')
+        self.assertEqual(len(resposta.json()), 10)
+
+    def test_listagem_resumida_sem_consultas_por_linha(self):
+        self.criar_eventos(5)
+        with self.assertNumQueries(2):
+            resposta = self.client.get('/api/eventos/')
+        self.assertEqual(len(resposta.json()), 5)
+
+    def test_detalhe_com_numero_fixo_de_consultas(self):
+        self.criar_eventos(1)
+        evento = Evento.objects.get()
+        with self.assertNumQueries(self.CONSULTAS_LISTAGEM):
+            resposta = self.client.get(f'/api/eventos/{evento.id}/')
+        dados = resposta.json()
+        self.assertTrue(dados['tem_avarias'])
+        material = dados['materialevento_set'][0]
+        self.assertEqual(material['quantidade_retornada_ok'], 2)
+        self.assertEqual(material['quantidade_retornada_defeito'], 1)
+
+
+class EventoListagemResumidaTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='logistica', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        funcionario = Funcionario.objects.create(nome='Técnico')
+        veiculo = Veiculo.objects.create(nome='Caminhão', placa='ABC1234')
+        consumivel = Consumivel.objects.create(nome='Fita Silver Tape')
+        equipamentos = [Equipamento.objects.create(modelo=f"Par LED {i}", quantidade_estoque=10) for i in range(2)]
+        self.evento = criar_evento_completo(cliente, funcionario, veiculo, consumivel, equipamentos, 0)
+
+    def test_listagem_resumida_com_contadores(self):
+        dados = self.client.get('/api/eventos/').json()[0]
+        self.assertNotIn('materialevento_set', dados)
+        self.assertEqual(dados['cliente_nome'], 'ACME')
+        self.assertEqual(dados['total_materiais'], 2)
+        self.assertEqual(dados['total_itens_planejados'], 8)
+        self.assertEqual(dados['total_equipe'], 1)
+        self.assertTrue(dados['tem_avarias'])
+
+    def test_expand_e_fields(self):
+        dados = self.client.get('/api/eventos/?expand=1').json()[0]
+        self.assertIn('materialevento_set', dados)
+        dados = self.client.get('/api/eventos/?fields=id,status').json()[0]
+        self.assertEqual(set(dados), {'id', 'status'})
+
+
+class EventoFiltrosTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='planejador', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.acme = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        outro = Cliente.objects.create(empresa='Globex', representante='Beltrano')
+        self.chefe = Funcionario.objects.create(nome='Chefe')
+        self.caminhao = Veiculo.objects.create(nome='Caminhão', placa='ABC1234')
+        # Montagem 28/02, show 01/03, desmontagem 03/03
+        self.festival = Evento.objects.create(
+            nome='Festival', cliente=self.acme, status='EM_ANDAMENTO', chefe_de_equipe=self.chefe,
+            data_montagem=date(2025, 2, 28), data_evento=date(2025, 3, 1), data_termino=date(2025, 3, 3),
+        )
+        self.festival.veiculos.add(self.caminhao)
+        self.palestra = Evento.objects.create(nome='Palestra', cliente=outro, status='PLANEJAMENTO', data_evento=date(2025, 3, 10))
+        self.antigo = Evento.objects.create(nome='Antigo', cliente=self.acme, status='FINALIZADO', data_evento=date(2024, 5, 1))
+        equipamento = Equipamento.objects.create(modelo='Moving', quantidade_estoque=1)
+        MaterialEvento.objects.create(evento=self.palestra, equipamento=equipamento, quantidade=5)
+
+    def nomes(self, consulta):
+        resposta = self.client.get(f'/api/eventos/?{consulta}')
+        self.assertEqual(resposta.status_code, 200)
+        return sorted(evento['nome'] for evento in resposta.json())
+
+    def test_janela_considera_montagem_e_termino(self):
+        self.assertEqual(self.nomes('inicio=2025-03-02&fim=2025-03-05'), ['Festival'])
+        self.assertEqual(self.nomes('inicio=2025-02-20&fim=2025-02-28'), ['Festival'])
+        self.assertEqual(self.nomes('inicio=2025-03-04'), ['Palestra'])
+        self.assertEqual(self.nomes('fim=2025-01-01'), ['Antigo'])
+
+    def test_status_cliente_equipe_frota_e_suprimento(self):
+        self.assertEqual(self.nomes('status=EM_ANDAMENTO&status=PLANEJAMENTO'), ['Festival', 'Palestra'])
+        self.assertEqual(self.nomes(f'cliente={self.acme.id}'), ['Antigo', 'Festival'])
+        self.assertEqual(self.nomes(f'chefe_de_equipe={self.chefe.id}'), ['Festival'])
+        self.assertEqual(self.nomes(f'veiculo={self.caminhao.id}'), ['Festival'])
+        self.assertEqual(self.nomes('pendente_suprimento=true'), ['Palestra'])
+        self.assertEqual(self.nomes('pendente_suprimento=false&cliente=' + str(self.acme.id)), ['Antigo', 'Festival'])
+
+    def test_valor_invalido_responde_400(self):
+        self.assertEqual(self.client.get('/api/eventos/?status=QUALQUER').status_code, 400)
+        self.assertEqual(self.client.get('/api/eventos/?inicio=ontem').status_code, 400)
+
+
+class PaginacaoCursorTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='almoxarife', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        for i in range(5):
+            Equipamento.objects.create(modelo=f"Refletor {i}", quantidade_estoque=i)
+
+    def test_sem_parametros_mantem_lista_completa(self):
+        self.assertEqual(len(self.client.get('/api/equipamentos/').json()), 5)
+
+    def test_paginacao_obrigatoria_pagina_sem_parametros(self):
+        with override_settings(API_PAGINACAO_OBRIGATORIA=True):
+            pagina = self.client.get('/api/equipamentos/').json()
+        self.assertEqual(len(pagina['results']), 5)
+        self.assertIn('next', pagina)
+
+    def test_percorre_paginas_pelo_cursor(self):
+        pagina = self.client.get('/api/equipamentos/?page_size=2').json()
+        modelos = [item['modelo'] for item in pagina['results']]
+        while pagina['next']:
+            pagina = self.client.get(pagina['next']).json()
+            modelos += [item['modelo'] for item in pagina['results']]
+        self.assertEqual(modelos, [f"Refletor {i}" for i in range(5)])
+        self.assertNotIn('count', pagina)
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='conferente', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.equipamento = Equipamento.objects.create(modelo='Mesa de Luz', quantidade_estoque=3)
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 3, 1))
+
+    def test_detalhe_responde_304_ate_linha_filha_mudar(self):
+        url = f'/api/eventos/{self.evento.id}/'
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 304)
+
+        MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamento, quantidade=1)
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertNotEqual(resposta['ETag'], etag)
+
+    def test_chave_malformada_responde_404(self):
+        self.assertEqual(self.client.get('/api/eventos/abc/').status_code, 404)
+        self.assertEqual(self.client.get('/api/equipamentos/abc/').status_code, 404)
+
+    def test_listagem_de_inventario_responde_304(self):
+        etag = self.client.get('/api/equipamentos/')['ETag']
+        self.assertEqual(self.client.get('/api/equipamentos/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Equipamento.objects.create(modelo='Strobo')
+        self.assertEqual(self.client.get('/api/equipamentos/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_listagem_nao_responde_por_if_modified_since(self):
+        Equipamento.objects.create(modelo='Strobo')
+        resposta = self.client.get('/api/equipamentos/')
+        self.assertNotIn('Last-Modified', resposta)
+        # Apagar não avança o max(modificado_em); só o ETag (com o count) percebe
+        Equipamento.objects.filter(modelo='Strobo').delete()
+        resposta = self.client.get('/api/equipamentos/', HTTP_IF_MODIFIED_SINCE='Fri, 01 Jan 2100 00:00:00 GMT')
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_editar_cliente_muda_versao_do_evento(self):
+        url = f'/api/eventos/{self.evento.id}/'
+        etag = self.client.get(url)['ETag']
+        self.evento.cliente.empresa = 'ACME Eventos'
+        self.evento.cliente.save()
+        resposta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['cliente']['empresa'], 'ACME Eventos')
+
+
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = Usuario.objects.create_user(username='gerente', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.equipamento = Equipamento.objects.create(modelo='Máquina de Fumaça', quantidade_estoque=4)
+        self.evento = Evento.objects.create(nome='Feira', cliente=self.cliente, data_evento=date(2025, 5, 1), status='AGUARDANDO_SAIDA')
+
+    def test_segunda_chamada_nao_consulta_o_banco(self):
+        self.client.get('/api/dashboard-stats/')
+        with self.assertNumQueries(0):
+            dados = self.client.get('/api/dashboard-stats/').json()
+        self.assertEqual(dados['total_equipamentos'], 4)
+        self.assertEqual([e['id'] for e in dados['proximos_eventos']], [self.evento.id])
+
+    def test_signals_invalidam_so_as_partes_afetadas(self):
+        self.client.get('/api/dashboard-stats/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.equipamento.quantidade_estoque = 1
+            self.equipamento.save()
+            MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamento, quantidade=1)
+        dados = self.client.get('/api/dashboard-stats/').json()
+        self.assertEqual(dados['total_equipamentos'], 1)
+        self.assertEqual(dados['proximos_eventos'][0]['total_materiais'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento.status = 'CANCELADO'
+            self.evento.save()
+        self.assertEqual(self.client.get('/api/dashboard-stats/').json()['proximos_eventos'], [])
+
+    def test_invalidacao_so_depois_do_commit(self):
+        self.client.get('/api/dashboard-stats/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.evento.status = 'CANCELADO'
+            self.evento.save()
+            # Leitura no meio da transação: o cache antigo ainda vale e não é regravado depois
+            self.assertEqual(len(self.client.get('/api/dashboard-stats/').json()['proximos_eventos']), 1)
+        self.assertEqual(self.client.get('/api/dashboard-stats/').json()['proximos_eventos'], [])
+
+    def test_avaria_em_operacao_finalizada_entra_no_painel(self):
+        Evento.objects.filter(pk=self.evento.pk).update(status='FINALIZADO')
+        material = MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamento, quantidade=2, quantidade_separada=2)
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemRetornado.objects.create(material_evento=material, quantidade=2, condicao='OK')
+        self.assertEqual(self.client.get('/api/dashboard-stats/').json()['proximos_eventos'], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ItemRetornado.objects.filter(material_evento=material).get().delete()
+            ItemRetornado.objects.create(material_evento=material, quantidade=1, condicao='QUEBRADO')
+        dados = self.client.get('/api/dashboard-stats/').json()
+        self.assertEqual([evento['id'] for evento in dados['proximos_eventos']], [self.evento.id])
+
+
+class DisponibilidadeTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='planejamento', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.equipamento = Equipamento.objects.create(modelo='Beam 230', quantidade_estoque=10)
+
+    def reservar(self, inicio, fim, quantidade, status='PLANEJAMENTO'):
+        evento = Evento.objects.create(cliente=self.cliente, data_montagem=inicio, data_evento=inicio, data_termino=fim, status=status)
+        MaterialEvento.objects.create(evento=evento, equipamento=self.equipamento, quantidade=quantidade)
+        return evento
+
+    def test_pico_considera_apenas_operacoes_sobrepostas(self):
+        self.reservar(date(2025, 6, 6), date(2025, 6, 8), 4)
+        self.reservar(date(2025, 6, 7), date(2025, 6, 9), 3)
+        self.reservar(date(2025, 6, 9), date(2025, 6, 10), 5)
+        self.reservar(date(2025, 6, 7), date(2025, 6, 8), 9, status='CANCELADO')
+
+        url = f'/api/equipamentos/{self.equipamento.id}/disponibilidade/?inicio=2025-06-06&fim=2025-06-08'
+        dados = self.client.get(url).json()
+        self.assertEqual(dados['pico_comprometido'], 7)
+        self.assertEqual(dados['disponivel'], 3)
+
+        dados = self.client.get(url.replace('2025-06-06', '2025-06-09').replace('2025-06-08', '2025-06-10')).json()
+        self.assertEqual(dados['pico_comprometido'], 8)
+
+    def test_checagem_em_lote_e_aprovacao(self):
+        self.reservar(date(2025, 6, 6), date(2025, 6, 8), 8)
+        resposta = self.client.post('/api/equipamentos/disponibilidade/', {
+            'inicio': '2025-06-07', 'fim': '2025-06-07',
+            'itens': [{'equipamento_id': self.equipamento.id, 'quantidade': 5}],
+        }, format='json').json()
+        self.assertFalse(resposta['ok'])
+        self.assertEqual(resposta['itens'][0]['falta'], 3)
+
+        evento = self.reservar(date(2025, 6, 7), date(2025, 6, 7), 5, status='AGUARDANDO_CONFERENCIA')
+        MaterialEvento.objects.filter(evento=evento).update(conferido=True)
+        self.assertEqual(self.client.post(f'/api/eventos/{evento.id}/aprovar_lista/').status_code, 400)
+
+
+class VerificarEstoqueTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='planejamento', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.evento = Evento.objects.create(cliente=cliente, data_evento=date(2025, 7, 1))
+        self.equipamentos = [Equipamento.objects.create(modelo=f"Cabo {i}", quantidade_estoque=5) for i in range(30)]
+        for equipamento in self.equipamentos:
+            MaterialEvento.objects.create(evento=self.evento, equipamento=equipamento, quantidade=4)
+        MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamentos[0], quantidade=3)
+
+    def test_lista_do_evento_em_uma_consulta(self):
+        with self.assertNumQueries(1):
+            resposta = self.client.post('/api/materiais/verificar-estoque/', {'evento_id': self.evento.id}, format='json')
+        dados = resposta.json()
+        self.assertEqual(len(dados['itens']), 30)
+        self.assertEqual(dados['total_faltas'], 1)
+        self.assertEqual(dados['itens'][0]['falta'], 2)
+
+    def test_lista_nao_salva(self):
+        itens = [{'equipamento_id': e.id, 'quantidade': 5} for e in self.equipamentos] + [{'equipamento_id': 0, 'quantidade': 1}]
+        with self.assertNumQueries(1):
+            dados = self.client.post('/api/materiais/verificar-estoque/', {'itens': itens}, format='json').json()
+        self.assertEqual(dados['total_faltas'], 1)
+
+
+class DarSaidaTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='doca', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.evento = Evento.objects.create(cliente=cliente, data_evento=date(2025, 8, 1), status='AGUARDANDO_SAIDA')
+
+    def criar_materiais(self, quantidade):
+        materiais = []
+        for i in range(quantidade):
+            equipamento = Equipamento.objects.create(modelo=f"Ribalta {len(materiais)}-{i}", quantidade_estoque=10)
+            materiais.append(MaterialEvento.objects.create(evento=self.evento, equipamento=equipamento, quantidade=6))
+        return materiais
+
+    def dar_saida(self, materiais, qtd):
+        return self.client.post(f'/api/eventos/{self.evento.id}/dar_saida/', {
+            'materiais': [{'id': m.id, 'qtd': qtd} for m in materiais]
+        }, format='json')
+
+    def test_numero_de_consultas_nao_depende_do_tamanho_da_lista(self):
+        pequenos = self.criar_materiais(2)
+        with CaptureQueriesContext(connection) as poucos:
+            self.assertEqual(self.dar_saida(pequenos, 1).status_code, 200)
+        grandes = self.criar_materiais(40)
+        with CaptureQueriesContext(connection) as muitos:
+            self.assertEqual(self.dar_saida(grandes, 1).status_code, 200)
+        self.assertEqual(len(poucos), len(muitos))
+
+        material = MaterialEvento.objects.select_related('equipamento').get(pk=grandes[0].pk)
+        self.assertEqual(material.quantidade_separada, 1)
+        self.assertEqual(material.equipamento.quantidade_estoque, 9)
+        self.evento.refresh_from_db()
+        self.assertEqual(self.evento.status, 'EM_ANDAMENTO')
+
+    def test_falha_nao_altera_nada(self):
+        materiais = self.criar_materiais(2)
+        materiais[1].equipamento.quantidade_estoque = 0
+        materiais[1].equipamento.save()
+        resposta = self.dar_saida(materiais, 2)
+        self.assertEqual(resposta.status_code, 400)
+        self.assertEqual(Equipamento.objects.get(pk=materiais[0].equipamento_id).quantidade_estoque, 10)
+        self.assertEqual(MaterialEvento.objects.get(pk=materiais[0].pk).quantidade_separada, 0)
+
+
+class RegistrarRetornoTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='doca', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 8, 1), status='EM_ANDAMENTO')
+
+    def criar_materiais(self, quantidade):
+        inicio = MaterialEvento.objects.count()
+        return [
+            MaterialEvento.objects.create(
+                evento=self.evento, quantidade=4, quantidade_separada=4,
+                equipamento=Equipamento.objects.create(modelo=f"Ribalta {inicio + i}", quantidade_estoque=0),
+            )
+            for i in range(quantidade)
+        ]
+
+    def retornar(self, retornos):
+        return self.client.post(f'/api/eventos/{self.evento.id}/registrar_retorno/', {'retornos': retornos}, format='json')
+
+    def test_numero_de_consultas_nao_depende_do_tamanho_do_retorno(self):
+        SequenciaOS.reservar(1)  # a primeira O.S. do ano cria a linha da sequência
+        pequenos = self.criar_materiais(2)
+        with CaptureQueriesContext(connection) as poucos:
+            resposta = self.retornar([{'material_evento_id': m.id, 'quantidade': 1, 'condicao': 'DEFEITO'} for m in pequenos])
+        self.assertEqual(resposta.status_code, 200)
+        grandes = self.criar_materiais(40)
+        with CaptureQueriesContext(connection) as muitos:
+            resposta = self.retornar([{'material_evento_id': m.id, 'quantidade': 1, 'condicao': 'DEFEITO'} for m in grandes])
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(len(poucos), len(muitos))
+        self.assertEqual(RegistroManutencao.objects.filter(item_retornado__isnull=False).count(), 42)
+
+    def test_retorno_completo_finaliza_e_lanca_no_razao(self):
+        material, = self.criar_materiais(1)
+        resposta = self.retornar([
+            {'material_evento_id': material.id, 'quantidade': 3, 'condicao': 'OK'},
+            {'material_evento_id': material.id, 'quantidade': 1, 'condicao': 'QUEBRADO', 'observacao': 'Lente trincada'},
+        ])
+        self.assertEqual(resposta.json()['status'], 'Retorno registrado e operação finalizada com sucesso!')
+        self.evento.refresh_from_db()
+        self.assertEqual((self.evento.status, self.evento.tem_avarias, self.evento.itens_quebrados), ('FINALIZADO', True, 1))
+        material.refresh_from_db()
+        self.assertEqual((material.quantidade_retornada_ok, material.quantidade_retornada_defeito), (3, 1))
+        equipamento = Equipamento.objects.get(pk=material.equipamento_id)
+        self.assertEqual((equipamento.quantidade_estoque, equipamento.quantidade_manutencao), (3, 1))
+        self.assertEqual(
+            list(MovimentacaoEstoque.objects.filter(origem='RETORNO').values_list('delta_estoque', 'delta_manutencao')), [(3, 1)],
+        )
+
+    def test_excesso_rejeita_o_pacote_inteiro(self):
+        materiais = self.criar_materiais(2)
+        resposta = self.retornar([
+            {'material_evento_id': materiais[0].id, 'quantidade': 2, 'condicao': 'OK'},
+            {'material_evento_id': materiais[1].id, 'quantidade': 3, 'condicao': 'OK'},
+            {'material_evento_id': materiais[1].id, 'quantidade': 2, 'condicao': 'PERDIDO'},
+        ])
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('Ribalta 1', resposta.json()['error'])
+        self.assertFalse(ItemRetornado.objects.exists())
+        self.assertEqual(Equipamento.objects.get(pk=materiais[0].equipamento_id).quantidade_estoque, 0)
+
+
+class OrdensDeServicoEmLoteTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='manutencao', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        self.equipamento = Equipamento.objects.create(modelo='Cabo DMX', quantidade_estoque=300)
+
+    def test_envio_cria_ordens_num_unico_insert(self):
+        with CaptureQueriesContext(connection) as consultas:
+            resposta = self.client.post(f'/api/equipamentos/{self.equipamento.id}/enviar_para_manutencao/', {
+                'quantidade': 200, 'descricao_problema': 'Conector solto',
+            }, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        # Antes eram duas escritas por unidade (400+ para 200 cabos)
+        self.assertLess(len(consultas), 20)
+
+        numeros = list(RegistroManutencao.objects.values_list('os_number', flat=True))
+        self.assertEqual(len(numeros), 200)
+        self.assertEqual(len(set(numeros)), 200)
+        self.equipamento.refresh_from_db()
+        self.assertEqual((self.equipamento.quantidade_estoque, self.equipamento.quantidade_manutencao), (100, 200))
+
+    def test_numeracao_continua_entre_criacao_avulsa_e_lote(self):
+        avulsa = RegistroManutencao.objects.create(equipamento=self.equipamento, descricao_problema='Queimado')
+        resposta = self.client.post('/api/manutencao/lote/', {'itens': [
+            {'equipamento_id': self.equipamento.id, 'quantidade': 2, 'descricao_problema': 'Lente trincada'},
+        ]}, format='json')
+        self.assertEqual(resposta.status_code, 201)
+        sufixos = sorted(int(numero.rsplit('-', 1)[1]) for numero in RegistroManutencao.objects.values_list('os_number', flat=True))
+        primeiro = int(avulsa.os_number.rsplit('-', 1)[1])
+        self.assertEqual(sufixos, [primeiro, primeiro + 1, primeiro + 2])
+
+
+    def test_lote_malformado_responde_400(self):
+        url = '/api/manutencao/lote/'
+        for itens in (['cabo'], [{'equipamento_id': self.equipamento.id, 'quantidade': 'duas', 'descricao_problema': 'x'}],
+                      [{'equipamento_id': [1], 'quantidade': 1, 'descricao_problema': 'x'}], {'quantidade': 1}):
+            resposta = self.client.post(url, {'itens': itens}, format='json')
+            self.assertEqual(resposta.status_code, 400, itens)
+        self.assertFalse(RegistroManutencao.objects.exists())
+
+
+class InstrumentacaoTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='admin', password='x', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        Equipamento.objects.create(modelo='Par LED', quantidade_estoque=10)
+
+    def test_desligada_nao_adiciona_cabecalho(self):
+        self.assertNotIn('Server-Timing', self.client.get('/api/equipamentos/'))
+
+    @override_settings(INSTRUMENTACAO_ATIVA=True, INSTRUMENTACAO_BUFFER_CONSULTAS=50)
+    def test_server_timing_e_buffer_de_consultas(self):
+        instrumentacao.limpar_buffer()
+
+        with self.assertLogs('core.instrumentacao', level='INFO') as logs:
+            resposta = self.client.get('/api/equipamentos/')
+            consultas = self.client.get('/api/instrumentacao/consultas/').json()
+        cabecalho = resposta['Server-Timing']
+        self.assertIn('db;dur=', cabecalho)
+        self.assertIn('serializer;dur=', cabecalho)
+        self.assertIn('total;dur=', cabecalho)
+        self.assertIn('"rota": "equipamento-list"', logs.output[0])
+        self.assertTrue(any('core_equipamento' in item['sql'] for item in consultas))
+
+
+class MetricasPrometheusTests(DiretorioTemporarioMixin, TestCase):
+    def setUp(self):
+        self.usar_diretorio_temporario('RELATORIOS_DIR', RELATORIOS_FILA='sincrono')
+        self.usuario = Usuario.objects.create_user(username='logistica', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.equipamento = Equipamento.objects.create(modelo='Par LED', quantidade_estoque=10)
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 3, 1), status='AGUARDANDO_SAIDA')
+        self.material = MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamento, quantidade=4)
+
+    def amostra(self, nome, **labels):
+        return REGISTRY.get_sample_value(nome, labels) or 0
+
+    def test_metrics_expoe_contadores_de_dominio(self):
+        antes = self.amostra('novalite_itens_despachados_total', origem='saida')
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(f'/api/eventos/{self.evento.id}/dar_saida/', {'materiais': [{'id': self.material.id, 'qtd': 3}]}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(self.amostra('novalite_itens_despachados_total', origem='saida') - antes, 3)
+
+        RegistroManutencao.objects.create(equipamento=self.equipamento, descricao_problema='Queimado')
+        corpo = self.client.get('/metrics').content.decode()
+        self.assertIn('novalite_manutencoes_abertas{status="AGUARDANDO_AVALIACAO"} 1.0', corpo)
+        self.assertIn('django_http_requests_latency_seconds_by_view_method', corpo)
+
+    def test_metrics_multiprocesso_soma_workers_e_coleta_o_banco_uma_vez(self):
+        diretorio = self.usar_diretorio_temporario()
+        RegistroManutencao.objects.create(equipamento=self.equipamento, descricao_problema='Queimado')
+        with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': str(diretorio)}):
+            corpo = self.client.get('/metrics').content.decode()
+        self.assertIn('novalite_manutencoes_abertas{status="AGUARDANDO_AVALIACAO"} 1.0', corpo)
+        # Só o que vem dos arquivos dos workers e do collector do banco, não o registry deste processo
+        self.assertNotIn('python_gc_objects_collected_total', corpo)
+
+    def test_metrics_fora_da_rede_de_coleta_exige_token(self):
+        externo = Client(REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(externo.get('/metrics').status_code, 403)
+        with override_settings(METRICAS_TOKEN='segredo'):
+            self.assertEqual(externo.get('/metrics', HTTP_AUTHORIZATION='Bearer errado').status_code, 403)
+            self.assertEqual(externo.get('/metrics', HTTP_AUTHORIZATION='Bearer segredo').status_code, 200)
+        with override_settings(METRICAS_IPS_PERMITIDOS=['203.0.113.0/24']):
+            self.assertEqual(externo.get('/metrics').status_code, 200)
+
+
+class PerfiladorTests(DiretorioTemporarioMixin, TestCase):
+    def setUp(self):
+        self.diretorio = self.usar_diretorio_temporario('PERFILADOR_DIR', PERFILADOR_MAX_ARQUIVOS=2)
+        self.admin = Usuario.objects.create_user(username='admin', password='x', is_staff=True)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 3, 1))
+
+    def token(self, usuario):
+        return f'Bearer {AccessToken.for_user(usuario)}'
+
+    def test_admin_captura_perfil_e_sql(self):
+        resposta = self.client.get(f'/api/eventos/{self.evento.id}/', HTTP_X_PERFILAR='1', HTTP_AUTHORIZATION=self.token(self.admin))
+        self.assertEqual(resposta.status_code, 200)
+        identificador = resposta['X-Perfil']
+        self.assertTrue((self.diretorio / f'{identificador}.pstats').exists())
+        metadados = json.loads((self.diretorio / f'{identificador}.json').read_text())
+        self.assertEqual(metadados['total_consultas'], len(metadados['consultas']))
+        self.assertGreater(metadados['total_consultas'], 0)
+
+        self.client.force_login(self.admin)
+        self.assertContains(self.client.get('/admin/perfis/'), identificador)
+        self.assertEqual(self.client.get(f'/admin/perfis/{identificador}/pstats/').status_code, 200)
+
+    def test_usuario_comum_nao_dispara_e_disco_fica_limitado(self):
+        comum = Usuario.objects.create_user(username='tecnico', password='x')
+        resposta = self.client.get(f'/api/eventos/{self.evento.id}/?perfilar=1', HTTP_AUTHORIZATION=self.token(comum))
+        self.assertNotIn('X-Perfil', resposta)
+
+        for _ in range(4):
+            self.client.get(f'/api/eventos/{self.evento.id}/?perfilar=1', HTTP_AUTHORIZATION=self.token(self.admin))
+        self.assertEqual(len(list(self.diretorio.glob('*.pstats'))), 2)
+
+    def test_despejo_ignora_perfis_apagados_por_outro_worker(self):
+        for indice in range(3):
+            (self.diretorio / f'perfil-{indice}.pstats').write_bytes(b'x')
+        stat_original = Path.stat
+
+        def stat_concorrente(caminho, *args, **kwargs):
+            # Simula o outro worker apagando o arquivo entre o glob e o stat
+            if caminho.name == 'perfil-0.pstats':
+                caminho.unlink(missing_ok=True)
+            return stat_original(caminho, *args, **kwargs)
+
+        with mock.patch.object(Path, 'stat', stat_concorrente):
+            perfilador._despejar_antigos(self.diretorio)
+        self.assertEqual(sorted(p.name for p in self.diretorio.glob('*.pstats')), ['perfil-1.pstats', 'perfil-2.pstats'])
+
+    def test_token_de_usuario_inativo_nao_vira_500(self):
+        inativo = Usuario.objects.create_user(username='ex_admin', password='x', is_staff=True)
+        token = self.token(inativo)
+        inativo.is_active = False
+        inativo.save()
+        resposta = self.client.get(f'/api/eventos/{self.evento.id}/?perfilar=1', HTTP_AUTHORIZATION=token)
+        self.assertEqual(resposta.status_code, 401)
+        self.assertNotIn('X-Perfil', resposta)
+
+
+class RelatoriosEmSegundoPlanoTests(DiretorioTemporarioMixin, TestCase):
+    def setUp(self):
+        diretorio = self.usar_diretorio_temporario('RELATORIOS_DIR', RELATORIOS_FILA='sincrono', RELATORIOS_MAX_PENDENTES_USUARIO=1)
+        self.usar_configuracoes(RELATORIOS_CACHE_DIR=str(diretorio / 'cache'))
+        self.usuario = Usuario.objects.create_user(username='logistica', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        funcionario = Funcionario.objects.create(nome='Técnico', funcao='Iluminador')
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 3, 1))
+        EscalaFuncionario.objects.create(
+            evento=self.evento, funcionario=funcionario, data_inicio=date(2025, 3, 1), hora_inicio=time(8),
+            data_fim=date(2025, 3, 1), hora_fim=time(18),
+        )
+
+    def test_solicita_consulta_e_baixa_o_pdf(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post('/api/relatorios/tarefas/', {'tipo': 'evento', 'evento_id': self.evento.id}, format='json')
+        self.assertEqual(resposta.status_code, 202)
+
+        tarefa = self.client.get(f"/api/relatorios/tarefas/{resposta.json()['id']}/").json()
+        self.assertEqual(tarefa['status'], 'CONCLUIDA')
+        arquivo = self.client.get(tarefa['download'])
+        self.assertEqual(arquivo.status_code, 200)
+        self.assertTrue(b''.join(arquivo.streaming_content).startswith(b'%PDF'))
+
+    def test_limita_tarefas_pendentes_por_usuario(self):
+        primeira = self.client.post('/api/relatorios/tarefas/', {'tipo': 'evento', 'evento_id': self.evento.id}, format='json')
+        self.assertEqual(primeira.status_code, 202)
+        segunda = self.client.post('/api/relatorios/tarefas/', {'tipo': 'evento', 'evento_id': self.evento.id}, format='json')
+        self.assertEqual(segunda.status_code, 429)
+
+    def test_evento_id_invalido_responde_400(self):
+        url = '/api/relatorios/tarefas/'
+        self.assertEqual(self.client.post(url, {'tipo': 'evento', 'evento_id': 'abc'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'tipo': 'evento'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'tipo': 'evento', 'evento_id': 999999}, format='json').status_code, 404)
+
+    def test_rota_sincrona_serve_do_cache_ate_o_evento_mudar(self):
+        url = f'/api/reports/evento/{self.evento.id}/'
+        with mock.patch.object(relatorios, 'relatorio_evento', wraps=relatorios.relatorio_evento) as gerar:
+            primeira = b''.join(self.client.get(url).streaming_content)
+            segunda = b''.join(self.client.get(url).streaming_content)
+            self.assertEqual(gerar.call_count, 1)
+            self.assertTrue(primeira.startswith(b'%PDF'))
+            self.assertEqual(primeira, segunda)
+
+            Consumivel.objects.create(nome='Fita Silver Tape')  # cadastros limpam o cache
+            self.client.get(url)
+            ConsumivelEvento.objects.create(evento=self.evento, consumivel=Consumivel.objects.get(), quantidade=2)
+            self.client.get(url)
+            self.assertEqual(gerar.call_count, 3)
+
+    def test_pdf_apagado_do_cache_depois_de_aberto_continua_legivel(self):
+        nome, arquivo = cache_relatorios.relatorio_evento(self.evento.id)
+        cache_relatorios.limpar()  # despejo/invalidação concorrente
+        with arquivo:
+            self.assertTrue(arquivo.read().startswith(b'%PDF'))
+        self.assertTrue(nome.endswith('.pdf'))
+
+    def test_cache_de_pdfs_respeita_o_limite_de_tamanho(self):
+        diretorio = Path(cache_relatorios.diretorio_cache())
+        for indice in range(3):
+            cache_relatorios._gravar(diretorio / f'evento-{indice}-x.pdf', b'0' * 600_000)
+            os.utime(diretorio / f'evento-{indice}-x.pdf', (indice, indice))
+        with override_settings(RELATORIOS_CACHE_MAX_MB=1):
+            cache_relatorios._despejar()
+        self.assertEqual(sorted(p.name for p in diretorio.glob('*.pdf')), ['evento-2-x.pdf'])
+
+
+    @override_settings(RELATORIOS_PACOTE_PROCESSOS=0, RELATORIOS_PACOTE_SINCRONO=1)
+    def test_pacote_de_saida_do_dia(self):
+        MaterialEvento.objects.create(evento=self.evento, item_descricao='Praticável 2x1', quantidade=4)
+        Evento.objects.create(nome='Feira', cliente=self.evento.cliente, data_evento=date(2025, 3, 1), status='FINALIZADO')
+
+        resposta = self.client.post('/api/reports/pacote-saida/', {'data': '2025-03-01'}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta['Content-Type'], 'application/pdf')
+        # Relatório completo + guia de saída da única operação do dia que ainda vai sair
+        paginas = len(PdfReader(BytesIO(resposta.content)).pages)
+        self.assertGreaterEqual(paginas, 2)
+
+        outro = Evento.objects.create(nome='Congresso', cliente=self.evento.cliente, data_evento=date(2025, 3, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post('/api/reports/pacote-saida/', {'evento_ids': [self.evento.id, outro.id], 'formato': 'zip'}, format='json')
+        self.assertEqual(resposta.status_code, 202)
+        tarefa = self.client.get(f"/api/relatorios/tarefas/{resposta.json()['id']}/").json()
+        self.assertEqual((tarefa['status'], tarefa['progresso'], tarefa['total']), ('CONCLUIDA', 2, 2))
+        arquivo = b''.join(self.client.get(tarefa['download']).streaming_content)
+        nomes = zipfile.ZipFile(BytesIO(arquivo)).namelist()
+        self.assertEqual(sorted({nome.split('/')[0] for nome in nomes}), sorted([str(self.evento.id), str(outro.id)]))
+        self.assertEqual(len([nome for nome in nomes if nome.startswith(f'{self.evento.id}/')]), 2)
+
+    @override_settings(RELATORIOS_PACOTE_PROCESSOS=4, RELATORIOS_PACOTE_SINCRONO=3)
+    def test_pacote_sincrono_nao_sobe_pool_de_processos(self):
+        outro = Evento.objects.create(nome='Congresso', cliente=self.evento.cliente, data_evento=date(2025, 3, 2))
+        with mock.patch.object(pacote_saida, '_obter_pool', side_effect=AssertionError('pool na requisição')):
+            resposta = self.client.post('/api/reports/pacote-saida/', {'evento_ids': [self.evento.id, outro.id]}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+
+
+    @override_settings(RELATORIOS_PACOTE_PROCESSOS=0)
+    def test_pacote_pdf_lista_operacoes_que_falharam(self):
+        _, conteudo = pacote_saida.gerar_pacote([self.evento.id, 999999], 'pdf', paralelo=False)
+        ultima_pagina = PdfReader(BytesIO(conteudo)).pages[-1].extract_text()
+        self.assertIn('Operações fora do pacote', ultima_pagina)
+        self.assertIn('Operação 999999', ultima_pagina)
+
+        with self.assertRaises(relatorios.RelatorioIndisponivel):
+            pacote_saida.gerar_pacote([999999], 'pdf', paralelo=False)
+        with mock.patch.object(pacote_saida, 'documentos_do_evento', side_effect=RuntimeError('sem fonte')):
+            resposta = self.client.post('/api/reports/pacote-saida/', {'evento_ids': [self.evento.id]}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('sem fonte', resposta.json()['error'])
+
+
+class MotorRelatoriosTests(DiretorioTemporarioMixin, TestCase):
+    def test_estilos_e_logo_sao_montados_uma_vez_por_processo(self):
+        self.assertIs(motor_relatorios.estilos(), motor_relatorios.estilos())
+        primeira = relatorios.TABELA_MATERIAIS.montar([["Moving", 2]])
+        segunda = relatorios.TABELA_MATERIAIS.montar([["Par LED", 4]])
+        self.assertIsNot(primeira, segunda)
+        self.assertEqual(primeira._cellStyles[1][1].alignment, 'CENTER')
+
+        motor_relatorios._imagem_reduzida.cache_clear()
+        logo = motor_relatorios.imagem_fixa(relatorios.LOGO_PATH, 1.5*inch, 0.75*inch)
+        outro = motor_relatorios.imagem_fixa(relatorios.LOGO_PATH, 1.5*inch, 0.75*inch)
+        self.assertIsNot(logo, outro)
+        self.assertEqual(motor_relatorios._imagem_reduzida.cache_info().misses, 1)
+        # Pixels reduzidos à resolução de impressão, não os do arquivo original
+        self.assertEqual(logo.imageWidth, 450)
+        self.assertEqual((logo.drawWidth, logo.drawHeight), (1.5*inch, 0.75*inch))
+
+
+    def test_benchmark_relatorios_grava_resultado(self):
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 3, 1))
+        equipamento = Equipamento.objects.create(modelo='Par LED', quantidade_estoque=10)
+        material = MaterialEvento.objects.create(evento=evento, equipamento=equipamento, quantidade=2, quantidade_separada=2)
+        ItemRetornado.objects.create(material_evento=material, quantidade=1, condicao='QUEBRADO')
+        arquivo = self.usar_diretorio_temporario() / 'relatorios.json'
+
+        call_command('benchmark_relatorios', repeticoes=1, aquecimento=0, itens=3, saida=str(arquivo), stdout=StringIO())
+        resultado = json.loads(arquivo.read_text())
+        self.assertEqual(resultado['evento'], evento.id)
+        self.assertEqual(set(resultado['resultados']), {'evento', 'guia_saida', 'guia_reforco', 'avarias'})
+        for medicao in resultado['resultados'].values():
+            self.assertGreaterEqual(medicao['paginas'], 1)
+
+
+class GuiasArquivadasTests(DiretorioTemporarioMixin, TestCase):
+    def setUp(self):
+        self.usar_diretorio_temporario('RELATORIOS_DIR', RELATORIOS_FILA='sincrono')
+        self.usuario = Usuario.objects.create_user(username='doca', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 8, 1), status='AGUARDANDO_SAIDA')
+        self.equipamento = Equipamento.objects.create(modelo='Moving Beam', quantidade_estoque=10)
+        self.material = MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamento, quantidade=6)
+
+    def test_saida_emite_guia_numerada_e_reimpressao_nao_renderiza(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(f'/api/eventos/{self.evento.id}/dar_saida/', {'materiais': [{'id': self.material.id, 'qtd': 4}]}, format='json')
+        guia = resposta.json()['guia']
+        self.assertRegex(guia['numero'], r'^GS-\d{4}-00001$')
+        self.assertEqual(guia['itens'], [{'modelo': 'Moving Beam', 'qtd': 4}])
+
+        arquivada = GuiaSaida.objects.get(pk=guia['id'])
+        self.assertEqual(len(arquivada.sha256), 64)
+        self.assertIn(arquivada.sha256, arquivada.arquivo.name)
+        with mock.patch.dict(guias.GERADORES, {'SAIDA': mock.Mock(side_effect=AssertionError)}):
+            primeira = b''.join(self.client.get(guia['pdf']).streaming_content)
+            segunda = b''.join(self.client.get(guia['pdf']).streaming_content)
+        self.assertTrue(primeira.startswith(b'%PDF'))
+        self.assertEqual(primeira, segunda)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resposta = self.client.post(f'/api/eventos/{self.evento.id}/adicionar_reforco/', {'materiais': [{'equipamento_id': self.equipamento.id, 'quantidade': 2}]}, format='json')
+        reforco = GuiaSaida.objects.get(pk=resposta.json()['guia']['id'])
+        self.assertEqual((reforco.tipo, reforco.numero[-5:]), ('REFORCO', '00002'))
+        self.assertEqual(self.client.get(f'/api/guias/?evento={self.evento.id}').json().__len__(), 2)
+
+    def test_reforco_com_falha_nao_grava_nada(self):
+        Evento.objects.filter(pk=self.evento.pk).update(status='EM_ANDAMENTO')
+        pouco = Equipamento.objects.create(modelo='Strobo', quantidade_estoque=1)
+        url = f'/api/eventos/{self.evento.id}/adicionar_reforco/'
+        resposta = self.client.post(url, {'materiais': [
+            {'equipamento_id': self.equipamento.id, 'quantidade': 2}, {'equipamento_id': pouco.id, 'quantidade': 3},
+        ]}, format='json')
+        self.assertEqual(resposta.status_code, 400)
+        self.assertIn('Strobo', resposta.json()['error'])
+        self.assertEqual(Equipamento.objects.get(pk=self.equipamento.pk).quantidade_estoque, self.equipamento.quantidade_estoque)
+        self.assertFalse(MovimentacaoEstoque.objects.filter(origem='REFORCO').exists())
+        self.assertFalse(GuiaSaida.objects.exists())
+        self.assertEqual(self.client.post(url, {'materiais': [{'equipamento_id': 999, 'quantidade': 1}]}, format='json').status_code, 404)
+
+        resposta = self.client.post(url, {'materiais': [
+            {'equipamento_id': self.equipamento.id, 'quantidade': 2}, {'equipamento_id': pouco.id, 'quantidade': 1},
+        ]}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['guia']['itens'], [{'modelo': 'Moving Beam', 'qtd': 2}, {'modelo': 'Strobo', 'qtd': 1}])
+        self.material.refresh_from_db()
+        self.assertEqual((self.material.quantidade, self.material.quantidade_separada), (8, 2))
+        self.assertEqual(MaterialEvento.objects.get(evento=self.evento, equipamento=pouco).quantidade_separada, 1)
+
+    def test_arquivamento_usa_o_que_foi_congelado_na_emissao(self):
+        consumivel = Consumivel.objects.create(nome='Fita Gaffer', quantidade_estoque=10)
+        ConsumivelEvento.objects.create(evento=self.evento, consumivel=consumivel, quantidade=2)
+        with mock.patch.object(guias.tarefas, 'em_segundo_plano') as agendar, transaction.atomic():
+            guia = guias.emitir(self.evento, 'SAIDA', [{'modelo': 'Moving Beam', 'qtd': 1}], self.usuario)
+        agendar.assert_called_once_with(guias.arquivar, guia.pk)
+
+        # Edições depois da emissão não entram na guia arquivada
+        Cliente.objects.filter(pk=self.evento.cliente_id).update(empresa='Outra Empresa')
+        ConsumivelEvento.objects.filter(evento=self.evento).update(quantidade=7)
+        with mock.patch.dict(guias.GERADORES, {'SAIDA': mock.Mock(wraps=relatorios.guia_saida)}):
+            guias.arquivar(guia.pk)
+            dados = guias.GERADORES['SAIDA'].call_args.kwargs['dados']
+        self.assertEqual(dados['cliente'], 'ACME')
+        self.assertEqual(dados['consumiveis'], [['Fita Gaffer', 2]])
+
+    def test_conteudo_igual_gera_o_mesmo_arquivo(self):
+        guia = GuiaSaida.objects.create(numero='GS-2025-00010', tipo='SAIDA', evento=self.evento, itens=[{'modelo': 'Moving Beam', 'qtd': 1}])
+        guias.arquivar(guia.pk)
+        guia.refresh_from_db()
+        _, pdf = relatorios.guia_saida(self.evento.id, guia.itens, numero=guia.numero, emitida_em=guia.emitida_em)
+        self.assertEqual(hashlib.sha256(pdf).hexdigest(), guia.sha256)
+
+
+class RazaoDeEstoqueTests(TestCase):
+    def setUp(self):
+        self.usuario = Usuario.objects.create_user(username='almoxarifado', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 8, 1), status='AGUARDANDO_SAIDA')
+        self.equipamento = Equipamento.objects.create(modelo='Elipsoidal', quantidade_estoque=10)
+
+    def test_toda_variacao_fica_no_razao(self):
+        material = MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamento, quantidade=4)
+        self.client.post(f'/api/eventos/{self.evento.id}/dar_saida/', {'materiais': [{'id': material.id, 'qtd': 4}]}, format='json')
+        self.client.post(f'/api/equipamentos/{self.equipamento.id}/enviar_para_manutencao/', {'quantidade': 2, 'descricao_problema': 'Lâmpada'}, format='json')
+        self.client.post(f'/api/equipamentos/{self.equipamento.id}/retornar_da_manutencao/', {'quantidade': 1}, format='json')
+        self.equipamento.refresh_from_db()
+        self.equipamento.quantidade_estoque += 3  # contagem manual pela tela de inventário
+        self.equipamento.save()
+
+        movimentos = list(MovimentacaoEstoque.objects.filter(equipamento=self.equipamento).values_list('origem', 'delta_estoque', 'delta_manutencao'))
+        self.assertEqual(movimentos, [
+            ('AJUSTE', 10, 0), ('SAIDA', -4, 0), ('ENVIO_MANUTENCAO', -2, 2), ('RETORNO_MANUTENCAO', 1, -1), ('AJUSTE', 3, 0),
+        ])
+        self.assertEqual((self.equipamento.quantidade_estoque, self.equipamento.quantidade_manutencao), (8, 1))
+        with self.assertRaises(ValueError):
+            MovimentacaoEstoque.objects.first().save()
+
+    def test_saldo_na_data_parte_da_fotografia(self):
+        ontem = timezone.localdate() - timedelta(days=1)
+        MovimentacaoEstoque.objects.update(criado_em=timezone.make_aware(datetime.combine(ontem, time(9))))
+        self.assertEqual(movimentacoes.consolidar(ontem), 1)
+        movimentacoes.movimentar(self.equipamento, 'AJUSTE', estoque=-4)
+
+        # Depois da fotografia, o saldo de ontem não olha mais o razão daquele dia
+        MovimentacaoEstoque.objects.filter(delta_estoque=10).delete()
+        with self.assertNumQueries(2):
+            self.assertEqual(movimentacoes.saldo_em(self.equipamento.pk, ontem)['quantidade_estoque'], 10)
+        self.assertEqual(movimentacoes.saldo_em(self.equipamento.pk, timezone.localdate())['quantidade_estoque'], 6)
+
+    def test_reconstroi_contadores_a_partir_do_razao(self):
+        Equipamento.objects.filter(pk=self.equipamento.pk).update(quantidade_estoque=99)
+        divergentes = movimentacoes.reconstruir_contadores()
+        self.assertEqual([(atuais, esperados) for _, atuais, esperados in divergentes], [((99, 0), (10, 0))])
+        self.equipamento.refresh_from_db()
+        self.assertEqual(self.equipamento.quantidade_estoque, 10)
+        self.assertEqual(movimentacoes.reconstruir_contadores(), [])
+
+    def test_comandos_consolidam_e_recuperam_contador_corrompido(self):
+        ontem = timezone.localdate() - timedelta(days=1)
+        MovimentacaoEstoque.objects.update(criado_em=timezone.make_aware(datetime.combine(ontem, time(9))))
+        call_command('consolidar_estoque', data=ontem.isoformat(), stdout=StringIO())
+        self.assertEqual(SaldoEstoque.objects.get(equipamento=self.equipamento, data=ontem).quantidade_estoque, 10)
+        movimentacoes.movimentar(self.equipamento, 'ENVIO_MANUTENCAO', estoque=-3, manutencao=3)
+
+        Equipamento.objects.filter(pk=self.equipamento.pk).update(quantidade_estoque=0, quantidade_manutencao=42)
+        saida = StringIO()
+        call_command('reconstruir_estoque', verificar=True, stdout=saida)
+        self.assertIn('0/42 -> 7/3', saida.getvalue())
+        self.equipamento.refresh_from_db()
+        self.assertEqual(self.equipamento.quantidade_manutencao, 42)
+
+        call_command('reconstruir_estoque', stdout=StringIO())
+        self.equipamento.refresh_from_db()
+        restaurado = {'quantidade_estoque': self.equipamento.quantidade_estoque, 'quantidade_manutencao': self.equipamento.quantidade_manutencao}
+        self.assertEqual(restaurado, {'quantidade_estoque': 7, 'quantidade_manutencao': 3})
+        # Fotografia de ontem + razão de hoje chega ao mesmo saldo
+        self.assertEqual(movimentacoes.saldo_em(self.equipamento.pk, timezone.localdate()), restaurado)
+
+        with self.assertRaises(CommandError):
+            call_command('consolidar_estoque', data='ontem', stdout=StringIO())
+
+
+class ContadoresDeRetornoTests(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 8, 1), status='EM_ANDAMENTO')
+        self.equipamento = Equipamento.objects.create(modelo='Elipsoidal', quantidade_estoque=10)
+        self.material = MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamento, quantidade=6, quantidade_separada=6)
+
+    def contadores(self):
+        self.material.refresh_from_db()
+        return self.material.quantidade_retornada_ok, self.material.quantidade_retornada_defeito
+
+    def test_acompanha_criacao_edicao_e_exclusao(self):
+        ok = ItemRetornado.objects.create(material_evento=self.material, quantidade=3, condicao='OK')
+        quebrado = ItemRetornado.objects.create(material_evento=self.material, quantidade=2, condicao='QUEBRADO')
+        self.assertEqual(self.contadores(), (3, 2))
+
+        ok.condicao, ok.quantidade = 'DEFEITO', 1
+        ok.save()
+        self.assertEqual(self.contadores(), (0, 3))
+        quebrado.delete()
+        self.assertEqual(self.contadores(), (0, 1))
+
+    def test_resumo_de_avarias_na_operacao(self):
+        outro = MaterialEvento.objects.create(evento=self.evento, equipamento=self.equipamento, quantidade=2, quantidade_separada=2)
+        ItemRetornado.objects.create(material_evento=self.material, quantidade=3, condicao='OK')
+        ItemRetornado.objects.create(material_evento=self.material, quantidade=2, condicao='QUEBRADO')
+        perdido = ItemRetornado.objects.create(material_evento=outro, quantidade=1, condicao='PERDIDO')
+        self.evento.refresh_from_db()
+        self.assertTrue(self.evento.tem_avarias)
+        self.assertEqual((self.evento.itens_com_defeito, self.evento.itens_quebrados, self.evento.itens_perdidos), (0, 2, 1))
+
+        # Peça achada depois: o PERDIDO volta como OK e só o quebrado continua contando
+        perdido.condicao = 'OK'
+        perdido.save()
+        ItemRetornado.objects.filter(condicao='QUEBRADO').get().delete()
+        self.evento.refresh_from_db()
+        self.assertFalse(self.evento.tem_avarias)
+        self.assertEqual((self.evento.itens_quebrados, self.evento.itens_perdidos), (0, 0))
+
+    def test_save_nao_sobrescreve_contadores(self):
+        ItemRetornado.objects.create(material_evento=self.material, quantidade=1, condicao='PERDIDO')
+        self.evento.nome = 'Show (editado)'
+        self.evento.save()  # instância lida antes do retorno
+        self.evento.refresh_from_db()
+        self.assertEqual((self.evento.nome, self.evento.tem_avarias, self.evento.itens_perdidos), ('Show (editado)', True, 1))
+
+        # Cópia (pk=None) é uma operação nova: começa sem avarias
+        self.evento.pk = None
+        self.evento.save()
+        copia = Evento.objects.get(pk=self.evento.pk)
+        self.assertEqual((copia.tem_avarias, copia.itens_perdidos), (False, 0))
+
+    def test_finalizacao_le_as_colunas(self):
+        ItemRetornado.objects.create(material_evento=self.material, quantidade=6, condicao='OK')
+        client = APIClient()
+        client.force_authenticate(Usuario.objects.create_user(username='logistica', password='x'))
+        resposta = client.post(f'/api/eventos/{self.evento.id}/mudar_status/', {'status': 'FINALIZADO'}, format='json')
+        self.assertEqual(resposta.status_code, 200)
+
+    def test_comando_reconstroi_a_partir_dos_retornos(self):
+        ItemRetornado.objects.create(material_evento=self.material, quantidade=4, condicao='OK')
+        MaterialEvento.objects.filter(pk=self.material.pk).update(quantidade_retornada_ok=0, quantidade_retornada_defeito=7)
+        Evento.objects.filter(pk=self.evento.pk).update(tem_avarias=True, itens_perdidos=7)
+        saida = StringIO()
+        call_command('reconstruir_retornos', '--verificar', stdout=saida)
+        self.assertIn('ok/avaria 0/7 -> 4/0', saida.getvalue())
+        self.assertIn('defeito/quebrado/perdido 0/0/7 -> 0/0/0', saida.getvalue())
+        self.assertEqual(self.contadores(), (0, 7))
+        call_command('reconstruir_retornos', stdout=StringIO())
+        self.assertEqual(self.contadores(), (4, 0))
+        self.evento.refresh_from_db()
+        self.assertFalse(self.evento.tem_avarias)
+
+
+class DerivadosDeFotosTests(DiretorioTemporarioMixin, TestCase):
+    def setUp(self):
+        self.usar_diretorio_temporario('MEDIA_ROOT')
+        self.usuario = Usuario.objects.create_user(username='planejador', password='x')
+        self.client = APIClient()
+        self.client.force_authenticate(self.usuario)
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        self.evento = Evento.objects.create(nome='Show', cliente=cliente, data_evento=date(2025, 3, 1))
+
+    def foto_de_camera(self):
+        conteudo = BytesIO()
+        Image.new('RGB', (4000, 3000), 'orange').save(conteudo, 'JPEG')
+        return SimpleUploadedFile('palco.jpg', conteudo.getvalue(), content_type='image/jpeg')
+
+    def test_upload_gera_miniatura_e_versao_de_impressao(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            foto = FotoPreEvento.objects.create(evento=self.evento, imagem=self.foto_de_camera())
+        with Image.open(foto.imagem.storage.path(imagens.nome_derivado(foto.imagem.name, 'impressao'))) as impressao:
+            self.assertEqual(impressao.size, (640, 480))
+        with Image.open(foto.imagem.storage.path(imagens.nome_derivado(foto.imagem.name, 'miniatura'))) as miniatura:
+            self.assertLessEqual(max(miniatura.size), 320)
+
+        dados = self.client.get(f'/api/fotos/?evento={self.evento.id}').json()
+        self.assertIn('/derivados/palco_jpg_miniatura.jpg', dados[0]['miniatura'])
+
+    def test_relatorio_gera_derivado_de_foto_antiga(self):
+        foto = FotoPreEvento.objects.create(evento=self.evento, imagem=self.foto_de_camera())  # sem on_commit: foto "antiga"
+        caminho = foto.imagem.storage.path(imagens.nome_derivado(foto.imagem.name, 'impressao'))
+        with override_settings(RELATORIOS_CACHE_DIR=f'{foto.imagem.storage.location}/cache'):
+            resposta = self.client.get(f'/api/reports/evento/{self.evento.id}/')
+        self.assertEqual(resposta.status_code, 200)
+        self.assertTrue(os.path.exists(caminho))
+
+
+
+class PlanosDeConsultaTests(TestCase):
+    """
+    EXPLAIN das consultas quentes: falha se alguma tabela for lida inteira.
+    No PostgreSQL o seq scan é desligado na sessão, porque com as tabelas
+    pequenas do teste ele sempre sairia mais barato; o que se confere é que
+    existe um índice que o planejador consegue usar.
+    """
+    # Linhas de plano que indicam leitura completa de uma tabela do app
+    VARREDURAS = {
+        'sqlite': re.compile(r'\bSCAN (core_\w+)'),
+        'postgresql': re.compile(r'Seq Scan on (core_\w+)'),
+    }
+
+    def setUp(self):
+        if connection.vendor not in self.VARREDURAS:
+            self.skipTest(f"Sem regra de plano para o banco '{connection.vendor}'.")
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def consultas(self):
+        return {
+            'painel de logística': dashboard.eventos_para_logistica(),
+            'manutenções abertas': RegistroManutencaoViewSet.queryset,
+            'histórico de manutenção': RegistroManutencaoHistoryViewSet.queryset,
+            'avarias recentes': ItemRetornado.objects.filter(
+                material_evento__evento__status='FINALIZADO', condicao__in=ItemRetornado.CONDICOES_AVARIA,
+            ).order_by('-data_retorno')[:10],
+            'relatório de avarias': ItemRetornado.objects.filter(
+                material_evento__evento_id=1, condicao__in=ItemRetornado.CONDICOES_AVARIA,
+            ).select_related('material_evento__equipamento').order_by('material_evento__equipamento__modelo'),
+            'funcionário do usuário logado': Funcionario.objects.filter(email='tecnico@novalite.com.br'),
+            **{f"operações por {consulta}": self.filtrar_eventos(consulta) for consulta in self.filtros_de_eventos()},
+        }
+
+    def filtros_de_eventos(self):
+        # Filtros de chave estrangeira validam que a linha existe
+        cliente = Cliente.objects.create(empresa='ACME', representante='Fulano')
+        chefe = Funcionario.objects.create(nome='Chefe')
+        veiculo = Veiculo.objects.create(nome='Van', placa='XYZ9876')
+        return [
+            'inicio=2025-03-01&fim=2025-03-31', 'fim=2025-03-31', 'status=EM_ANDAMENTO&status=FINALIZADO',
+            f'cliente={cliente.pk}', f'chefe_de_equipe={chefe.pk}', f'veiculo={veiculo.pk}', 'pendente_suprimento=true',
+        ]
+
+    def filtrar_eventos(self, consulta):
+        filtro = EventoFilter(QueryDict(consulta), queryset=Evento.objects.order_by('-data_evento'))
+        self.assertTrue(filtro.is_valid(), filtro.errors)
+        return filtro.qs
+
+    def test_consultas_quentes_usam_indices(self):
+        varredura = self.VARREDURAS[connection.vendor]
+        for nome, consulta in self.consultas().items():
+            with self.subTest(nome):
+                plano = consulta.explain()
+                self.assertEqual(varredura.findall(plano), [], f"Varredura completa em '{nome}':\n{plano}")
+
+
+class DadosSinteticosTests(DiretorioTemporarioMixin, TestCase):
+    def test_gera_volumes_na_escala_e_contadores_conferem(self):
+        call_command('gerar_dados_sinteticos', escala=0.001, lote=500, stdout=StringIO())
+        # Volumes padrão x 0,001 (no mínimo 1 de cada)
+        self.assertEqual(Cliente.objects.count(), 1)
+        self.assertEqual(Equipamento.objects.count(), 3)
+        self.assertEqual(Evento.objects.count(), 50)
+        self.assertEqual(MaterialEvento.objects.count(), 2000)
+        self.assertEqual(ItemRetornado.objects.count(), 500)
+        self.assertEqual(RegistroManutencao.objects.count(), 100)
+
+        # Contadores gravados por bulk_create/update batem com o razão e com os retornos
+        saida = StringIO()
+        call_command('reconstruir_estoque', verificar=True, stdout=saida)
+        self.assertIn('Contadores conferem com o razão', saida.getvalue())
+        saida = StringIO()
+        call_command('reconstruir_retornos', verificar=True, stdout=saida)
+        self.assertIn('conferem com os itens retornados', saida.getvalue())
+
+    def test_benchmark_api_grava_resultado(self):
+        call_command('gerar_dados_sinteticos', escala=0.0002, stdout=StringIO())
+        arquivo = self.usar_diretorio_temporario() / 'benchmark.json'
+        call_command(
+            'benchmark_api', repeticoes=1, aquecimento=0, cenarios='eventos_lista,eventos_detalhe,dashboard_stats',
+            saida=str(arquivo), stdout=StringIO(),
+        )
+        resultado = json.loads(arquivo.read_text())
+        self.assertEqual(set(resultado['resultados']), {'eventos_lista', 'eventos_detalhe', 'dashboard_stats'})
+        for medicao in resultado['resultados'].values():
+            self.assertEqual(medicao['status_http'], [200])
@@ -14,11 +14,14 @@ router.register(r'equipamentos', views.EquipamentoViewSet)
 router.register(r'eventos', views.EventoViewSet)
 router.register(r'aditivos', views.AditivoOperacaoViewSet)
 router.register(r'materiais', views.MaterialEventoViewSet)
+router.register(r'fotos', views.FotoPreEventoViewSet)
 router.register(r'manutencao', views.RegistroManutencaoViewSet, basename='manutencao')
 router.register(r'manutencao-historico', views.RegistroManutencaoHistoryViewSet, basename='manutencao-historico')
 router.register(r'consumiveis', views.ConsumivelViewSet)
 router.register(r'consumiveis-evento', views.ConsumivelEventoViewSet)
 router.register(r'escalas', views.EscalaFuncionarioViewSet)
+router.register(r'guias', views.GuiaSaidaViewSet)
+router.register(r'relatorios/tarefas', views.TarefaRelatorioViewSet, basename='tarefa-relatorio')
 
 urlpatterns = [
     *router.urls,
@@ -26,11 +29,13 @@ urlpatterns = [
     path('token/', MyTokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
     path('dashboard-stats/', views.dashboard_stats, name='dashboard_stats'),
+    path('instrumentacao/consultas/', views.consultas_instrumentadas, name='consultas_instrumentadas'),
     path('inventario/lista-categorias/', views.get_equipment_categories, name='equipment-categories'),
     path('relatorio-avarias/', views.relatorio_de_avarias_recentes, name='relatorio_avarias'),
     path('reports/evento/<int:evento_id>/', views.evento_report_pdf, name='evento_report_pdf'),
     path('reports/guia-saida/<int:evento_id>/', views.gerar_guia_saida_pdf, name='gerar_guia_saida_pdf'),
     path('reports/avarias/<int:evento_id>/', views.gerar_relatorio_avarias_pdf, name='gerar_relatorio_avarias_pdf'),
+    path('reports/pacote-saida/', views.pacote_saida_pdf, name='pacote_saida_pdf'),
     
     # --- ROTA CORRIGIDA CONFORME SUA SOLICITAÇÃO ---
     path('lider/meus-eventos/', views.LiderEventosView.as_view(), name='lider-meus-eventos'),
@@ -2,15 +2,14 @@
 
 from django.shortcuts import render
 from datetime import datetime
-import os
 from django.db import transaction
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.conf import settings
 from django.utils import timezone
 from rest_framework import viewsets, status, filters, permissions
-from django.db.models import Sum, Q, Exists, OuterRef
+from django.db.models import F, Sum, Q, Exists, OuterRef
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView
@@ -21,46 +20,66 @@ from rest_framework.views import APIView
 from django.urls import get_resolver
 
 
-# Imports do ReportLab
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-
 # Importa todos os modelos e serializers necessários
 from .models import (
     Cliente, Equipamento, Evento, Funcionario, Veiculo,
     MaterialEvento, FotoPreEvento, ItemRetornado, RegistroManutencao, Usuario,
     Consumivel, ConsumivelEvento, AditivoOperacao, ConfirmacaoPresenca, HistoricoManutencao, EscalaFuncionario,
+    TarefaRelatorio, GuiaSaida,
+)
+from . import cache_relatorios, dashboard, guias, instrumentacao, metricas, movimentacoes, pacote_saida, relatorios, tarefas
+from .cache_http import RespostaCondicionalMixin
+from .disponibilidade import calcular_disponibilidade, verificar_lista
+from .filters import EventoFilter
+from .estoque import (
+    EquipamentoNaoEncontrado, ErroEstoque, enviar_para_manutencao, registrar_reforco, registrar_retorno, registrar_saida,
+    verificar_estoque_evento, verificar_estoque_itens,
 )
 from .serializers import (
-    ClienteSerializer, EquipamentoSerializer, EventoSerializer,
+    ClienteSerializer, EquipamentoSerializer, EventoSerializer, EventoResumoSerializer,
     FuncionarioSerializer, VeiculoSerializer, MaterialEventoSerializer,
     FotoPreEventoSerializer, ItemRetornadoComEventoSerializer, RegistroManutencaoSerializer,
     UsuarioSerializer, ConsumivelSerializer, ConsumivelEventoSerializer, AditivoOperacaoSerializer,
-    MyTokenObtainPairSerializer, EscalaFuncionarioSerializer # Removido o serializer do RegistroPonto
+    MyTokenObtainPairSerializer, EscalaFuncionarioSerializer, # Removido o serializer do RegistroPonto
+    TarefaRelatorioSerializer, GuiaSaidaSerializer, PedidoManutencaoSerializer,
 )
 
+def ler_periodo(dados):
+    """Lê 'inicio' e 'fim' (AAAA-MM-DD) de query params ou do corpo da requisição."""
+    if not dados.get('inicio') or not dados.get('fim'):
+        raise ValueError('Os parâmetros "inicio" e "fim" são obrigatórios (AAAA-MM-DD).')
+    try:
+        inicio = datetime.strptime(dados['inicio'], '%Y-%m-%d').date()
+        fim = datetime.strptime(dados['fim'], '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        raise ValueError('Datas inválidas. Use o formato AAAA-MM-DD.')
+    if fim < inicio:
+        raise ValueError('A data de fim não pode ser anterior à de início.')
+    return inicio, fim
+
 class ClienteViewSet(viewsets.ModelViewSet):
     queryset = Cliente.objects.all().order_by('empresa')
     serializer_class = ClienteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_paginacao = ('empresa', 'id')
 
 class FuncionarioViewSet(viewsets.ModelViewSet):
     queryset = Funcionario.objects.all().order_by('nome')
     serializer_class = FuncionarioSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_paginacao = ('nome', 'id')
 
 class VeiculoViewSet(viewsets.ModelViewSet):
     queryset = Veiculo.objects.all().order_by('nome')
     serializer_class = VeiculoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_paginacao = ('nome', 'id')
 
-class EquipamentoViewSet(viewsets.ModelViewSet):
+class EquipamentoViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Equipamento.objects.all()
     serializer_class = EquipamentoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_paginacao = ('modelo', 'id')
     filter_backends = [filters.SearchFilter, DjangoFilterBackend]
     search_fields = ['modelo', 'fabricante']
     filterset_fields = ['categoria']
@@ -83,9 +102,9 @@ class EquipamentoViewSet(viewsets.ModelViewSet):
             if quantidade_retornada > equipamento.quantidade_manutencao:
                 return Response({'error': f'Não é possível retornar {quantidade_retornada} itens. Apenas {equipamento.quantidade_manutencao} estão em manutenção.'}, status=status.HTTP_400_BAD_REQUEST)
 
-            equipamento.quantidade_manutencao -= quantidade_retornada
-            equipamento.quantidade_estoque += quantidade_retornada
-            equipamento.save()
+            movimentacoes.movimentar(
+                equipamento, 'RETORNO_MANUTENCAO', estoque=quantidade_retornada, manutencao=-quantidade_retornada, usuario=request.user,
+            )
 
             serializer = self.get_serializer(equipamento)
             return Response(serializer.data)
@@ -94,7 +113,6 @@ class EquipamentoViewSet(viewsets.ModelViewSet):
 
     # --- NOVA AÇÃO PARA ENVIAR EQUIPAMENTO PARA MANUTENÇÃO ---
     @action(detail=True, methods=['post'])
-    @transaction.atomic
     def enviar_para_manutencao(self, request, pk=None):
         equipamento = self.get_object()
         
@@ -108,46 +126,54 @@ class EquipamentoViewSet(viewsets.ModelViewSet):
                 {'error': 'Quantidade e descrição do problema são obrigatórios.'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        try:
-            quantidade = int(quantidade)
-            if quantidade <= 0:
-                raise ValueError("A quantidade deve ser positiva.")
-        except (ValueError, TypeError):
-            return Response({'error': 'A quantidade deve ser um número inteiro positivo.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if quantidade > equipamento.quantidade_estoque:
-            return Response(
-                {'error': f'Estoque insuficiente. Apenas {equipamento.quantidade_estoque} unidades disponíveis.'}, 
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        # Move o estoque e abre uma O.S. por unidade num único INSERT (core/estoque.py)
+        try:
+            registros = enviar_para_manutencao([
+                {'equipamento_id': equipamento.id, 'quantidade': quantidade, 'descricao_problema': descricao_problema}
+            ], request.user)
+        except ErroEstoque as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Lógica de negócio
-        # 1. Atualiza as quantidades no equipamento
-        equipamento.quantidade_estoque -= quantidade
-        equipamento.quantidade_manutencao += quantidade
-        equipamento.save()
+        return Response({'status': f'{len(registros)} unidade(s) de {equipamento.modelo} enviada(s) para manutenção com sucesso!'})
 
-        # 2. Cria um registo de manutenção para cada unidade enviada
-        for _ in range(quantidade):
-            RegistroManutencao.objects.create(
-                equipamento=equipamento,
-                descricao_problema=descricao_problema,
-                # Note que 'item_retornado' fica nulo, pois não veio de um evento
-            )
+    # --- DISPONIBILIDADE POR PERÍODO (considera as outras operações no mesmo intervalo) ---
+    @action(detail=True, methods=['get'])
+    def disponibilidade(self, request, pk=None):
+        equipamento = self.get_object()
+        try:
+            inicio, fim = ler_periodo(request.query_params)
+            excluir_evento = int(request.query_params['excluir_evento']) if request.query_params.get('excluir_evento') else None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        resultado = calcular_disponibilidade([equipamento.id], inicio, fim, excluir_evento)
+        return Response({'inicio': inicio, 'fim': fim, **resultado[equipamento.id]})
 
-        return Response({'status': f'{quantidade} unidade(s) de {equipamento.modelo} enviada(s) para manutenção com sucesso!'})
+    @action(detail=False, methods=['post'], url_path='disponibilidade')
+    def disponibilidade_lote(self, request):
+        try:
+            inicio, fim = ler_periodo(request.data)
+            excluir_evento = int(request.data['excluir_evento']) if request.data.get('excluir_evento') else None
+            itens = [(int(item['equipamento_id']), int(item['quantidade'])) for item in request.data.get('itens', [])]
+        except (KeyError, TypeError, ValueError) as e:
+            return Response({'error': f'Dados inválidos: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        if not itens:
+            return Response({'error': 'Nenhum item foi especificado.'}, status=status.HTTP_400_BAD_REQUEST)
+        linhas = verificar_lista(itens, inicio, fim, excluir_evento)
+        return Response({'inicio': inicio, 'fim': fim, 'ok': not any(linha.get('falta') or linha.get('erro') for linha in linhas), 'itens': linhas})
 
 
 class ConsumivelViewSet(viewsets.ModelViewSet):
     queryset = Consumivel.objects.all()
     serializer_class = ConsumivelSerializer
     permission_classes = [IsAuthenticated]
+    ordenacao_paginacao = ('nome', 'id')
 
 class ConsumivelEventoViewSet(viewsets.ModelViewSet):
     queryset = ConsumivelEvento.objects.all()
     serializer_class = ConsumivelEventoSerializer
     permission_classes = [IsAuthenticated]
+    ordenacao_paginacao = ('-id',)
 
     @action(detail=True, methods=['post'])
     def toggle_conferencia(self, request, pk=None):
@@ -169,9 +195,28 @@ class ConsumivelEventoViewSet(viewsets.ModelViewSet):
 
 
 class RegistroManutencaoViewSet(viewsets.ModelViewSet):
-    queryset = RegistroManutencao.objects.exclude(status='REPARADO').order_by('-data_entrada')
+    queryset = RegistroManutencao.objects.filter(status__in=RegistroManutencao.STATUS_ABERTOS).order_by('-data_entrada')
     serializer_class = RegistroManutencaoSerializer
-    permission_classes = [permissions.IsAuthenticated]    
+    permission_classes = [permissions.IsAuthenticated]
+    ordenacao_paginacao = ('-data_entrada', '-id')
+
+    # --- ABERTURA DE O.S. EM LOTE (várias linhas de equipamento numa requisição) ---
+    @action(detail=False, methods=['post'])
+    def lote(self, request):
+        pedidos = request.data.get('itens', [])
+        if not pedidos:
+            return Response({'error': 'Nenhum item foi especificado.'}, status=status.HTTP_400_BAD_REQUEST)
+        serializer = PedidoManutencaoSerializer(data=pedidos, many=True)
+        if not serializer.is_valid():
+            return Response({'error': 'Itens inválidos.', 'itens': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            registros = enviar_para_manutencao([dict(pedido) for pedido in serializer.validated_data])
+        except ErroEstoque as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'status': f'{len(registros)} ordem(ns) de serviço aberta(s) com sucesso!',
+            'os_numbers': [registro.os_number for registro in registros],
+        }, status=status.HTTP_201_CREATED)
 
     @action(detail=True, methods=['post'])
     def atualizar_status(self, request, pk=None):
@@ -203,9 +248,7 @@ class RegistroManutencaoViewSet(viewsets.ModelViewSet):
             if novo_status == 'REPARADO':
                 equipamento = registro.equipamento
                 if equipamento.quantidade_manutencao > 0:
-                    equipamento.quantidade_manutencao -= 1
-                    equipamento.quantidade_estoque += 1
-                    equipamento.save()
+                    movimentacoes.movimentar(equipamento, 'REPARO', estoque=1, manutencao=-1, usuario=request.user, registro_manutencao=registro)
                 registro.data_saida = timezone.now()
             
             registro.save()
@@ -221,10 +264,12 @@ class RegistroManutencaoHistoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = RegistroManutencao.objects.filter(status='REPARADO').order_by('-data_saida')
     serializer_class = RegistroManutencaoSerializer
     permission_classes = [permissions.IsAuthenticated]
+    ordenacao_paginacao = ('-data_saida', '-id')
 
 class MaterialEventoViewSet(viewsets.ModelViewSet):
     queryset = MaterialEvento.objects.all()
     serializer_class = MaterialEventoSerializer
+    ordenacao_paginacao = ('id',)
 
     @action(detail=True, methods=['post'])
     def toggle_conferencia(self, request, pk=None):
@@ -258,10 +303,30 @@ class MaterialEventoViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(material)
         return Response(serializer.data)
 
+    # --- CHECAGEM DE ESTOQUE EM LOTE (lista inteira numa ida ao servidor) ---
+    @action(detail=False, methods=['post'], url_path='verificar-estoque')
+    def verificar_estoque(self, request):
+        evento_id = request.data.get('evento_id')
+        try:
+            if evento_id:
+                linhas = verificar_estoque_evento(int(evento_id))
+            else:
+                itens = [(int(item['equipamento_id']), int(item['quantidade'])) for item in request.data.get('itens', [])]
+                if not itens:
+                    return Response({'error': 'Informe um evento_id ou a lista de itens.'}, status=status.HTTP_400_BAD_REQUEST)
+                linhas = verificar_estoque_itens(itens)
+        except (KeyError, TypeError, ValueError) as e:
+            return Response({'error': f'Dados inválidos: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        faltas = [linha for linha in linhas if linha.get('falta') or linha.get('erro')]
+        return Response({'ok': not faltas, 'total_faltas': len(faltas), 'itens': linhas})
+
 
 class FotoPreEventoViewSet(viewsets.ModelViewSet):
     queryset = FotoPreEvento.objects.all()
     serializer_class = FotoPreEventoSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    filterset_fields = ['evento']
+    ordenacao_paginacao = ('id',)
 
 class EscalaFuncionarioViewSet(viewsets.ModelViewSet):
     """
@@ -270,6 +335,7 @@ class EscalaFuncionarioViewSet(viewsets.ModelViewSet):
     queryset = EscalaFuncionario.objects.all()
     serializer_class = EscalaFuncionarioSerializer
     permission_classes = [IsAuthenticated]
+    ordenacao_paginacao = ('data_inicio', 'id')
 
     def get_queryset(self):
         # Filtra as escalas por evento, se um 'evento_id' for passado na URL
@@ -280,10 +346,30 @@ class EscalaFuncionarioViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class EventoViewSet(viewsets.ModelViewSet):
+class EventoViewSet(RespostaCondicionalMixin, viewsets.ModelViewSet):
     queryset = Evento.objects.all().order_by('-data_evento')
     serializer_class = EventoSerializer
     permission_classes = [IsAuthenticated]
+    filterset_class = EventoFilter
+    ordenacao_paginacao = ('-data_evento', '-id')
+
+    def lista_resumida(self):
+        # A listagem usa a representação compacta; ?expand=1 devolve a árvore completa
+        return self.action == 'list' and self.request.query_params.get('expand') not in ('1', 'true', 'True')
+
+    def get_serializer_class(self):
+        if self.lista_resumida():
+            return EventoResumoSerializer
+        return super().get_serializer_class()
+
+    def get_queryset(self):
+        # Listagem e detalhe carregam toda a árvore do serializer em número fixo de consultas
+        queryset = super().get_queryset()
+        if self.lista_resumida():
+            queryset = queryset.com_resumo()
+        elif self.action in ('list', 'retrieve'):
+            queryset = queryset.com_detalhes()
+        return queryset
     
     def perform_create(self, serializer):
         # Associa o usuário logado (request.user) ao campo 'criado_por'
@@ -357,7 +443,7 @@ class EventoViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Status inválido fornecido.'}, status=status.HTTP_400_BAD_REQUEST)
 
         if novo_status == 'FINALIZADO' and evento.status == 'EM_ANDAMENTO':
-            materiais_pendentes = MaterialEvento.objects.filter(evento=evento).exclude(
+            materiais_pendentes = MaterialEvento.objects.filter(evento=evento).select_related('equipamento').exclude(
                 quantidade_separada=F('quantidade_retornada_ok') + F('quantidade_retornada_defeito')
             )
             if materiais_pendentes.exists():
@@ -368,6 +454,20 @@ class EventoViewSet(viewsets.ModelViewSet):
         evento.save()
         return Response({'status': f'Status atualizado para {evento.get_status_display()}'})
 
+    def _verificar_disponibilidade(self, evento):
+        itens = MaterialEvento.objects.filter(evento=evento, equipamento__isnull=False).values_list('equipamento_id', 'quantidade')
+        if not itens:
+            return []
+        inicio, fim = evento.janela()
+        return verificar_lista(itens, inicio, fim, excluir_evento=evento.id)
+
+    @action(detail=True, methods=['get'])
+    def disponibilidade(self, request, pk=None):
+        evento = self.get_object()
+        inicio, fim = evento.janela()
+        linhas = self._verificar_disponibilidade(evento)
+        return Response({'inicio': inicio, 'fim': fim, 'ok': not any(linha['falta'] for linha in linhas), 'itens': linhas})
+
     @action(detail=True, methods=['post'])
     def aprovar_lista(self, request, pk=None):
         evento = self.get_object()
@@ -379,10 +479,10 @@ class EventoViewSet(viewsets.ModelViewSet):
         if itens_nao_conferidos > 0:
             return Response({'error': f'Ainda há {itens_nao_conferidos} item(ns) pendente(s) de conferência.'}, status=400)
 
-        materiais = MaterialEvento.objects.filter(evento=evento)
-        for material in materiais:
-            if material.equipamento and material.quantidade > material.equipamento.quantidade_estoque:
-                return Response({'error': f"Estoque insuficiente para '{material.equipamento.modelo}'. A lista deve ser corrigida."}, status=400)
+        # Considera as outras operações que se sobrepõem ao período desta, não só o estoque de hoje
+        for linha in self._verificar_disponibilidade(evento):
+            if linha['falta']:
+                return Response({'error': f"Estoque insuficiente para '{linha['modelo']}' no período da operação (faltam {linha['falta']}). A lista deve ser corrigida."}, status=400)
         
         evento.status = 'AGUARDANDO_SAIDA'
         evento.observacao_correcao = ""
@@ -416,32 +516,18 @@ class EventoViewSet(viewsets.ModelViewSet):
         if not materiais_saida:
             return Response({'error': 'Nenhum material foi especificado para a saída.'}, status=400)
         try:
-            for item in materiais_saida:
-                material = MaterialEvento.objects.get(id=item['id'], evento=evento)
-                qtd_saida = int(item['qtd'])
-                if qtd_saida > (material.quantidade - material.quantidade_separada):
-                    return Response({'error': f"Quantidade de saída para '{material.equipamento.modelo}' excede a planejada."}, status=400)
-                if material.equipamento and qtd_saida > material.equipamento.quantidade_estoque:
-                    return Response({'error': f"Estoque insuficiente para {material.equipamento.modelo}."}, status=400)
-                if material.equipamento:
-                    material.equipamento.quantidade_estoque -= qtd_saida
-                    material.equipamento.save()
-                material.quantidade_separada += qtd_saida
-                material.save()
-            
-            # Se era a primeira saída, muda o status para "Em Andamento"
-            if evento.status == 'AGUARDANDO_SAIDA':
-                evento.status = 'EM_ANDAMENTO'
-                evento.save()
-
-            return Response({'status': 'Saída de material registrada com sucesso!', 'novo_status': evento.get_status_display()})
-        except Exception as e:
+            evento, guia = registrar_saida(evento, materiais_saida, request.user)
+        except ErroEstoque as e:
             return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+        return Response({
+            'status': 'Saída de material registrada com sucesso!', 'novo_status': evento.get_status_display(),
+            'guia': GuiaSaidaSerializer(guia, context={'request': request}).data,
+        })
+
 
-    # --- LÓGICA DE RETORNO CORRIGIDA E COMPLETA ---
+    # --- RETORNO EM LOTE (core/estoque.py) ---
     @action(detail=True, methods=['post'])
-    @transaction.atomic
     def registrar_retorno(self, request, pk=None):
         evento = self.get_object()
         if evento.status != 'EM_ANDAMENTO':
@@ -450,52 +536,14 @@ class EventoViewSet(viewsets.ModelViewSet):
         novos_retornos = request.data.get('retornos', [])
         if not novos_retornos:
             return Response({'error': 'Nenhum item de retorno foi especificado.'}, status=status.HTTP_400_BAD_REQUEST)
-
         try:
-            for item_data in novos_retornos:
-                material = MaterialEvento.objects.get(id=item_data['material_evento_id'], evento=evento)
-                quantidade = int(item_data['quantidade'])
-                condicao = item_data['condicao']
-                observacao = item_data.get('observacao', '')
-
-                total_ja_retornado = material.itens_retornados.aggregate(total=Sum('quantidade'))['total'] or 0
-                total_pendente = material.quantidade_separada - total_ja_retornado
-
-                if quantidade > total_pendente:
-                    return Response({'error': f"Quantidade de retorno para '{material.equipamento.modelo}' excede a pendente."}, status=400)
-
-                novo_item_retornado = ItemRetornado.objects.create(
-                    material_evento=material,
-                    quantidade=quantidade,
-                    condicao=condicao,
-                    observacao=observacao
-                )
-
-                if material.equipamento:
-                    if condicao == 'OK':
-                        material.equipamento.quantidade_estoque += quantidade
-                    else:
-                        material.equipamento.quantidade_manutencao += quantidade
-                        for _ in range(quantidade):
-                            RegistroManutencao.objects.create(
-                                equipamento=material.equipamento,
-                                item_retornado=novo_item_retornado,
-                                descricao_problema=f"Retornou da operação '{evento.nome}' como '{novo_item_retornado.get_condicao_display()}'. Obs: {observacao}"
-                            )
-                    material.equipamento.save()
-
-            todos_materiais = MaterialEvento.objects.filter(evento=evento)
-            ainda_ha_pendencia = any(m.quantidade_separada > (m.itens_retornados.aggregate(total=Sum('quantidade'))['total'] or 0) for m in todos_materiais)
-
-            if not ainda_ha_pendencia:
-                evento.status = 'FINALIZADO'
-                evento.save()
-                return Response({'status': 'Retorno registrado e operação finalizada com sucesso!'})
-            else:
-                return Response({'status': 'Retorno parcial registrado com sucesso!'})
+            evento, finalizado = registrar_retorno(evento, novos_retornos, request.user)
+        except ErroEstoque as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if finalizado:
+            return Response({'status': 'Retorno registrado e operação finalizada com sucesso!'})
+        return Response({'status': 'Retorno parcial registrado com sucesso!'})
 
 
     def perform_update(self, serializer):
@@ -532,9 +580,8 @@ class EventoViewSet(viewsets.ModelViewSet):
         evento.save()
         return Response({'status': 'Operação retornada para correção.'})
 
-    # --- AÇÃO DE REFORÇO ADICIONADA DE VOLTA ---
+    # --- REFORÇO EM LOTE (core/estoque.py) ---
     @action(detail=True, methods=['post'])
-    @transaction.atomic
     def adicionar_reforco(self, request, pk=None):
         evento = self.get_object()
         if evento.status != 'EM_ANDAMENTO':
@@ -543,38 +590,17 @@ class EventoViewSet(viewsets.ModelViewSet):
         itens_reforco = request.data.get('materiais', [])
         if not itens_reforco:
             return Response({'error': 'Nenhum material de reforço foi especificado.'}, status=400)
-
         try:
-            for item_data in itens_reforco:
-                equipamento_id = item_data.get('equipamento_id')
-                quantidade = int(item_data.get('quantidade', 0))
-
-                if not equipamento_id or quantidade <= 0:
-                    continue
-
-                equipamento = Equipamento.objects.get(id=equipamento_id)
-                
-                if quantidade > equipamento.quantidade_estoque:
-                    return Response({'error': f"Estoque insuficiente para o reforço de '{equipamento.modelo}'."}, status=400)
-                
-                equipamento.quantidade_estoque -= quantidade
-                equipamento.save()
-
-                material, created = MaterialEvento.objects.get_or_create(
-                    evento=evento,
-                    equipamento=equipamento,
-                    defaults={'quantidade': 0}
-                )
-                
-                material.quantidade += quantidade
-                material.quantidade_separada += quantidade
-                material.save()
-            
-            return Response({'status': 'Material de reforço adicionado e com saída registrada com sucesso!'})
-        except Equipamento.DoesNotExist:
-            return Response({'error': 'Equipamento de reforço não encontrado.'}, status=404)
-        except Exception as e:
-            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            evento, guia = registrar_reforco(evento, itens_reforco, request.user)
+        except EquipamentoNaoEncontrado as e:
+            return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except ErroEstoque as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'status': 'Material de reforço adicionado e com saída registrada com sucesso!',
+            'guia': GuiaSaidaSerializer(guia, context={'request': request}).data,
+        })
 
     @action(detail=True, methods=['post'])
     @transaction.atomic # Garante que ou tudo funciona, ou nada é alterado
@@ -716,6 +742,7 @@ class AditivoOperacaoViewSet(viewsets.ModelViewSet):
     queryset = AditivoOperacao.objects.all()
     serializer_class = AditivoOperacaoSerializer
     permission_classes = [IsAuthenticated]
+    ordenacao_paginacao = ('-data_criacao', '-id')
 
     # --- MÉTODO ATUALIZADO COM A LÓGICA DE INTEGRAÇÃO ---
     @transaction.atomic # Garante que todas as operações sejam bem-sucedidas ou nenhuma
@@ -765,307 +792,55 @@ def get_equipment_categories(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def dashboard_stats(request):
-    total_equip_estoque = Equipamento.objects.aggregate(total=Sum('quantidade_estoque'))['total'] or 0
-    total_equip_manutencao = Equipamento.objects.aggregate(total=Sum('quantidade_manutencao'))['total'] or 0
-
-    # --- LÓGICA ATUALIZADA PARA O PAINEL DE LOGÍSTICA ---
-    # Subquery para verificar a existência de avarias para um evento
-    avarias_subquery = ItemRetornado.objects.filter(
-        material_evento__evento=OuterRef('pk')
-    ).exclude(condicao='OK')
-
-    # Query principal que busca:
-    # 1. Operações ativas (não em planejamento ou canceladas)
-    # 2. Operações finalizadas que TÊM avarias
-    eventos_para_logistica = Evento.objects.annotate(
-        tem_avarias=Exists(avarias_subquery)
-    ).filter(
-        ~Q(status__in=['PLANEJAMENTO', 'CANCELADO']), # Exclui planejamento e cancelados
-        Q(status__in=['AGUARDANDO_CONFERENCIA', 'AGUARDANDO_SAIDA', 'EM_ANDAMENTO']) |
-        (Q(status='FINALIZADO') & Q(tem_avarias=True))
-    ).distinct().order_by('data_evento')
-
-    # Serializa os dados para a resposta
-    eventos_serializer = EventoSerializer(eventos_para_logistica, many=True)
-
-    stats = {
-        'total_equipamentos': total_equip_estoque,
-        'em_manutencao': total_equip_manutencao,
-        # O frontend espera o campo 'proximos_eventos', então mantemos o nome
-        'proximos_eventos': eventos_serializer.data
-    }
-    return Response(stats)
+    # Montado a partir do cache (core/dashboard.py), invalidado pelos signals de estoque, status e retornos
+    return Response(dashboard.obter_estatisticas())
 
-def evento_report_pdf(request, evento_id):
-    try:
-        evento = Evento.objects.get(id=evento_id)
-    except Evento.DoesNotExist:
-        return HttpResponse("Evento não encontrado.", status=404)
 
-    response = HttpResponse(content_type='application/pdf')
-    
-    # Lógica do Título Dinâmico
-    if evento.tipo_evento == 'PROPRIO':
-        main_title_text = "Relatório Completo do Evento"
-        subtitle_text = evento.nome or "Evento Sem Nome"
-        filename_prefix = evento.nome or "Evento"
-    else:
-        main_title_text = evento.get_tipo_evento_display()
-        subtitle_text = f"Para: {evento.cliente.empresa}"
-        filename_prefix = evento.get_tipo_evento_display()
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def consultas_instrumentadas(request):
+    # Consultas mais pesadas guardadas pelo InstrumentacaoMiddleware (INSTRUMENTACAO_BUFFER_CONSULTAS > 0)
+    if request.method == 'DELETE':
+        instrumentacao.limpar_buffer()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(instrumentacao.consultas_registradas())
 
-    filename = f"{filename_prefix.replace(' ', '_')}_{evento.id}.pdf"
+def _resposta_pdf(filename, pdf):
+    response = HttpResponse(pdf, content_type='application/pdf')
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-    doc = SimpleDocTemplate(response, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-    styles = getSampleStyleSheet()
-    
-    # --- CORREÇÃO: Bloco de código abaixo foi realinhado ---
-    story = []
-    
-    # 1. Cabeçalho com Logo
-    logo_path = os.path.join(settings.BASE_DIR, 'static', 'img', 'novalite_logo.png')
-    logo_imagem = RLImage(logo_path, width=1.5*inch, height=0.75*inch) if os.path.exists(logo_path) else Paragraph("")
-    
-    header_text = [
-        Paragraph(main_title_text, styles['h1']),
-        Paragraph(f"<b>{subtitle_text}</b>", styles['h2']),
-    ]
-    if evento.data_montagem:
-        header_text.append(Paragraph(f"<b>Montagem:</b> {evento.data_montagem.strftime('%d/%m/%Y')}", styles['Normal']))
-    if evento.data_termino:
-        header_text.append(Paragraph(f"<b>Término/Retorno:</b> {evento.data_termino.strftime('%d/%m/%Y')}", styles['Normal']))
-
-    header_table = Table([[logo_imagem, header_text]], colWidths=[2*inch, 5*inch], style=[('VALIGN', (0,0), (-1,-1), 'TOP')])
-    story.append(header_table)
-    story.append(Spacer(1, 0.2*inch))
-
-    # 2. Informações Gerais
-    info_data = [
-        [Paragraph("<b>Cliente:</b>", styles['Normal']), Paragraph(evento.cliente.empresa if evento.cliente else 'N/A', styles['Normal'])],
-        [Paragraph("<b>Local:</b>", styles['Normal']), Paragraph(evento.local or 'N/A', styles['Normal'])],
-    ]
-    if evento.responsavel_local_nome:
-        info_data.append([Paragraph("<b>Responsável no Local:</b>", styles['Normal']), Paragraph(f"{evento.responsavel_local_nome} ({evento.responsavel_local_contato or 'sem contato'})", styles['Normal'])])
-    
-    story.append(Table(info_data, colWidths=[1.8*inch, 5.2*inch]))
-    story.append(Spacer(1, 0.25*inch))
-
-    # 3. Detalhes Técnicos (Pré-Evento)
-    story.append(Paragraph("<b>Detalhes Técnicos (Pré-Evento)</b>", styles['h3']))
-    tecnicos_data = [
-        [Paragraph("<b>Tipo de Energia:</b>", styles['Normal']), Paragraph(evento.get_tipo_energia_display() or 'Não informado', styles['Normal'])],
-        [Paragraph("<b>Distância do Ponto (m):</b>", styles['Normal']), Paragraph(str(evento.distancia_energia_metros), styles['Normal'])],
-        [Paragraph("<b>Acesso de Veículo:</b>", styles['Normal']), Paragraph(evento.get_ponto_acesso_veiculo_display() or 'Não informado', styles['Normal'])],
-        [Paragraph("<b>Necessita Gerador:</b>", styles['Normal']), Paragraph("Sim" if evento.necessita_gerador else "Não", styles['Normal'])],
-    ]
-    if evento.observacoes_tecnicas:
-        tecnicos_data.append([Paragraph("<b>Observações:</b>", styles['Normal']), Paragraph(evento.observacoes_tecnicas.replace('\n', '<br/>'), styles['Normal'])])
-    story.append(Table(tecnicos_data, colWidths=[1.8*inch, 5.2*inch]))
-    story.append(Spacer(1, 0.25*inch))
-
-    # 4. Fotos do Pré-Evento
-    fotos = evento.fotos.all()
-    if fotos:
-        story.append(Paragraph("<b>Fotos do Local</b>", styles['h3']))
-        photo_data = []
-        row = []
-        for foto in fotos:
-            if os.path.exists(foto.imagem.path):
-                img = RLImage(foto.imagem.path, width=2.2*inch, height=1.6*inch)
-                row.append(img)
-                if len(row) == 3:
-                    photo_data.append(row)
-                    row = []
-        if row: photo_data.append(row)
-        if photo_data:
-            story.append(Table(photo_data))
-        story.append(Spacer(1, 0.25*inch))
-
-    # 5. Lista de Materiais
-    materiais = evento.materialevento_set.all()
-    if materiais:
-        story.append(Paragraph("<b>Lista de Materiais</b>", styles['h3']))
-        data = [["Item / Modelo", "Qtd."]]
-        for item in materiais:
-            data.append([item.equipamento.modelo if item.equipamento else item.item_descricao, item.quantidade])
-        table = Table(data, colWidths=[5.5*inch, 1.5*inch], style=[('BACKGROUND', (0,0), (-1,0), colors.grey), ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke), ('GRID', (0,0), (-1,-1), 1, colors.black), ('ALIGN', (1,1), (-1,-1), 'CENTER'), ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold')])
-        story.append(table)
-        story.append(Spacer(1, 0.25*inch))
-    
-    consumiveis = evento.consumiveis_set.all()
-    if consumiveis:
-        story.append(Paragraph("<b>Lista de Consumíveis</b>", styles['h3']))
-        data_consumiveis = [["Item", "Qtd.", "Unidade"]]
-        for item in consumiveis:
-            data_consumiveis.append([item.consumivel.nome, item.quantidade, item.consumivel.unidade_medida])
-        
-        table_consumiveis = Table(data_consumiveis, colWidths=[4.5*inch, 1*inch, 1.5*inch])
-        table_consumiveis.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('GRID', (0,0), (-1,-1), 1, colors.black),
-            ('ALIGN', (1,1), (-1,-1), 'CENTER'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold')
-        ]))
-        story.append(table_consumiveis)
-        story.append(Spacer(1, 0.25*inch))    
-
-    # 6. Equipe Designada
-    equipe = evento.equipe.all()
-    if equipe:
-        story.append(Paragraph("<b>Equipe Designada</b>", styles['h3']))
-        data = [["Nome", "Função"]]
-        for membro in equipe:
-            data.append([membro.nome, membro.funcao])
-        table = Table(data, colWidths=[3.5*inch, 3.5*inch], style=[('BACKGROUND', (0,0), (-1,0), colors.HexColor("#4F81BD")), ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke), ('GRID', (0,0), (-1,-1), 1, colors.black), ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold')])
-        story.append(table)
-        story.append(Spacer(1, 0.25*inch))
-
-    # 7. Frota Designada
-    veiculos = evento.veiculos.all()
-    if veiculos:
-        story.append(Paragraph("<b>Frota Designada</b>", styles['h3']))
-        data = [["Veículo", "Placa"]]
-        for veiculo in veiculos:
-            data.append([veiculo.nome, veiculo.placa])
-        table = Table(data, colWidths=[3.5*inch, 3.5*inch], style=[('BACKGROUND', (0,0), (-1,0), colors.darkgreen), ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke), ('GRID', (0,0), (-1,-1), 1, colors.black), ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold')])
-        story.append(table)
-
-    doc.build(story)
     return response
 
+
+# Os PDFs são montados em core/relatorios.py; estas rotas geram na hora.
+# Para relatórios pesados, o frontend pode usar a fila (/api/relatorios/tarefas/).
+def evento_report_pdf(request, evento_id):
+    try:
+        # Reimpressões (muito comuns na hora da saída) viram envio de arquivo do cache em disco
+        nome_arquivo, arquivo = cache_relatorios.relatorio_evento(evento_id)
+        return FileResponse(arquivo, as_attachment=True, filename=nome_arquivo, content_type='application/pdf')
+    except Evento.DoesNotExist:
+        return HttpResponse("Evento não encontrado.", status=404)
+
+# Pré-visualização com os itens enviados pelo cliente; a guia oficial é emitida pelo
+# próprio dar_saida/adicionar_reforco e reimpressa de /api/guias/<id>/pdf/
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def gerar_guia_saida_pdf(request, evento_id):
     try:
-        evento = Evento.objects.get(id=evento_id)
-        itens_da_guia = request.data.get('itens', []) 
-
-        if not itens_da_guia:
-            return Response({'error': 'Nenhum equipamento fornecido para a guia.'}, status=400)
-
-        response = HttpResponse(content_type='application/pdf')
-        timestamp = datetime.now().strftime("%Y%m%d-%H%M")
-        filename = f"Guia_Saida_{evento.nome or evento.id}_{timestamp}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        doc = SimpleDocTemplate(response, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        styles = getSampleStyleSheet()
-        story = []
-
-        # --- CABEÇALHO ATUALIZADO ---
-        story.append(Paragraph("Guia de Saída de Material", styles['h1']))
-        story.append(Paragraph(f"<b>Operação:</b> {evento.nome or evento.get_tipo_evento_display()}", styles['h2']))
-        story.append(Paragraph(f"<b>Cliente:</b> {evento.cliente.empresa}", styles['Normal']))
-        
-        # --- ENDEREÇO ADICIONADO AQUI ---
-        if evento.local:
-            story.append(Paragraph(f"<b>Endereço / Local:</b> {evento.local}", styles['Normal']))
-        
-        if evento.data_evento:
-            story.append(Paragraph(f"<b>Data de Saída:</b> {evento.data_evento.strftime('%d/%m/%Y')}", styles['Normal']))
-        if evento.data_termino:
-            story.append(Paragraph(f"<b>Data de Retorno Previsto:</b> {evento.data_termino.strftime('%d/%m/%Y')}", styles['Normal']))
-        
-        story.append(Paragraph(f"<b>Data de Emissão do Documento:</b> {datetime.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-        story.append(Spacer(1, 0.3*inch))
-
-        # --- Secção de Equipamentos (sem alterações) ---
-        story.append(Paragraph("<b>Equipamentos</b>", styles['h3']))
-        data_equipamentos = [["Item / Modelo", "Qtd."]]
-        for item in itens_da_guia:
-            data_equipamentos.append([item['modelo'], item['qtd']])
-        table_equipamentos = Table(data_equipamentos, colWidths=[5.5*inch, 1.5*inch])
-        table_equipamentos.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.darkgrey), ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
-            ('GRID', (0,0), (-1,-1), 1, colors.black), ('ALIGN', (1,1), (-1,-1), 'CENTER'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold')
-        ]))
-        story.append(table_equipamentos)
-        story.append(Spacer(1, 0.25*inch))
-
-        # --- Secção de Consumíveis (sem alterações) ---
-        consumiveis = evento.consumiveis_set.all()
-        if consumiveis:
-            story.append(Paragraph("<b>Consumíveis</b>", styles['h3']))
-            data_consumiveis = [["Item / Modelo", "Qtd."]]
-            for item in consumiveis:
-                data_consumiveis.append([item.consumivel.nome, item.quantidade])
-            table_consumiveis = Table(data_consumiveis, colWidths=[5.5*inch, 1.5*inch])
-            table_consumiveis.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-                ('GRID', (0,0), (-1,-1), 1, colors.black), ('ALIGN', (1,1), (-1,-1), 'CENTER'), 
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold')]))
-            story.append(table_consumiveis)
-
-        # --- Assinaturas (sem alterações) ---
-        story.append(Spacer(1, 1*inch))
-        assinaturas = [
-            ["__________________________________", "__________________________________"],
-            [Paragraph("Conferido por (Novalite)", styles['Normal']), Paragraph("Recebido por (Cliente/Produção)", styles['Normal'])]
-        ]
-        story.append(Table(assinaturas, colWidths=[3*inch, 3*inch], style=[('ALIGN', (0,0), (-1,-1), 'CENTER')]))
-
-        doc.build(story)
-        return response
+        return _resposta_pdf(*relatorios.guia_saida(evento_id, request.data.get('itens', [])))
+    except relatorios.RelatorioIndisponivel as e:
+        return Response({'error': str(e)}, status=400)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
         
-# Em: core/views.py
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def gerar_relatorio_avarias_pdf(request, evento_id):
     try:
-        evento = Evento.objects.get(id=evento_id)
-        
-        # --- LÓGICA DE BUSCA CORRIGIDA E MAIS ROBUSTA ---
-        # Busca todos os itens retornados para este evento que NÃO ESTÃO em "Bom Estado"
-        itens_avariados = ItemRetornado.objects.filter(
-            material_evento__evento_id=evento_id
-        ).exclude(condicao='OK').order_by('material_evento__equipamento__modelo')
-
-        if not itens_avariados.exists():
-            return HttpResponse("Nenhum item com avaria foi registrado para esta operação.", status=404)
-
-        response = HttpResponse(content_type='application/pdf')
-        filename = f"Relatorio_Avarias_{evento.nome.replace(' ', '_')}_{evento.id}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        doc = SimpleDocTemplate(response, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        styles = getSampleStyleSheet()
-        story = []
-
-        # 1. Cabeçalho
-        story.append(Paragraph("Relatório de Perdas e Avarias", styles['h1']))
-        story.append(Paragraph(f"<b>Operação:</b> {evento.nome or evento.get_tipo_evento_display()}", styles['h2']))
-        story.append(Paragraph(f"<b>Cliente:</b> {evento.cliente.empresa}", styles['Normal']))
-        story.append(Paragraph(f"<b>Data de Emissão:</b> {datetime.now().strftime('%d/%m/%Y')}", styles['Normal']))
-        story.append(Spacer(1, 0.3*inch))
-        
-        # 2. Tabela de Itens Avariados
-        data = [["Item / Modelo", "Qtd.", "Condição", "Observação"]]
-        for item in itens_avariados:
-            data.append([
-                item.material_evento.equipamento.modelo if item.material_evento.equipamento else item.material_evento.item_descricao,
-                item.quantidade,
-                item.get_condicao_display(),
-                item.observacao or "Nenhuma"
-            ])
-        
-        table = Table(data, colWidths=[3*inch, 0.5*inch, 1*inch, 3*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor("#c00000")),
-            ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
-            ('GRID', (0,0), (-1,-1), 1, colors.black),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold')
-        ]))
-        story.append(table)
-
-        doc.build(story)
-        return response
-
+        return _resposta_pdf(*relatorios.relatorio_avarias(evento_id))
+    except relatorios.RelatorioIndisponivel as e:
+        return HttpResponse(str(e), status=404)
     except Evento.DoesNotExist:
         return HttpResponse("Operação não encontrada.", status=404)
     except Exception as e:
@@ -1082,8 +857,8 @@ def relatorio_de_avarias_recentes(request):
     de operações finalizadas.
     """
     avarias = ItemRetornado.objects.filter(
-        material_evento__evento__status='FINALIZADO'
-    ).exclude(condicao='OK').order_by('-data_retorno')[:10]
+        material_evento__evento__status='FINALIZADO', condicao__in=ItemRetornado.CONDICOES_AVARIA
+    ).order_by('-data_retorno')[:10]
     
     serializer = ItemRetornadoComEventoSerializer(avarias, many=True)
     return Response(serializer.data)
@@ -1114,54 +889,115 @@ def login_view(request):
 @permission_classes([IsAuthenticated])
 def gerar_guia_reforco_pdf(request, evento_id):
     try:
-        evento = Evento.objects.get(id=evento_id)
-        itens_do_reforco = request.data.get('itens', []) 
-
-        if not itens_do_reforco:
-            return Response({'error': 'Nenhum item fornecido para a guia de reforço.'}, status=400)
-
-        response = HttpResponse(content_type='application/pdf')
-        timestamp = timezone.now().strftime("%Y%m%d-%H%M")
-        filename = f"Guia_Reforco_{evento.nome or evento.id}_{timestamp}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-        doc = SimpleDocTemplate(response, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        styles = getSampleStyleSheet()
-        story = []
-
-        story.append(Paragraph("Guia de Saída de Material Extra (Reforço)", styles['h1']))
-        story.append(Paragraph(f"<b>Operação:</b> {evento.nome or evento.get_tipo_evento_display()}", styles['h2']))
-        story.append(Paragraph(f"<b>Cliente:</b> {evento.cliente.empresa}", styles['Normal']))
-        story.append(Paragraph(f"<b>Data de Emissão:</b> {timezone.now().strftime('%d/%m/%Y %H:%M')}", styles['Normal']))
-        story.append(Spacer(1, 0.3*inch))
-
-        data = [["Item / Modelo", "Quantidade"]]
-        for item in itens_do_reforco:
-            data.append([item['modelo'], item['qtd']])
-
-        table = Table(data, colWidths=[5.5*inch, 1.5*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.darkgrey),
-            ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke), # <-- LINHA CORRIGIDA AQUI
-            ('GRID', (0,0), (-1,-1), 1, colors.black),
-            ('ALIGN', (1,1), (-1,-1), 'CENTER'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold')
-        ]))
-        story.append(table)
-        story.append(Spacer(1, 1*inch))
-
-        assinaturas = [
-            ["__________________________________", "__________________________________"],
-            [Paragraph("Conferido por (Novalite)", styles['Normal']), Paragraph("Recebido por (Cliente/Produção)", styles['Normal'])]
-        ]
-        story.append(Table(assinaturas, colWidths=[3*inch, 3*inch], style=[('ALIGN', (0,0), (-1,-1), 'CENTER')]))
-
-        doc.build(story)
-        return response
+        return _resposta_pdf(*relatorios.guia_reforco(evento_id, request.data.get('itens', [])))
+    except relatorios.RelatorioIndisponivel as e:
+        return Response({'error': str(e)}, status=400)
     except Exception as e:
         return Response({'error': str(e)}, status=500)
 
 
+class GuiaSaidaViewSet(viewsets.ReadOnlyModelViewSet):
+    """Guias emitidas nas saídas e reforços; /pdf/ reimprime o arquivo arquivado, sem gerar de novo."""
+    queryset = GuiaSaida.objects.all()
+    serializer_class = GuiaSaidaSerializer
+    permission_classes = [IsAuthenticated]
+    filterset_fields = ['evento', 'tipo']
+    ordenacao_paginacao = ('-emitida_em', '-id')
+
+    @action(detail=True, methods=['get'])
+    def pdf(self, request, pk=None):
+        guia = self.get_object()
+        return FileResponse(guias.abrir(guia), as_attachment=True, filename=guia.nome_arquivo, content_type='application/pdf')
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def pacote_saida_pdf(request):
+    """
+    Pacote de saída do dia: relatório completo + guia de saída de cada operação,
+    num PDF só ou num ZIP. Recebe {data: 'AAAA-MM-DD'} ou {evento_ids: [...]}
+    e formato 'pdf' (padrão) ou 'zip'. Poucas operações voltam na hora; acima
+    de RELATORIOS_PACOTE_SINCRONO vira tarefa (202) com progresso por operação.
+    """
+    formato = request.data.get('formato', 'pdf')
+    if formato not in pacote_saida.FORMATOS:
+        return Response({'error': "Formato inválido. Use 'pdf' ou 'zip'."}, status=status.HTTP_400_BAD_REQUEST)
+    if request.data.get('evento_ids'):
+        try:
+            pedidos = [int(evento_id) for evento_id in request.data['evento_ids']]
+        except (TypeError, ValueError):
+            return Response({'error': 'evento_ids deve ser uma lista de ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        existentes = set(Evento.objects.filter(pk__in=pedidos).values_list('id', flat=True))
+        evento_ids = list(dict.fromkeys(evento_id for evento_id in pedidos if evento_id in existentes))
+    elif request.data.get('data'):
+        try:
+            dia = datetime.strptime(request.data['data'], '%Y-%m-%d').date()
+        except (TypeError, ValueError):
+            return Response({'error': 'Data inválida. Use o formato AAAA-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
+        evento_ids = pacote_saida.eventos_do_dia(dia)
+    else:
+        return Response({'error': "Informe 'data' ou 'evento_ids'."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not evento_ids:
+        return Response({'error': 'Nenhuma operação encontrada para o pacote.'}, status=status.HTTP_404_NOT_FOUND)
+    if len(evento_ids) > settings.RELATORIOS_PACOTE_MAX_EVENTOS:
+        return Response({'error': f"Máximo de {settings.RELATORIOS_PACOTE_MAX_EVENTOS} operações por pacote."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if len(evento_ids) <= settings.RELATORIOS_PACOTE_SINCRONO:
+        try:
+            nome_arquivo, conteudo = pacote_saida.gerar_pacote(evento_ids, formato, paralelo=False)
+        except relatorios.RelatorioIndisponivel as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        response = HttpResponse(conteudo, content_type=pacote_saida.FORMATOS[formato])
+        response['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+        return response
+    try:
+        tarefa = tarefas.solicitar('pacote_saida', {'evento_ids': evento_ids, 'formato': formato}, request.user)
+    except tarefas.FilaCheia as e:
+        return Response({'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    return Response(TarefaRelatorioSerializer(tarefa, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+class TarefaRelatorioViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Relatórios PDF em segundo plano: POST com {tipo, evento_id, itens?} devolve
+    202 com o id; o frontend consulta o status e baixa em /download/ quando concluir.
+    """
+    serializer_class = TarefaRelatorioSerializer
+    permission_classes = [IsAuthenticated]
+    ordenacao_paginacao = ('-criado_em',)
+
+    def get_queryset(self):
+        tarefas_visiveis = TarefaRelatorio.objects.all()
+        if not self.request.user.is_staff:
+            tarefas_visiveis = tarefas_visiveis.filter(solicitado_por=self.request.user)
+        return tarefas_visiveis
+
+    def create(self, request):
+        tipo = request.data.get('tipo')
+        if tipo not in relatorios.RELATORIOS:
+            return Response({'error': f"Tipo de relatório inválido. Use um de: {', '.join(relatorios.RELATORIOS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        _, nomes = relatorios.RELATORIOS[tipo]
+        parametros = {nome: request.data.get(nome) for nome in nomes}
+        try:
+            parametros['evento_id'] = int(parametros['evento_id'])
+        except (TypeError, ValueError):
+            return Response({'error': 'evento_id deve ser o id numérico da operação.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not Evento.objects.filter(pk=parametros['evento_id']).exists():
+            return Response({'error': 'Operação não encontrada.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            tarefa = tarefas.solicitar(tipo, parametros, request.user)
+        except tarefas.FilaCheia as e:
+            return Response({'error': str(e)}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+        return Response(self.get_serializer(tarefa).data, status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        tarefa = self.get_object()
+        if tarefa.status != 'CONCLUIDA':
+            return Response({'error': 'O relatório ainda não está pronto.', 'status': tarefa.status}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(tarefa.arquivo.open('rb'), as_attachment=True, filename=tarefa.nome_arquivo)
+
 
 class MeusEventosView(APIView):
     permission_classes = [IsAuthenticated]
@@ -1191,7 +1027,7 @@ class LiderEventosView(APIView):
     def get(self, request):
         try:
             lider = Funcionario.objects.get(email=request.user.email)
-            eventos_liderados = Evento.objects.filter(chefe_de_equipe=lider).order_by('-data_evento')
+            eventos_liderados = Evento.objects.com_detalhes().filter(chefe_de_equipe=lider).order_by('-data_evento')
             serializer = EventoSerializer(eventos_liderados, many=True, context={'request': request})
             return Response(serializer.data)
         except Funcionario.DoesNotExist:
@@ -0,0 +1,22 @@
+# Em: gunicorn.conf.py (lido automaticamente pelo gunicorn no diretório do projeto)
+
+import os
+import shutil
+
+# Métricas do Prometheus com vários workers (core/metricas.py): com PROMETHEUS_MULTIPROC_DIR
+# definido no ambiente, cada worker grava seus contadores em arquivos nesse diretório e o
+# /metrics soma todos. Sem ele, rode um worker só ou cada coleta verá um worker diferente.
+PROMETHEUS_MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+def on_starting(server):
+    # Arquivos de uma execução anterior somariam contadores de processos que não existem mais
+    if PROMETHEUS_MULTIPROC_DIR:
+        shutil.rmtree(PROMETHEUS_MULTIPROC_DIR, ignore_errors=True)
+        os.makedirs(PROMETHEUS_MULTIPROC_DIR, exist_ok=True)
+
+
+def child_exit(server, worker):
+    if PROMETHEUS_MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)